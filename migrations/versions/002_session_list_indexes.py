@@ -0,0 +1,54 @@
+"""Add composite indexes for the user session list
+
+Revision ID: 002_session_list_indexes
+Revises: 001_add_auth_fields
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002_session_list_indexes'
+down_revision = '001_add_auth_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """为用户会话列表添加复合索引（按 user_id/status 过滤，按 last_activity 倒序分页）"""
+    
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行，也不会锁住 sessions 表的写入
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_session_user_activity',
+            'sessions',
+            ['user_id', sa.text('last_activity DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'idx_session_user_status_activity',
+            'sessions',
+            ['user_id', 'status', sa.text('last_activity DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    """删除会话列表复合索引"""
+    
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_session_user_status_activity',
+            table_name='sessions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'idx_session_user_activity',
+            table_name='sessions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
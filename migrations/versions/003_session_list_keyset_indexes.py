@@ -0,0 +1,41 @@
+"""Extend the user session list indexes with session_id for keyset pagination
+
+Revision ID: 003_session_list_keyset_indexes
+Revises: 002_session_list_indexes
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003_session_list_keyset_indexes'
+down_revision = '002_session_list_indexes'
+branch_labels = None
+depends_on = None
+
+
+def _rebuild_indexes(*order):
+    """并发重建会话列表索引，排序列为 order"""
+    with op.get_context().autocommit_block():
+        for name, prefix in (
+            ('idx_session_user_activity', ['user_id']),
+            ('idx_session_user_status_activity', ['user_id', 'status']),
+        ):
+            op.drop_index(name, table_name='sessions', postgresql_concurrently=True, if_exists=True)
+            op.create_index(
+                name,
+                'sessions',
+                prefix + [sa.text(column) for column in order],
+                postgresql_concurrently=True,
+            )
+
+
+def upgrade():
+    """游标分页按 (last_activity, session_id) 倒序，索引需包含 session_id"""
+    _rebuild_indexes('last_activity DESC', 'session_id DESC')
+
+
+def downgrade():
+    """恢复为仅按 last_activity 排序的索引"""
+    _rebuild_indexes('last_activity DESC')
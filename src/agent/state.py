@@ -5,10 +5,13 @@ Defines the state structures for managing conversation history, context,
 and data flow through the LangGraph-based conversation agent.
 """
 
-from typing import List, Dict, Any, Optional, Union
+import secrets
+from collections import deque
+from itertools import islice
+from typing import List, Deque, Dict, Any, Optional, Union
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 from typing_extensions import TypedDict
 
 
@@ -22,20 +25,19 @@ class MessageRole(str, Enum):
 
 class ConversationMessage(BaseModel):
     """A single message in the conversation."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     id: str = Field(..., description="Unique message identifier")
     role: MessageRole = Field(..., description="Message role")
     content: str = Field(..., description="Message content")
     timestamp: datetime = Field(default_factory=datetime.now, description="Message timestamp")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class ToolCall(BaseModel):
     """Represents a tool call made by the agent."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     id: str = Field(..., description="Unique tool call identifier")
     name: str = Field(..., description="Tool name")
     arguments: Dict[str, Any] = Field(..., description="Tool arguments")
@@ -44,6 +46,8 @@ class ToolCall(BaseModel):
 
 class ToolResult(BaseModel):
     """Represents the result of a tool call."""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     call_id: str = Field(..., description="Corresponding tool call ID")
     success: bool = Field(..., description="Whether the tool call succeeded")
     result: Any = Field(..., description="Tool execution result")
@@ -93,6 +97,14 @@ class AgentState(TypedDict):
     external_history: Optional[List[Dict[str, str]]]
 
 
+# 单个会话上下文保留的最大消息数（超出后自动丢弃最早的消息）
+MAX_CONTEXT_MESSAGES = 1024
+
+
+def _new_message_history() -> Deque[ConversationMessage]:
+    return deque(maxlen=MAX_CONTEXT_MESSAGES)
+
+
 class ConversationContext(BaseModel):
     """Extended context for conversation management."""
     
@@ -103,7 +115,10 @@ class ConversationContext(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.now, description="Last update time")
     
     # Conversation history
-    messages: List[ConversationMessage] = Field(default_factory=list, description="Message history")
+    messages: Deque[ConversationMessage] = Field(
+        default_factory=_new_message_history,
+        description=f"Message history (bounded to the last {MAX_CONTEXT_MESSAGES} messages)"
+    )
     message_count: int = Field(default=0, description="Total message count")
     
     # State tracking
@@ -118,61 +133,101 @@ class ConversationContext(BaseModel):
     active_tools: List[str] = Field(default_factory=list, description="Currently available tools")
     preferences: Dict[str, Any] = Field(default_factory=dict, description="User preferences")
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_validator("messages", mode="after")
+    @classmethod
+    def _bound_messages(cls, value: Deque[ConversationMessage]) -> Deque[ConversationMessage]:
+        """Ensure externally supplied histories are bounded as well."""
+        if value.maxlen == MAX_CONTEXT_MESSAGES:
+            return value
+        return deque(value, maxlen=MAX_CONTEXT_MESSAGES)
     
     def add_message(self, role: MessageRole, content: str, metadata: Optional[Dict[str, Any]] = None) -> ConversationMessage:
         """Add a new message to the conversation."""
+        now = datetime.now()
         message = ConversationMessage(
-            id=f"msg_{len(self.messages) + 1}_{int(datetime.now().timestamp())}",
+            id=f"msg_{self.message_count + 1}_{secrets.token_hex(4)}",
             role=role,
             content=content,
+            timestamp=now,
             metadata=metadata or {}
         )
         self.messages.append(message)
         self.message_count += 1
-        self.updated_at = datetime.now()
+        self.updated_at = now
         return message
     
     def add_tool_call(self, name: str, arguments: Dict[str, Any]) -> ToolCall:
         """Record a tool call."""
+        now = datetime.now()
         tool_call = ToolCall(
-            id=f"tool_{len(self.tool_calls) + 1}_{int(datetime.now().timestamp())}",
+            id=f"tool_{len(self.tool_calls) + 1}_{secrets.token_hex(4)}",
             name=name,
-            arguments=arguments
+            arguments=arguments,
+            timestamp=now
         )
         self.tool_calls.append(tool_call)
-        self.updated_at = datetime.now()
+        self.updated_at = now
         return tool_call
     
     def add_tool_result(self, call_id: str, success: bool, result: Any, error: Optional[str] = None) -> ToolResult:
         """Record a tool result."""
+        now = datetime.now()
         tool_result = ToolResult(
             call_id=call_id,
             success=success,
             result=result,
-            error=error
+            error=error,
+            timestamp=now
         )
         self.tool_results.append(tool_result)
-        self.updated_at = datetime.now()
+        self.updated_at = now
         return tool_result
     
     def get_recent_messages(self, count: int = 10) -> List[ConversationMessage]:
         """Get the most recent messages."""
-        return self.messages[-count:] if self.messages else []
+        if count <= 0:
+            # 保持与切片 messages[-count:] 相同的语义
+            return list(self.messages)[-count:]
+        # 从尾部取 count 条，O(count) 而非复制整个历史
+        recent = list(islice(reversed(self.messages), count))
+        recent.reverse()
+        return recent
     
     def clear_history(self, keep_count: int = 0) -> None:
         """Clear conversation history, optionally keeping recent messages."""
         if keep_count > 0:
-            self.messages = self.messages[-keep_count:]
+            self.messages = deque(self.get_recent_messages(keep_count), maxlen=MAX_CONTEXT_MESSAGES)
         else:
-            self.messages = []
+            self.messages = _new_message_history()
         self.message_count = len(self.messages)
         self.updated_at = datetime.now()
 
 
+# Immutable defaults for a new turn; mutable containers are created per call
+_INITIAL_STATE_TEMPLATE: Dict[str, Any] = {
+    # Core conversation data
+    "agent_response": "",
+    
+    # Tool interaction
+    "tool_call_count": 0,  # 🆕 初始化为 0
+    
+    # Processing context
+    "current_intent": None,
+    
+    # Flow control
+    "next_action": None,
+    "should_continue": True,
+    "error_state": None,
+    
+    # Configuration
+    "temperature": 0.7,
+    "max_tokens": 8192,
+    
+    # External history from session manager (initialized as None)
+    "external_history": None,
+}
+
+
 def create_initial_state(
     session_id: str,
     user_input: str,
@@ -180,69 +235,56 @@ def create_initial_state(
     model_config: Optional[Dict[str, Any]] = None
 ) -> AgentState:
     """Create an initial agent state for a new conversation turn."""
-    now = datetime.now()
+    state = _INITIAL_STATE_TEMPLATE.copy()
+    
+    # Core conversation data
+    state["messages"] = []
+    state["user_input"] = user_input
+    
+    # Session information
+    state["session_id"] = session_id
+    state["user_id"] = user_id
+    state["conversation_start"] = state["last_activity"] = datetime.now()
+    
+    # Tool interaction
+    state["tool_calls"] = []
+    state["tool_results"] = []
+    state["pending_tool_calls"] = []
     
-    # 🔧 修复: 从 model_config 中提取 max_tokens 和 temperature
+    # Processing context
+    state["context_variables"] = {}
+    
+    # 🔧 修复: 从 model_config 中提取 max_tokens 和 temperature（优先使用传入的值）
     model_cfg = model_config or {}
-    max_tokens_override = model_cfg.get("max_tokens")
+    state["model_config"] = model_cfg
     temperature_override = model_cfg.get("temperature")
+    if temperature_override is not None:
+        state["temperature"] = temperature_override
+    max_tokens_override = model_cfg.get("max_tokens")
+    if max_tokens_override is not None:
+        state["max_tokens"] = max_tokens_override
     
-    return AgentState(
-        # Core conversation data
-        messages=[],
-        user_input=user_input,
-        agent_response="",
-        
-        # Session information
-        session_id=session_id,
-        user_id=user_id,
-        conversation_start=now,
-        last_activity=now,
-        
-        # Tool interaction
-        tool_calls=[],
-        tool_results=[],
-        pending_tool_calls=[],
-        tool_call_count=0,  # 🆕 初始化为 0
-        
-        # Processing context
-        current_intent=None,
-        context_variables={},
-        
-        # Flow control
-        next_action=None,
-        should_continue=True,
-        error_state=None,
-        
-        # Configuration
-        model_config=model_cfg,
-        temperature=temperature_override if temperature_override is not None else 0.7,
-        max_tokens=max_tokens_override if max_tokens_override is not None else 8192,  # 🔧 优先使用传入的值
-        
-        # External history from session manager (initialized as None)
-        external_history=None
-    )
+    return state  # type: ignore[return-value]
+
+
+# Fields included in the serialized state (configuration-only and
+# bookkeeping fields such as external_history are left out)
+_SERIALIZED_STATE_FIELDS = frozenset({
+    "messages", "user_input", "agent_response",
+    "session_id", "user_id", "conversation_start", "last_activity",
+    "tool_calls", "tool_results", "pending_tool_calls",
+    "current_intent", "context_variables",
+    "next_action", "should_continue", "error_state",
+    "model_config", "temperature", "max_tokens",
+})
+
+# Compiled once; serialization of the whole state runs in pydantic-core
+_STATE_ADAPTER = TypeAdapter(AgentState)
 
 
 def state_to_dict(state: AgentState) -> Dict[str, Any]:
     """Convert AgentState to a serializable dictionary."""
-    return {
-        "messages": [msg.dict() if hasattr(msg, 'dict') else msg for msg in state["messages"]],
-        "user_input": state["user_input"],
-        "agent_response": state["agent_response"],
-        "session_id": state["session_id"],
-        "user_id": state["user_id"],
-        "conversation_start": state["conversation_start"].isoformat() if isinstance(state["conversation_start"], datetime) else state["conversation_start"],
-        "last_activity": state["last_activity"].isoformat() if isinstance(state["last_activity"], datetime) else state["last_activity"],
-        "tool_calls": [call.dict() if hasattr(call, 'dict') else call for call in state["tool_calls"]],
-        "tool_results": [result.dict() if hasattr(result, 'dict') else result for result in state["tool_results"]],
-        "pending_tool_calls": [call.dict() if hasattr(call, 'dict') else call for call in state["pending_tool_calls"]],
-        "current_intent": state["current_intent"],
-        "context_variables": state["context_variables"],
-        "next_action": state["next_action"],
-        "should_continue": state["should_continue"],
-        "error_state": state["error_state"],
-        "model_config": state["model_config"],
-        "temperature": state["temperature"],
-        "max_tokens": state["max_tokens"]
-    }
\ No newline at end of file
+    # warnings=False: graph.py may store plain dicts instead of message models
+    return _STATE_ADAPTER.dump_python(
+        state, mode="json", include=_SERIALIZED_STATE_FIELDS, warnings=False
+    )
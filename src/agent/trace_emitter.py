@@ -9,6 +9,20 @@ import time
 from typing import Any, Dict, Optional
 
 
+# 节点显示名称映射（更友好），模块级常量避免每次事件重建
+_NODE_DISPLAY_NAMES = {
+    "process_input": "处理输入",
+    "call_llm": "调用大模型",
+    "handle_tools": "执行工具",
+    "format_response": "格式化响应"
+}
+
+# 事件中文本字段的截断长度
+_MAX_TEXT_LEN = 100
+_MAX_SUMMARY_LEN = 200
+_TRUNC = "..."
+
+
 class TraceEmitter:
     """
     执行流程追踪事件发射器
@@ -21,19 +35,21 @@ class TraceEmitter:
     {
         "level": "graph" | "node",
         "type": "事件类型",
-        "timestamp": 相对毫秒数,
+        "timestamp": 相对毫秒数（整数）,
         "session_id": "会话ID",
         "data": { ... }  # 事件特定数据
     }
     """
     
+    __slots__ = ("_start_ns",)
+    
     def __init__(self):
-        """初始化事件发射器，记录起始时间"""
-        self.start_time = time.time()
+        """初始化事件发射器，记录起始时间（单调时钟，不受系统时间调整影响）"""
+        self._start_ns = time.monotonic_ns()
     
-    def _now(self) -> float:
-        """获取相对时间戳（毫秒）"""
-        return (time.time() - self.start_time) * 1000
+    def _now(self) -> int:
+        """获取相对时间戳（整数毫秒）"""
+        return (time.monotonic_ns() - self._start_ns) // 1_000_000
     
     def _emit(self, level: str, event_type: str, session_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -67,7 +83,7 @@ class TraceEmitter:
         前端展示：显示整体进度条开始
         """
         return self._emit("graph", "workflow_started", session_id, {
-            "user_input": user_input[:100] + "..." if len(user_input) > 100 else user_input
+            "user_input": user_input[:_MAX_TEXT_LEN] + _TRUNC if len(user_input) > _MAX_TEXT_LEN else user_input
         })
     
     def node_started(self, node_name: str, session_id: str) -> Dict[str, Any]:
@@ -76,17 +92,9 @@ class TraceEmitter:
         
         前端展示：节点状态指示器变为"进行中"（蓝色/加载动画）
         """
-        # 节点显示名称映射（更友好）
-        node_display_names = {
-            "process_input": "处理输入",
-            "call_llm": "调用大模型",
-            "handle_tools": "执行工具",
-            "format_response": "格式化响应"
-        }
-        
         return self._emit("graph", "node_started", session_id, {
             "node": node_name,
-            "display_name": node_display_names.get(node_name, node_name)
+            "display_name": _NODE_DISPLAY_NAMES.get(node_name, node_name)
         })
     
     def node_finished(self, node_name: str, session_id: str, duration_ms: float) -> Dict[str, Any]:
@@ -95,16 +103,9 @@ class TraceEmitter:
         
         前端展示：节点状态指示器变为"已完成"（绿色/✓），显示耗时
         """
-        node_display_names = {
-            "process_input": "处理输入",
-            "call_llm": "调用大模型",
-            "handle_tools": "执行工具",
-            "format_response": "格式化响应"
-        }
-        
         return self._emit("graph", "node_finished", session_id, {
             "node": node_name,
-            "display_name": node_display_names.get(node_name, node_name),
+            "display_name": _NODE_DISPLAY_NAMES.get(node_name, node_name),
             "duration_ms": round(duration_ms, 2)
         })
     
@@ -159,12 +160,10 @@ class TraceEmitter:
         前端展示：显示工具卡片（灰色/待执行状态），显示参数
         """
         # 参数简化（避免过长）
-        simplified_args = {}
-        for key, value in args.items():
-            if isinstance(value, str) and len(value) > 100:
-                simplified_args[key] = value[:100] + "..."
-            else:
-                simplified_args[key] = value
+        simplified_args = {
+            key: value[:_MAX_TEXT_LEN] + _TRUNC if isinstance(value, str) and len(value) > _MAX_TEXT_LEN else value
+            for key, value in args.items()
+        }
         
         return self._emit("node", "tool_call_pending", session_id, {
             "tool": tool_name,
@@ -197,7 +196,7 @@ class TraceEmitter:
         return self._emit("node", "tool_result", session_id, {
             "tool": tool_name,
             "success": success,
-            "summary": result_summary[:200] if len(result_summary) > 200 else result_summary,
+            "summary": result_summary[:_MAX_SUMMARY_LEN],
             "duration_ms": round(duration_ms, 2) if duration_ms else None
         })
     
@@ -6,22 +6,57 @@ Keys are configured via environment variables.
 """
 import os
 import logging
-from typing import Optional, List
-from fastapi import Request, HTTPException, status
+from typing import FrozenSet, Optional, List
+from fastapi import HTTPException, status
 from fastapi.security import APIKeyHeader
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
 # API Key header scheme
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+# ASGI header names are lower-cased bytes
+_API_KEY_HEADER = b"x-api-key"
 
-class APIKeyMiddleware(BaseHTTPMiddleware):
+
+def load_api_keys() -> FrozenSet[str]:
+    """Parse the comma-separated API_KEYS environment variable."""
+    keys_str = os.getenv("API_KEYS", "")
+    return frozenset(k.strip() for k in keys_str.split(",") if k.strip())
+
+
+# Valid API keys, parsed once at import instead of on every request.
+# Shared by APIKeyMiddleware and get_api_key so there is a single source of truth.
+_VALID_KEYS: FrozenSet[str] = load_api_keys()
+
+
+def reload_api_keys() -> FrozenSet[str]:
+    """
+    Re-read API_KEYS from the environment.
+    
+    Call after changing the environment (e.g. when keys are loaded from
+    config at startup, or in tests).
+    """
+    global _VALID_KEYS
+    _VALID_KEYS = load_api_keys()
+    return _VALID_KEYS
+
+
+def get_valid_api_keys() -> FrozenSet[str]:
+    """Return the current set of valid API keys."""
+    return _VALID_KEYS
+
+
+class APIKeyMiddleware:
     """
     Middleware to validate API keys for protected endpoints.
     
+    Implemented as a plain ASGI middleware (no BaseHTTPMiddleware), so
+    allowed requests are passed straight to the app without an extra task
+    or body stream wrapper.
+    
     Configuration:
         API_KEYS: Comma-separated list of valid API keys (env var)
         API_KEY_ENABLED: Set to "false" to disable auth (default: true)
@@ -33,15 +68,14 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
         - /redoc
     """
     
-    def __init__(self, app, exempt_paths: Optional[List[str]] = None):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, exempt_paths: Optional[List[str]] = None):
+        self.app = app
         
         # Load configuration
         self.enabled = os.getenv("API_KEY_ENABLED", "true").lower() != "false"
         
         # Load valid API keys from environment
-        keys_str = os.getenv("API_KEYS", "")
-        self.valid_keys = set(k.strip() for k in keys_str.split(",") if k.strip())
+        reload_api_keys()
         
         # Default exempt paths
         self.exempt_paths = exempt_paths or [
@@ -59,55 +93,75 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
             "/api/v1/conversation/",  # 对话接口使用 JWT Token 认证，豁免 API Key
         ]
         
+        # str.startswith accepts a tuple and matches all prefixes in C
+        self._exempt_prefixes = tuple(self.exempt_paths)
+        
         if self.enabled:
-            if not self.valid_keys:
+            if not _VALID_KEYS:
                 logger.warning(
                     "API key authentication enabled but no keys configured. "
                     "Set API_KEYS environment variable."
                 )
             else:
-                logger.info(f"API key authentication enabled with {len(self.valid_keys)} key(s)")
+                logger.info(f"API key authentication enabled with {len(_VALID_KEYS)} key(s)")
         else:
             logger.info("API key authentication disabled")
     
-    async def dispatch(self, request: Request, call_next):
+    @property
+    def valid_keys(self) -> FrozenSet[str]:
+        """Currently configured API keys (module-level, see reload_api_keys)."""
+        return _VALID_KEYS
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request and validate API key if required."""
         
-        # Skip if auth disabled
-        if not self.enabled:
-            return await call_next(request)
+        # Only HTTP requests are authenticated; skip if auth disabled
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
         
         # Skip OPTIONS requests (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
+        method = scope["method"]
+        if method == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
         
         # Check if path is exempt
-        path = request.url.path
-        if any(path.startswith(exempt) for exempt in self.exempt_paths):
-            return await call_next(request)
+        path = scope["path"]
+        if path.startswith(self._exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
         
         # Extract API key from header
-        api_key = request.headers.get("X-API-Key")
+        api_key = None
+        for name, value in scope["headers"]:
+            if name == _API_KEY_HEADER:
+                api_key = value.decode("latin-1")
+                break
+        
+        # Fast path: a configured key (or any key when none are configured)
+        # is accepted with a single frozenset lookup
+        valid_keys = _VALID_KEYS
+        if api_key in valid_keys or (api_key and not valid_keys):
+            logger.debug(f"API key validated for {method} {path}")
+            await self.app(scope, receive, send)
+            return
         
-        # Validate
+        # Rejected: distinguish missing from invalid keys
         if not api_key:
-            logger.warning(f"Missing API key for {request.method} {path}")
-            return JSONResponse(
+            logger.warning(f"Missing API key for {method} {path}")
+            response = JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 content={"detail": "Missing API key. Include X-API-Key header."},
                 headers={"WWW-Authenticate": "APIKey"},
             )
-        
-        if self.valid_keys and api_key not in self.valid_keys:
-            logger.warning(f"Invalid API key attempt for {request.method} {path}")
-            return JSONResponse(
+        else:
+            logger.warning(f"Invalid API key attempt for {method} {path}")
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
                 content={"detail": "Invalid API key"},
             )
-        
-        # Key valid, proceed
-        logger.debug(f"API key validated for {request.method} {path}")
-        return await call_next(request)
+        await response(scope, receive, send)
 
 
 def get_api_key(api_key: str = api_key_header) -> str:
@@ -128,10 +182,7 @@ def get_api_key(api_key: str = api_key_header) -> str:
         )
     
     # Validate against configured keys
-    keys_str = os.getenv("API_KEYS", "")
-    valid_keys = set(k.strip() for k in keys_str.split(",") if k.strip())
-    
-    if valid_keys and api_key not in valid_keys:
+    if _VALID_KEYS and api_key not in _VALID_KEYS:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API key"
@@ -11,18 +11,24 @@ Phase 3B - User Login System
 Created: 2025-11-03
 """
 
-from typing import Annotated
+import hashlib
+import time
+from typing import Annotated, List, Literal, Optional
 from datetime import timedelta
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 
 from services.auth_service import (
     hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
     create_access_token,
     create_refresh_token,
     decode_token,
@@ -30,6 +36,7 @@ from services.auth_service import (
 )
 # 🔧 延迟导入 get_session，避免在模块加载时访问未初始化的数据库
 from database.repositories.user_repository import UserRepository
+from utils.ttl_cache import TTLCache
 
 
 # ============================================
@@ -91,11 +98,105 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str = Field(..., description="Refresh Token")
 
 
+class RefreshClaims(BaseModel):
+    """Refresh Token 载荷（sub 由 pydantic-core 直接解析为 UUID）"""
+    sub: UUID
+    type: Literal["refresh"]
+    exp: int
+
+
 class MessageResponse(BaseModel):
     """通用消息响应"""
     message: str
 
 
+# ============================================
+# Token Cache
+# ============================================
+
+# 同一 Token 的连续请求直接复用已验证的用户 ID，跳过 JWT 验签；
+# 用户对象本身由 UserRepository 的用户缓存提供，更新用户时即可失效
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_SIZE = 10_000
+
+_token_user_id_cache: TTLCache[UUID] = TTLCache(maxsize=TOKEN_CACHE_MAX_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+
+def _token_cache_key(token: str) -> bytes:
+    """Token 缓存键（摘要，避免在内存中长期保存原始 Token）"""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+def invalidate_token_cache(token: Optional[str] = None) -> None:
+    """
+    失效 Token 缓存
+    
+    Args:
+        token: 要失效的 Token；为 None 时清空全部缓存
+    """
+    if token is None:
+        _token_user_id_cache.clear()
+    else:
+        _token_user_id_cache.pop(_token_cache_key(token))
+
+
+# ============================================
+# Login Failure Limiter
+# ============================================
+
+# 同一 IP + 用户名在窗口期内失败次数超限后直接返回 429，
+# 不再调用昂贵的密码哈希校验（进程内计数，多实例部署时各自独立计数）
+LOGIN_MAX_FAILURES = 5
+LOGIN_FAILURE_WINDOW_SECONDS = 60
+LOGIN_FAILURE_MAX_SIZE = 10_000
+
+# 值为可变计数器 [count]：原地递增，窗口从第一次失败开始计时（类似 Redis INCR + EX）
+_login_failures: TTLCache[List[int]] = TTLCache(
+    maxsize=LOGIN_FAILURE_MAX_SIZE, ttl=LOGIN_FAILURE_WINDOW_SECONDS
+)
+
+# 用户不存在时用于假校验的哈希，保持响应时间一致，避免用户名枚举；
+# 在模块加载时生成，首个未知用户名的请求也不会多付一次哈希的耗时
+_DUMMY_PASSWORD_HASH = hash_password("dummy-password-for-timing")
+
+
+def _login_failure_key(request: Request, username: str) -> str:
+    client_ip = request.client.host if request.client else ""
+    return f"{client_ip}:{username.lower()}"
+
+
+def _check_login_allowed(key: str) -> None:
+    """失败次数超限时抛出 429"""
+    counter = _login_failures.get(key)
+    if counter is not None and counter[0] >= LOGIN_MAX_FAILURES:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="登录失败次数过多，请稍后再试",
+            headers={"Retry-After": str(LOGIN_FAILURE_WINDOW_SECONDS)},
+        )
+
+
+def _record_login_failure(key: str) -> None:
+    counter = _login_failures.get(key)
+    if counter is None:
+        _login_failures.set(key, [1])
+    else:
+        counter[0] += 1
+
+
+def reset_login_failures(key: Optional[str] = None) -> None:
+    """
+    清除登录失败计数
+    
+    Args:
+        key: 要清除的计数键；为 None 时清空全部
+    """
+    if key is None:
+        _login_failures.clear()
+    else:
+        _login_failures.pop(key)
+
+
 # ============================================
 # Dependency: Get Current User
 # ============================================
@@ -123,32 +224,37 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # 解码 Token
-    payload = decode_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    # 检查 Token 类型
-    if payload.get("type") != "access":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token 类型错误",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # 获取用户 ID
-    user_id_str: str = payload.get("sub")
-    if user_id_str is None:
-        raise credentials_exception
+    cache_key = _token_cache_key(token)
+    user_id = _token_user_id_cache.get(cache_key)
+    payload = None
     
-    try:
-        user_id = UUID(user_id_str)
-    except ValueError:
-        raise credentials_exception
+    if user_id is None:
+        # 解码 Token
+        payload = decode_token(token)
+        if payload is None:
+            raise credentials_exception
+        
+        # 检查 Token 类型
+        if payload.get("type") != "access":
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token 类型错误",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # 获取用户 ID
+        user_id_str: str = payload.get("sub")
+        if user_id_str is None:
+            raise credentials_exception
+        
+        try:
+            user_id = UUID(user_id_str)
+        except ValueError:
+            raise credentials_exception
     
-    # 从数据库查询用户
+    # 查询用户（优先命中用户缓存）
     user_repo = UserRepository(session)
-    user = await user_repo.get_user_by_id(user_id)
+    user = await user_repo.get_cached_user_by_id(user_id)
     
     if user is None:
         raise credentials_exception
@@ -159,6 +265,14 @@ async def get_current_user(
             detail="用户已被禁用"
         )
     
+    if payload is not None:
+        # 缓存有效期不超过 Token 自身的过期时间
+        ttl = TOKEN_CACHE_TTL_SECONDS
+        exp = payload.get("exp")
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        _token_user_id_cache.set(cache_key, user_id, ttl=ttl)
+    
     return user
 
 
@@ -166,6 +280,47 @@ async def get_current_user(
 # API Endpoints
 # ============================================
 
+# Token 响应中的固定字段，模块加载时计算一次
+_ACCESS_TOKEN_DELTA = timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+_ACCESS_TOKEN_EXPIRES_IN = JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def _issue_token_pair(user_id: str) -> dict:
+    """签发 Access/Refresh Token，返回与 UserLoginResponse 字段一致的字典"""
+    claims = {"sub": user_id}
+    return {
+        "access_token": create_access_token(claims, _ACCESS_TOKEN_DELTA),
+        "refresh_token": create_refresh_token(claims),
+        "token_type": "bearer",
+        "expires_in": _ACCESS_TOKEN_EXPIRES_IN,
+    }
+
+
+def _token_response(user_id: UUID) -> ORJSONResponse:
+    """
+    生成 Access/Refresh Token 并直接返回 JSON 响应
+    
+    直接返回 Response 时 FastAPI 会跳过 response_model 的校验与序列化，
+    response_model 仅用于 OpenAPI 文档。
+    """
+    return ORJSONResponse(_issue_token_pair(str(user_id)))
+
+
+def _raise_if_conflicts(username_taken: bool, email_taken: bool) -> None:
+    """用户名或邮箱已被占用时抛出 400"""
+    if username_taken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用户名已被使用"
+        )
+    
+    if email_taken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="邮箱已被注册"
+        )
+
+
 @router.post(
     "/auth/register",
     response_model=MessageResponse,
@@ -203,24 +358,11 @@ async def register_user(
     """
     user_repo = UserRepository(session)
     
-    # 检查用户名是否已存在
-    existing_user = await user_repo.get_user_by_username(request.username)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="用户名已被使用"
-        )
-    
-    # 检查邮箱是否已存在
-    existing_email = await user_repo.get_user_by_email(request.email)
-    if existing_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="邮箱已被注册"
-        )
+    # 检查用户名和邮箱是否已存在（单次查询）
+    _raise_if_conflicts(*await user_repo.get_conflicts(request.username, request.email))
     
     # 哈希密码
-    hashed_password = hash_password(request.password)
+    hashed_password = await hash_password_async(request.password)
     
     # 创建用户
     try:
@@ -233,6 +375,15 @@ async def register_user(
         
         return MessageResponse(message="用户注册成功")
     
+    except IntegrityError:
+        # 并发注册：检查与插入之间被抢占，由数据库唯一约束兜底
+        await session.rollback()
+        _raise_if_conflicts(*await user_repo.get_conflicts(request.username, request.email))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="用户名或邮箱已存在"
+        )
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -247,6 +398,7 @@ async def register_user(
     description="使用用户名和密码登录，返回 JWT Token"
 )
 async def login_user(
+    request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     session: AsyncSession = Depends(get_db_session)
 ):
@@ -255,6 +407,7 @@ async def login_user(
     
     - 验证用户名和密码
     - 生成 Access Token 和 Refresh Token
+    - 同一 IP + 用户名连续失败过多时返回 429
     
     **请求参数** (application/x-www-form-urlencoded):
     - username: 用户名
@@ -270,26 +423,28 @@ async def login_user(
     }
     ```
     """
+    failure_key = _login_failure_key(request, form_data.username)
+    _check_login_allowed(failure_key)
+    
     user_repo = UserRepository(session)
     
     # 查询用户
     user = await user_repo.get_user_by_username(form_data.username)
     
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="用户名或密码错误",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    # 验证密码（用户不存在时对假哈希校验，保持耗时一致）
+    hashed_password = user.hashed_password if user else _DUMMY_PASSWORD_HASH
+    password_ok = await verify_password_async(form_data.password, hashed_password)
     
-    # 验证密码
-    if not verify_password(form_data.password, user.hashed_password):
+    if not user or not password_ok:
+        _record_login_failure(failure_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    reset_login_failures(failure_key)
+    
     # 检查用户是否激活
     if not user.is_active:
         raise HTTPException(
@@ -297,22 +452,13 @@ async def login_user(
             detail="用户已被禁用"
         )
     
-    # 生成 Token
-    access_token = create_access_token(
-        data={"sub": str(user.user_id)},
-        expires_delta=timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    
-    refresh_token = create_refresh_token(
-        data={"sub": str(user.user_id)}
-    )
+    # 旧 bcrypt 哈希在登录成功后升级为 Argon2id
+    if password_needs_rehash(user.hashed_password):
+        new_hash = await hash_password_async(form_data.password)
+        await user_repo.update_user(user.user_id, hashed_password=new_hash)
     
-    return UserLoginResponse(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        token_type="bearer",
-        expires_in=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    )
+    # 生成 Token
+    return _token_response(user.user_id)
 
 
 @router.get(
@@ -394,59 +540,25 @@ async def refresh_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # 检查 Token 类型
-    if payload.get("type") != "refresh":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token 类型错误",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # 获取用户 ID
-    user_id_str = payload.get("sub")
-    if not user_id_str:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token 数据无效"
-        )
-    
+    # 校验载荷（类型、用户 ID、过期时间）
     try:
-        user_id = UUID(user_id_str)
-    except ValueError:
+        claims = RefreshClaims.model_validate(payload)
+    except ValidationError as e:
+        wrong_type = any(err["loc"] == ("type",) for err in e.errors())
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="用户 ID 格式错误"
+            detail="Token 类型错误" if wrong_type else "Token 数据无效",
+            headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # 验证用户是否存在
+    # 验证用户存在且已激活（优先命中用户缓存；不存在与已禁用统一返回 401）
     user_repo = UserRepository(session)
-    user = await user_repo.get_user_by_id(user_id)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-    
-    if not user.is_active:
+    if await user_repo.get_active_user_id(claims.sub) is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="用户已被禁用"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的 Refresh Token",
+            headers={"WWW-Authenticate": "Bearer"},
         )
     
     # 生成新的 Token
-    new_access_token = create_access_token(
-        data={"sub": str(user.user_id)},
-        expires_delta=timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    
-    new_refresh_token = create_refresh_token(
-        data={"sub": str(user.user_id)}
-    )
-    
-    return UserLoginResponse(
-        access_token=new_access_token,
-        refresh_token=new_refresh_token,
-        token_type="bearer",
-        expires_in=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    )
+    return _token_response(claims.sub)
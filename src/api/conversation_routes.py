@@ -4,35 +4,37 @@ Conversation API Routes
 智能对话接口，支持文本/语音输入，文本/语音输出。
 """
 
-import json
+import base64
+import hashlib
 import logging
-import uuid
+import re
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request, Body
-from fastapi.responses import StreamingResponse, JSONResponse
-from pydantic import BaseModel, Field
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import orjson
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request, Body, Query, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse, JSONResponse
+from pydantic import BaseModel, Field, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from services.conversation_service import (
     get_conversation_service,
     ConversationService,
     InputMode,
-    OutputMode
+    OutputMode,
+    new_conversation_session_id
 )
-from database.connection import get_session
 from database.repositories.session_repository import SessionRepository
 from database.repositories.message_repository import MessageRepository
 from api.models import (
     SessionListResponse, 
-    SessionListItem, 
     SessionDetailResponse, 
-    MessageDetail,
     SessionCreateRequest,
     SessionCreateResponse
 )
-from api.auth_routes import get_current_user
+from api.auth_routes import get_current_user, get_db_session
 from database.models import User
+from utils.ttl_cache import TTLCache
 
 
 logger = logging.getLogger(__name__)
@@ -42,25 +44,187 @@ logger = logging.getLogger(__name__)
 # Database Dependency (使用统一的 get_session)
 # ============================================
 
-async def get_db():
-    """数据库会话依赖（兼容层）"""
-    async for session in get_session():
-        yield session
-
-
-# 自定义 JSON 编码器处理 datetime 对象
-class DateTimeEncoder(json.JSONEncoder):
-    """JSON encoder that handles datetime objects"""
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+# 与 get_current_user 依赖同一个函数：FastAPI 在一次请求内缓存依赖结果，
+# 鉴权查询与业务查询共用同一个 AsyncSession，每个请求只借用一个连接
+get_db = get_db_session
 
 
 # 创建路由
 conversation_router = APIRouter(prefix="/conversation", tags=["Conversation"])
 
 
+# 输出模式查找表：用 dict.get 代替 OutputMode(value) + 捕获 ValueError
+_OUTPUT_MODES = {mode.value: mode for mode in OutputMode}
+_OUTPUT_MODES_HINT = ", ".join(_OUTPUT_MODES)
+
+
+def parse_output_mode(value: str) -> OutputMode:
+    """
+    解析输出模式
+    
+    Raises:
+        HTTPException: 不支持的输出模式 (400)
+    """
+    mode = _OUTPUT_MODES.get(value)
+    if mode is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的输出模式: {value}。支持: {_OUTPUT_MODES_HINT}"
+        )
+    return mode
+
+
+# X-User-Input 响应头最多携带的字符数
+HEADER_TEXT_MAX_CHARS = 100
+
+# urllib.parse.quote 默认不转义的字符之外的连续片段
+_URL_UNSAFE_RUN = re.compile(r"[^A-Za-z0-9_.\-~/]+")
+
+
+def _percent_encode_run(match: "re.Match[str]") -> str:
+    # 整段 UTF-8 字节一次 hex 编码，结果与 quote() 逐字节编码完全一致
+    return "%" + match.group().encode("utf-8").hex("%").upper()
+
+
+def encode_header_text(text: str, max_chars: int = HEADER_TEXT_MAX_CHARS) -> str:
+    """
+    将文本截断并编码为可放入 HTTP 头的字符串
+    
+    纯 ASCII 可打印且不含 '%' 的文本 URL 编码前后解码结果相同，直接返回；
+    其余（如中文）使用 URL 编码（与 urllib.parse.quote 输出相同）以避免 HTTP 头部编码错误。
+    中文按连续片段编码，而不是 quote 的逐字节 Python 循环。
+    """
+    head = text[:max_chars]
+    if head.isascii() and head.isprintable() and "%" not in head:
+        return head
+    return _URL_UNSAFE_RUN.sub(_percent_encode_run, head)
+
+
+_CONTENT_DISPOSITION_TEMPLATE = "attachment; filename=response_%s.mp3"
+
+
+def stream_response_headers(
+    session_id: str,
+    user_input: str,
+    voice: str,
+    audio_format: Optional[str] = None
+) -> dict:
+    """
+    构造流式语音响应头
+    
+    用户输入为空时不设置 X-User-Input；audio_format 仅在语音输入时提供。
+    """
+    headers = {
+        "X-Session-Id": session_id,
+        "X-Voice": voice,
+        "Content-Disposition": _CONTENT_DISPOSITION_TEMPLATE % session_id,
+    }
+    if user_input:
+        # 对中文进行 URL 编码以避免 HTTP 头部编码错误
+        headers["X-User-Input"] = encode_header_text(user_input)
+    if audio_format is not None:
+        headers["X-Audio-Format"] = audio_format
+    return headers
+
+
+# 上传音频的读取块大小与上限（STT 支持最长 60 秒音频，压缩/WAV 文件远小于此上限）
+AUDIO_READ_CHUNK_SIZE = 64 * 1024
+MAX_AUDIO_UPLOAD_BYTES = 20 * 1024 * 1024
+
+
+async def read_audio_upload(audio: UploadFile, max_bytes: int = MAX_AUDIO_UPLOAD_BYTES) -> bytes:
+    """
+    分块读取上传的音频文件
+    
+    超过上限时立即返回 413，而不是先把整个文件读入内存再校验。
+    
+    Args:
+        audio: 上传的音频文件
+        max_bytes: 允许的最大字节数
+    
+    Returns:
+        音频数据
+    """
+    if audio.size is not None and audio.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"音频文件过大（最大 {max_bytes} bytes）")
+    
+    buffer = bytearray()
+    while chunk := await audio.read(AUDIO_READ_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"音频文件过大（最大 {max_bytes} bytes）")
+    
+    if not buffer:
+        raise HTTPException(status_code=400, detail="音频文件为空")
+    
+    return bytes(buffer)
+
+
+async def iter_audio_body(
+    request: Request,
+    max_bytes: int = MAX_AUDIO_UPLOAD_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    逐块产出原始音频请求体（application/octet-stream 或 audio/*）
+    
+    Content-Length 超限时不读取请求体直接返回 413；
+    分块传输时累计超限同样返回 413。
+    
+    Args:
+        request: 请求对象
+        max_bytes: 允许的最大字节数
+    
+    Yields:
+        音频数据块
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"音频文件过大（最大 {max_bytes} bytes）")
+    
+    received = 0
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"音频文件过大（最大 {max_bytes} bytes）")
+        yield chunk
+    
+    if not received:
+        raise HTTPException(status_code=400, detail="音频文件为空")
+
+
+async def read_audio_body(request: Request, max_bytes: int = MAX_AUDIO_UPLOAD_BYTES) -> bytes:
+    """
+    直接从请求体读取原始音频（application/octet-stream 或 audio/*）
+    
+    逐块消费 request.stream()，跳过 multipart 解析和临时文件落盘；
+    Content-Length 超限时不读取请求体直接返回 413。
+    
+    Args:
+        request: 请求对象
+        max_bytes: 允许的最大字节数
+    
+    Returns:
+        音频数据
+    """
+    buffer = bytearray()
+    async for chunk in iter_audio_body(request, max_bytes):
+        buffer += chunk
+    return bytes(buffer)
+
+
+def audio_filename_from_headers(request: Request) -> Optional[str]:
+    """从 X-Audio-Filename / X-Audio-Format 请求头获取用于格式检测的文件名"""
+    filename = request.headers.get("x-audio-filename")
+    if filename:
+        return filename
+    audio_format = request.headers.get("x-audio-format")
+    if audio_format:
+        return f"audio.{audio_format.lstrip('.').lower()}"
+    return None
+
+
 # 请求/响应模型
 class ConversationRequest(BaseModel):
     """对话请求（纯文本输入）"""
@@ -74,6 +238,33 @@ class ConversationRequest(BaseModel):
     user_id: Optional[str] = Field(default=None, description="用户ID")
 
 
+async def parse_conversation_request(request: Request) -> ConversationRequest:
+    """
+    依赖注入：解析 ConversationRequest 请求体
+    
+    直接对原始请求体调用 model_validate_json，JSON 解析与校验在 pydantic-core 中
+    一次完成，省去 FastAPI 默认的 json.loads → dict → 校验 两步。
+    校验失败时抛出 RequestValidationError，与 FastAPI 的 422 响应格式一致。
+    """
+    body = await request.body()
+    try:
+        return ConversationRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)],
+            body=body
+        )
+
+
+# 请求体不经 FastAPI 解析时，为 OpenAPI 文档补充请求体结构
+_CONVERSATION_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ConversationRequest.model_json_schema()}},
+    }
+}
+
+
 class ConversationResponse(BaseModel):
     """对话响应"""
     success: bool = Field(..., description="是否成功")
@@ -89,9 +280,66 @@ class ConversationResponse(BaseModel):
     timestamp: str = Field(..., description="时间戳")
 
 
+# 响应字段（结果字典中的 audio_data、text 等内部字段不返回给客户端）
+_CONVERSATION_RESPONSE_FIELDS = tuple(ConversationResponse.model_fields)
+
+
+def conversation_response(result: Dict[str, Any]) -> ORJSONResponse:
+    """
+    将对话结果直接编码为 JSON 响应
+    
+    结果字典由 ConversationService 构造，字段已符合 ConversationResponse，
+    只按字段投影后交给 orjson，跳过模型校验和二次序列化；
+    response_model 仅用于 OpenAPI 文档。
+    """
+    return ORJSONResponse({field: result.get(field) for field in _CONVERSATION_RESPONSE_FIELDS})
+
+
+def weak_etag(*parts: Any) -> str:
+    """根据版本信息（数量、最后活跃时间等）生成弱 ETag"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 是否命中 ETag
+    
+    按弱比较处理：忽略 W/ 前缀，支持逗号分隔的多个值和 "*"。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """304 响应：客户端缓存仍然有效，不查询数据、不序列化"""
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def encode_session_cursor(last_activity: datetime, session_id: str) -> str:
+    """将列表最后一条会话的排序键编码为不透明游标"""
+    raw = orjson.dumps([last_activity.isoformat(), session_id])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_session_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标；格式错误时返回 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_activity, session_id = orjson.loads(raw)
+        return datetime.fromisoformat(last_activity), str(session_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="无效的分页游标") from e
+
+
 # 依赖注入
-def get_conv_service() -> ConversationService:
-    """获取对话服务实例"""
+# 依赖均为 async def：同步依赖会被 FastAPI 放入线程池执行，每个请求多一次线程切换
+async def get_conv_service() -> ConversationService:
+    """获取对话服务实例（服务可能因配置缺失未初始化，此时返回 503）"""
     service = get_conversation_service()
     if service is None:
         raise HTTPException(
@@ -101,17 +349,23 @@ def get_conv_service() -> ConversationService:
     return service
 
 
+async def get_conv_session_manager(request: Request) -> Optional[Any]:
+    """获取会话历史管理器（HybridSessionManager 或内存版 SessionHistoryManager，未初始化时返回 None）"""
+    return getattr(request.app.state, 'session_manager', None)
+
+
 @conversation_router.post(
     "/message",
     response_model=ConversationResponse,
     summary="发送对话消息（文本输入）",
-    description="发送文本消息给智能体，支持文本或语音回复"
+    description="发送文本消息给智能体，支持文本或语音回复",
+    openapi_extra=_CONVERSATION_REQUEST_OPENAPI
 )
 async def send_text_message(
-    request: ConversationRequest,
+    request: ConversationRequest = Depends(parse_conversation_request),
     service: ConversationService = Depends(get_conv_service),
-    fastapi_request: Request = None  # ✅ 添加 Request 依赖
-) -> ConversationResponse:
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
+) -> ORJSONResponse:
     """
     文本输入对话接口
     
@@ -174,13 +428,7 @@ async def send_text_message(
     """
     try:
         # 验证输出模式
-        try:
-            output_mode = OutputMode(request.output_mode)
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的输出模式: {request.output_mode}。支持: text, audio, both"
-            )
+        output_mode = parse_output_mode(request.output_mode)
         
         # 对于音频输出，建议使用流式端点
         if output_mode == OutputMode.AUDIO:
@@ -200,18 +448,18 @@ async def send_text_message(
             pitch=request.pitch,
             session_id=request.session_id,
             user_id=request.user_id,
-            session_manager=getattr(fastapi_request.app.state, 'session_manager', None)  # ✅ 传递 session_manager
+            session_manager=session_manager
         )
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result.get("error", "处理失败"))
         
-        return ConversationResponse(**result)
+        return conversation_response(result)
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"对话处理失败: {e}", exc_info=True)
+        logger.error("对话处理失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"对话处理失败: {str(e)}")
 
 
@@ -219,7 +467,7 @@ async def send_text_message(
     "/message-audio",
     response_model=ConversationResponse,
     summary="发送对话消息（语音输入）",
-    description="上传语音消息给智能体，支持文本或语音回复"
+    description="上传语音消息给智能体，支持文本或语音回复（multipart 上传；生产环境推荐使用 /message-audio-raw）"
 )
 async def send_audio_message(
     audio: UploadFile = File(..., description="音频文件"),
@@ -231,14 +479,17 @@ async def send_audio_message(
     session_id: Optional[str] = Form(default=None, description="会话ID"),
     user_id: Optional[str] = Form(default=None, description="用户ID"),
     service: ConversationService = Depends(get_conv_service),
-    fastapi_request: Request = None  # ✅ 添加 Request 依赖
-) -> ConversationResponse:
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
+) -> ORJSONResponse:
     """
     语音输入对话接口
     
     **输入**: 语音文件（自动识别）
     **输出**: 可选文本/语音/两者
     
+    **推荐**: 生产环境使用 POST /message-audio-raw，以原始请求体上传音频，
+    跳过 multipart 解析（纯 Python 逐字节解析）和临时文件落盘。
+    
     **示例 1 - 语音输入，文本回复**:
     ```bash
     curl -X POST "http://localhost:8000/api/v1/conversation/message-audio" \\
@@ -305,66 +556,143 @@ async def send_audio_message(
     }
     ```
     """
+    # 对于音频输出，建议使用流式端点（先于读取上传内容校验）
+    output_mode_enum = parse_output_mode(output_mode)
+    if output_mode_enum == OutputMode.AUDIO:
+        raise HTTPException(
+            status_code=400,
+            detail="音频输出请使用流式端点: POST /api/v1/conversation/message-audio-stream"
+        )
+    
+    # 读取音频数据
+    audio_data = await read_audio_upload(audio)
+    
+    return await _process_audio_message(
+        service,
+        audio_data=audio_data,
+        audio_filename=audio.filename,
+        output_mode=output_mode_enum,
+        voice=voice,
+        speed=speed,
+        volume=volume,
+        pitch=pitch,
+        session_id=session_id,
+        user_id=user_id,
+        session_manager=session_manager
+    )
+
+
+async def _process_audio_message(
+    service: ConversationService,
+    audio_data: bytes,
+    audio_filename: Optional[str],
+    output_mode: OutputMode,
+    voice: str,
+    speed: int,
+    volume: int,
+    pitch: int,
+    session_id: Optional[str],
+    user_id: Optional[str],
+    session_manager: Optional[Any]
+) -> ORJSONResponse:
+    """语音输入对话（multipart 与原始请求体两种上传方式共用）"""
     try:
-        # 验证输出模式
-        try:
-            output_mode_enum = OutputMode(output_mode)
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的输出模式: {output_mode}。支持: text, audio, both"
-            )
-        
-        # 对于音频输出，建议使用流式端点
-        if output_mode_enum == OutputMode.AUDIO:
-            raise HTTPException(
-                status_code=400,
-                detail="音频输出请使用流式端点: POST /api/v1/conversation/message-audio-stream"
-            )
-        
-        # 读取音频数据
-        audio_data = await audio.read()
-        
-        if not audio_data:
-            raise HTTPException(status_code=400, detail="音频文件为空")
-        
         # 处理对话
         result = await service.process_conversation(
             audio_data=audio_data,
-            audio_filename=audio.filename,
+            audio_filename=audio_filename,
             input_mode=InputMode.AUDIO,
-            output_mode=output_mode_enum,
+            output_mode=output_mode,
             voice=voice,
             speed=speed,
             volume=volume,
             pitch=pitch,
             session_id=session_id,
             user_id=user_id,
-            session_manager=getattr(fastapi_request.app.state, 'session_manager', None)  # ✅ 传递 session_manager
+            session_manager=session_manager
         )
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result.get("error", "处理失败"))
         
-        return ConversationResponse(**result)
+        return conversation_response(result)
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"语音对话处理失败: {e}", exc_info=True)
+        logger.error("语音对话处理失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"语音对话处理失败: {str(e)}")
 
 
+@conversation_router.post(
+    "/message-audio-raw",
+    response_model=ConversationResponse,
+    summary="发送对话消息（语音输入，原始请求体）",
+    description="以原始请求体上传语音（无 multipart），参数通过查询字符串传递"
+)
+async def send_audio_message_raw(
+    request: Request,
+    output_mode: str = Query(default="text", description="输出模式: text, both"),
+    voice: str = Query(default="x5_lingxiaoxuan_flow", description="TTS发音人"),
+    speed: int = Query(default=50, ge=0, le=100, description="语速"),
+    volume: int = Query(default=50, ge=0, le=100, description="音量"),
+    pitch: int = Query(default=50, ge=0, le=100, description="音调"),
+    session_id: Optional[str] = Query(default=None, description="会话ID"),
+    user_id: Optional[str] = Query(default=None, description="用户ID"),
+    service: ConversationService = Depends(get_conv_service),
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
+) -> ORJSONResponse:
+    """
+    语音输入对话接口（原始请求体上传）
+    
+    与 /message-audio 相同，但请求体即音频数据，服务端逐块读取，
+    不经过 multipart 解析。音频格式通过 X-Audio-Filename 或 X-Audio-Format 指定
+    （缺省时按文件头自动检测）。
+    
+    **示例**:
+    ```bash
+    curl -X POST "http://localhost:8000/api/v1/conversation/message-audio-raw?output_mode=text" \\
+         -H "X-API-Key: dev-test-key-123" \\
+         -H "Content-Type: application/octet-stream" \\
+         -H "X-Audio-Format: mp3" \\
+         --data-binary "@question.mp3"
+    ```
+    """
+    output_mode_enum = parse_output_mode(output_mode)
+    if output_mode_enum == OutputMode.AUDIO:
+        raise HTTPException(
+            status_code=400,
+            detail="音频输出请使用流式端点: POST /api/v1/conversation/message-audio-stream-raw"
+        )
+    
+    audio_data = await read_audio_body(request)
+    
+    return await _process_audio_message(
+        service,
+        audio_data=audio_data,
+        audio_filename=audio_filename_from_headers(request),
+        output_mode=output_mode_enum,
+        voice=voice,
+        speed=speed,
+        volume=volume,
+        pitch=pitch,
+        session_id=session_id,
+        user_id=user_id,
+        session_manager=session_manager
+    )
+
+
 @conversation_router.post(
     "/message-stream",
     response_class=StreamingResponse,
     summary="发送对话消息（文本输入，流式语音输出）",
-    description="发送文本消息，以流式方式接收语音回复"
+    description="发送文本消息，以流式方式接收语音回复",
+    openapi_extra=_CONVERSATION_REQUEST_OPENAPI
 )
 async def send_text_message_stream(
-    request: ConversationRequest,
+    request: ConversationRequest = Depends(parse_conversation_request),
     service: ConversationService = Depends(get_conv_service),
-    fastapi_request: Request = None  # ✅ 添加 Request 依赖
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
 ):
     """
     文本输入，流式语音输出
@@ -395,13 +723,7 @@ async def send_text_message_stream(
     """
     try:
         # 验证输出模式（流式只支持 audio）
-        try:
-            output_mode = OutputMode(request.output_mode)
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的输出模式: {request.output_mode}"
-            )
+        output_mode = parse_output_mode(request.output_mode)
         
         if output_mode != OutputMode.AUDIO:
             raise HTTPException(
@@ -409,58 +731,30 @@ async def send_text_message_stream(
                 detail="流式端点仅支持 output_mode=audio"
             )
         
-        # 1. 处理输入（文本）
-        user_input, input_metadata = await service.process_input(
+        # 处理输入，智能体生成与语音合成在响应流中流水线进行
+        user_input, _, session_id, audio_stream = await service.process_conversation_stream(
             text=request.text,
-            input_mode=InputMode.TEXT
-        )
-        
-        # 2. 获取智能体回复
-        agent_response, session_id, agent_metadata = await service.get_agent_response(
-            user_input=user_input,
+            input_mode=InputMode.TEXT,
+            voice=request.voice,
+            speed=request.speed,
+            volume=request.volume,
+            pitch=request.pitch,
             session_id=request.session_id,
             user_id=request.user_id,
-            session_manager=getattr(fastapi_request.app.state, 'session_manager', None)  # ✅ 传递 session_manager
+            session_manager=session_manager
         )
         
-        logger.info(f"流式输出: session={session_id}, response={agent_response[:100]}...")
-        
-        # 3. 流式生成音频
-        async def audio_generator():
-            """生成音频流"""
-            try:
-                async for chunk in service.generate_output_audio_stream(
-                    response_text=agent_response,
-                    voice=request.voice,
-                    speed=request.speed,
-                    volume=request.volume,
-                    pitch=request.pitch
-                ):
-                    yield chunk
-            except Exception as e:
-                logger.error(f"流式音频生成失败: {e}")
-                raise
-        
         # 返回流式响应
-        # 对中文进行 URL 编码以避免 HTTP 头部编码错误
-        from urllib.parse import quote
-        user_input_encoded = quote(user_input[:100])
-        
         return StreamingResponse(
-            audio_generator(),
+            audio_stream,
             media_type="audio/mpeg",
-            headers={
-                "X-Session-Id": session_id,
-                "X-User-Input": user_input_encoded,
-                "X-Voice": request.voice,
-                "Content-Disposition": f"attachment; filename=response_{session_id}.mp3"
-            }
+            headers=stream_response_headers(session_id, user_input, request.voice)
         )
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"流式对话失败: {e}", exc_info=True)
+        logger.error("流式对话失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"流式对话失败: {str(e)}")
 
 
@@ -468,7 +762,7 @@ async def send_text_message_stream(
     "/message-audio-stream",
     response_class=StreamingResponse,
     summary="发送对话消息（语音输入，流式语音输出）",
-    description="上传语音消息，以流式方式接收语音回复（完整语音对话）"
+    description="上传语音消息，以流式方式接收语音回复（完整语音对话；生产环境推荐使用 /message-audio-stream-raw）"
 )
 async def send_audio_message_stream(
     audio: UploadFile = File(..., description="音频文件"),
@@ -479,11 +773,13 @@ async def send_audio_message_stream(
     session_id: Optional[str] = Form(default=None, description="会话ID"),
     user_id: Optional[str] = Form(default=None, description="用户ID"),
     service: ConversationService = Depends(get_conv_service),
-    fastapi_request: Request = None  # ✅ 添加 Request 依赖
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
 ):
     """
     完整的语音对话（语音输入 → 语音输出）
     
+    **推荐**: 生产环境使用 POST /message-audio-stream-raw（原始请求体上传，跳过 multipart 解析）。
+    
     **流程**:
     1. 上传语音文件
     2. 自动语音识别（STT）
@@ -557,95 +853,141 @@ async def send_audio_message_stream(
     - X-Voice: 使用的发音人
     - 流式返回音频数据
     """
+    # 读取音频数据
+    audio_data = await read_audio_upload(audio)
+    
+    return await _stream_audio_reply(
+        service,
+        audio_data=audio_data,
+        audio_filename=audio.filename,
+        voice=voice,
+        speed=speed,
+        volume=volume,
+        pitch=pitch,
+        session_id=session_id,
+        user_id=user_id,
+        session_manager=session_manager
+    )
+
+
+async def _stream_audio_reply(
+    service: ConversationService,
+    audio_data: Optional[bytes],
+    audio_filename: Optional[str],
+    voice: str,
+    speed: int,
+    volume: int,
+    pitch: int,
+    session_id: Optional[str],
+    user_id: Optional[str],
+    session_manager: Optional[Any],
+    audio_chunks: Optional[AsyncIterator[bytes]] = None
+) -> StreamingResponse:
+    """语音输入、流式语音输出（multipart 与原始请求体两种上传方式共用）"""
     try:
-        # 读取音频数据
-        audio_data = await audio.read()
-        
-        if not audio_data:
-            raise HTTPException(status_code=400, detail="音频文件为空")
-        
-        # 1. 处理输入（语音 → 文本）
-        user_input, input_metadata = await service.process_input(
+        # 语音识别，智能体生成与语音合成在响应流中流水线进行
+        user_input, input_metadata, session_id, audio_stream = await service.process_conversation_stream(
             audio_data=audio_data,
-            audio_filename=audio.filename,
-            input_mode=InputMode.AUDIO
-        )
-        
-        logger.info(f"语音识别结果: {user_input}")
-        
-        # 2. 获取智能体回复
-        agent_response, session_id_result, agent_metadata = await service.get_agent_response(
-            user_input=user_input,
+            audio_filename=audio_filename,
+            input_mode=InputMode.AUDIO,
+            voice=voice,
+            speed=speed,
+            volume=volume,
+            pitch=pitch,
             session_id=session_id,
             user_id=user_id,
-            session_manager=getattr(fastapi_request.app.state, 'session_manager', None)  # ✅ 传递 session_manager
+            session_manager=session_manager,
+            audio_chunks=audio_chunks
         )
         
-        logger.info(f"智能体回复: {agent_response[:100]}...")
-        
-        # 3. 流式生成音频
-        async def audio_generator():
-            """生成音频流"""
-            try:
-                async for chunk in service.generate_output_audio_stream(
-                    response_text=agent_response,
-                    voice=voice,
-                    speed=speed,
-                    volume=volume,
-                    pitch=pitch
-                ):
-                    yield chunk
-            except Exception as e:
-                logger.error(f"流式音频生成失败: {e}")
-                raise
+        logger.info("语音识别结果: %s", user_input)
         
         # 返回流式响应
-        # 对中文进行 URL 编码以避免 HTTP 头部编码错误
-        from urllib.parse import quote
-        user_input_encoded = quote(user_input[:100])
-        
         return StreamingResponse(
-            audio_generator(),
+            audio_stream,
             media_type="audio/mpeg",
-            headers={
-                "X-Session-Id": session_id_result,
-                "X-User-Input": user_input_encoded,
-                "X-Voice": voice,
-                "X-Audio-Format": input_metadata.get("audio_format", "unknown"),
-                "Content-Disposition": f"attachment; filename=response_{session_id_result}.mp3"
-            }
+            headers=stream_response_headers(
+                session_id,
+                user_input,
+                voice,
+                audio_format=input_metadata.get("audio_format", "unknown")
+            )
         )
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"语音对话失败: {e}", exc_info=True)
+        logger.error("语音对话失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"语音对话失败: {str(e)}")
 
 
-@conversation_router.get(
-    "/status",
-    summary="对话服务状态",
-    description="检查对话服务的可用性"
+@conversation_router.post(
+    "/message-audio-stream-raw",
+    response_class=StreamingResponse,
+    summary="发送对话消息（语音输入原始请求体，流式语音输出）",
+    description="以原始请求体上传语音（无 multipart），以流式方式接收语音回复"
 )
-async def get_conversation_status() -> dict:
+async def send_audio_message_stream_raw(
+    request: Request,
+    voice: str = Query(default="x5_lingxiaoxuan_flow", description="TTS发音人"),
+    speed: int = Query(default=50, description="语速"),
+    volume: int = Query(default=50, description="音量"),
+    pitch: int = Query(default=50, description="音调"),
+    session_id: Optional[str] = Query(default=None, description="会话ID"),
+    user_id: Optional[str] = Query(default=None, description="用户ID"),
+    service: ConversationService = Depends(get_conv_service),
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
+):
     """
-    获取对话服务状态
+    完整的语音对话（原始请求体上传）
     
-    **响应示例**:
-    ```json
-    {
-        "service": "conversation",
-        "available": true,
-        "components": {
-            "stt": true,
-            "agent": true,
-            "tts": true
-        },
-        "error": null
-    }
+    与 /message-audio-stream 相同，但请求体即音频数据，服务端逐块读取，
+    不经过 multipart 解析。音频格式通过 X-Audio-Filename 或 X-Audio-Format 指定。
+    
+    格式为 pcm（16kHz, 16-bit, mono）时边上传边识别：请求体分块到达即送入语音识别，
+    客户端可在录音的同时以分块传输上传，说完后很快即可得到回复。
+    
+    **示例**:
+    ```bash
+    curl -X POST "http://localhost:8000/api/v1/conversation/message-audio-stream-raw?voice=x5_lingxiaoxuan_flow" \\
+         -H "X-API-Key: dev-test-key-123" \\
+         -H "Content-Type: application/octet-stream" \\
+         -H "X-Audio-Format: wav" \\
+         --data-binary "@my_question.wav" \\
+         --output agent_reply.mp3
     ```
     """
+    audio_filename = audio_filename_from_headers(request)
+    
+    if service.supports_streaming_input(audio_filename):
+        # 原始 PCM：请求体接收与语音识别并行
+        audio_data, audio_chunks = None, iter_audio_body(request)
+    else:
+        audio_data, audio_chunks = await read_audio_body(request), None
+    
+    return await _stream_audio_reply(
+        service,
+        audio_data=audio_data,
+        audio_filename=audio_filename,
+        voice=voice,
+        speed=speed,
+        volume=volume,
+        pitch=pitch,
+        session_id=session_id,
+        user_id=user_id,
+        session_manager=session_manager,
+        audio_chunks=audio_chunks
+    )
+
+
+# /status 常被存活探针高频轮询，组件状态极少变化：序列化结果缓存 1 秒
+STATUS_CACHE_TTL_SECONDS = 1.0
+_STATUS_CACHE_KEY = "status"
+_status_cache: TTLCache[bytes] = TTLCache(maxsize=1, ttl=STATUS_CACHE_TTL_SECONDS)
+
+
+def _conversation_status() -> Dict[str, Any]:
+    """计算对话服务各组件的状态"""
     try:
         service = get_conversation_service()
         
@@ -673,7 +1015,7 @@ async def get_conversation_status() -> dict:
         }
     
     except Exception as e:
-        logger.error(f"检查服务状态失败: {e}")
+        logger.error("检查服务状态失败: %s", e)
         return {
             "service": "conversation",
             "available": False,
@@ -681,6 +1023,42 @@ async def get_conversation_status() -> dict:
         }
 
 
+@conversation_router.get(
+    "/status",
+    summary="对话服务状态",
+    description="检查对话服务的可用性"
+)
+async def get_conversation_status() -> Response:
+    """
+    获取对话服务状态
+    
+    响应体按 STATUS_CACHE_TTL_SECONDS 缓存已编码的 JSON，
+    探针轮询时直接返回字节，不再构建字典和序列化。
+    
+    **响应示例**:
+    ```json
+    {
+        "service": "conversation",
+        "available": true,
+        "components": {
+            "stt": true,
+            "agent": true,
+            "tts": true
+        },
+        "error": null
+    }
+    ```
+    """
+    body = _status_cache.get(_STATUS_CACHE_KEY)
+    if body is None:
+        status = _conversation_status()
+        body = orjson.dumps(status)
+        # 只缓存正常状态，异常状态每次重新检查
+        if status["available"]:
+            _status_cache.set(_STATUS_CACHE_KEY, body)
+    return Response(content=body, media_type="application/json")
+
+
 # ============================================
 # Session Management Endpoints (New)
 # ============================================
@@ -690,15 +1068,16 @@ async def get_conversation_status() -> dict:
     "/send",
     response_model=ConversationResponse,
     summary="发送对话消息（带用户认证）",
-    description="发送消息给智能体，自动绑定用户并进行权限控制"
+    description="发送消息给智能体，自动绑定用户并进行权限控制",
+    openapi_extra=_CONVERSATION_REQUEST_OPENAPI
 )
 async def send_authenticated_message(
-    request: ConversationRequest,
+    request: ConversationRequest = Depends(parse_conversation_request),
     current_user: User = Depends(get_current_user),
     service: ConversationService = Depends(get_conv_service),
     db: AsyncSession = Depends(get_db),
-    fastapi_request: Request = None
-) -> ConversationResponse:
+    session_manager: Optional[Any] = Depends(get_conv_session_manager)
+) -> ORJSONResponse:
     """
     认证用户对话接口
     
@@ -730,39 +1109,33 @@ async def send_authenticated_message(
         
         # 权限检查：如果提供了 session_id，验证是否属于当前用户
         if session_id:
-            existing_session = await session_repo.get_session(session_id)
+            # 会话不存在则创建并绑定用户，存在则返回其归属（一次往返）
+            created, owner_id = await session_repo.upsert_session_returning_owner(
+                session_id=session_id,
+                user_id=user_id,
+                metadata={"created_via": "authenticated_api"}
+            )
             
-            if existing_session:
-                # 权限检查：只能访问自己的会话
-                if existing_session.user_id and existing_session.user_id != current_user.user_id:
-                    raise HTTPException(status_code=403, detail="无权访问此会话")
-            else:
-                # 会话不存在，创建新会话并绑定用户
-                await session_repo.create_session(
-                    session_id=session_id,
-                    user_id=user_id,
-                    metadata={"created_via": "authenticated_api"}
-                )
+            if created:
+                # 需立即提交：后台保存历史的 session_manager 使用另一个数据库连接，
+                # 看不到未提交的会话时会自行创建一个未绑定用户的同名会话
                 await db.commit()
+            elif owner_id and owner_id != current_user.user_id:
+                # 权限检查：只能访问自己的会话
+                raise HTTPException(status_code=403, detail="无权访问此会话")
         else:
-            # 🔥 没有提供 session_id，先生成一个并立即创建会话记录
-            session_id = f"conv_{uuid.uuid4().hex[:12]}"
+            # 🔥 没有提供 session_id，先生成一个并立即创建会话记录（原因同上）
+            session_id = new_conversation_session_id()
             await session_repo.create_session(
                 session_id=session_id,
                 user_id=user_id,
                 metadata={"created_via": "authenticated_api", "auto_generated": True}
             )
             await db.commit()
-            logger.info(f"✅ 自动创建会话并绑定用户: session_id={session_id}, user_id={user_id}")
+            logger.info("✅ 自动创建会话并绑定用户: session_id=%s, user_id=%s", session_id, user_id)
         
         # 验证输出模式
-        try:
-            output_mode = OutputMode(request.output_mode)
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的输出模式: {request.output_mode}。支持: text, audio, both"
-            )
+        output_mode = parse_output_mode(request.output_mode)
         
         # 处理对话（强制使用认证用户的 ID）
         result = await service.process_conversation(
@@ -775,40 +1148,28 @@ async def send_authenticated_message(
             pitch=request.pitch,
             session_id=session_id,
             user_id=str(user_id),  # ✅ 强制使用认证用户 ID
-            session_manager=getattr(fastapi_request.app.state, 'session_manager', None)
+            session_manager=session_manager
         )
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result.get("error", "处理失败"))
         
-        # 保存消息到数据库
-        message_repo = MessageRepository(db)
-        session_id_result = result["session_id"]
-        
-        # 保存用户消息
-        await message_repo.save_message(
-            session_id=session_id_result,
-            role="user",
-            content=request.text,
-            metadata={"input_mode": "text"}
-        )
-        
-        # 保存助手回复
-        await message_repo.save_message(
-            session_id=session_id_result,
-            role="assistant",
-            content=result["agent_response"],
-            metadata=result.get("agent_metadata", {})
-        )
-        
+        # 保存用户消息和助手回复（一条批量 INSERT）
+        await MessageRepository(db).save_messages(result["session_id"], [
+            ("user", request.text, {"input_mode": "text"}),
+            ("assistant", result["agent_response"], result.get("agent_metadata", {})),
+        ])
+        # 同一事务内更新 last_activity：会话列表的 ETag 依赖它，
+        # 不能指望后台的 session_manager 写入（数据库禁用或降级时不会执行）
+        await session_repo.update_session_activity(result["session_id"])
         await db.commit()
         
-        return ConversationResponse(**result)
+        return conversation_response(result)
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"认证对话处理失败: {e}", exc_info=True)
+        logger.error("认证对话处理失败: %s", e, exc_info=True)
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"对话处理失败: {str(e)}")
 
@@ -844,7 +1205,7 @@ async def create_new_session(
         user_id = current_user.user_id
         
         # 生成会话 ID
-        session_id = f"conv_{uuid.uuid4().hex[:12]}"
+        session_id = new_conversation_session_id()
         
         # 准备元数据
         title = (request.title if request else None) or "新对话"
@@ -863,7 +1224,7 @@ async def create_new_session(
         )
         await db.commit()
         
-        logger.info(f"用户 {user_id} 创建新会话: {session_id}")
+        logger.info("用户 %s 创建新会话: %s", user_id, session_id)
         
         return SessionCreateResponse(
             success=True,
@@ -874,7 +1235,7 @@ async def create_new_session(
         )
         
     except Exception as e:
-        logger.error(f"创建会话失败: {e}", exc_info=True)
+        logger.error("创建会话失败: %s", e, exc_info=True)
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"创建会话失败: {str(e)}")
 
@@ -886,9 +1247,11 @@ async def create_new_session(
     description="获取当前登录用户的所有会话（分页）"
 )
 async def get_user_sessions(
+    request: Request,
     page: int = 1,
     page_size: int = 20,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -901,8 +1264,14 @@ async def get_user_sessions(
     - page: 页码（从1开始）
     - page_size: 每页数量（1-100）
     - status: 会话状态过滤 (ACTIVE, PAUSED, TERMINATED)
+    - cursor: 上一页返回的 next_cursor（游标分页，提供时忽略 page）
+    
+    **返回**: 会话列表及分页信息；还有更多时附带 next_cursor，
+    翻页深度不影响查询耗时
     
-    **返回**: 会话列表及分页信息
+    **缓存**: 第一页和条件请求的响应带 ETag（由会话数量和最后活跃时间生成），
+    请求携带匹配的 If-None-Match 时返回 304。ETag 不包含消息数：
+    写入消息时会在同一事务内更新会话的 last_activity，新消息即会使 ETag 变化
     """
     try:
         user_id = current_user.user_id
@@ -914,49 +1283,87 @@ async def get_user_sessions(
             page_size = 20
         
         offset = (page - 1) * page_size
+        after = decode_session_cursor(cursor) if cursor else None
         
-        # 查询会话
         session_repo = SessionRepository(db)
-        sessions = await session_repo.get_user_sessions(
-            user_id=user_id,
-            status=status,
-            limit=page_size,
-            offset=offset
-        )
         
-        # 统计总数
-        total = await session_repo.count_user_sessions(user_id)
+        # 条件请求：先用一条聚合查询比较版本，未变化时直接返回 304
+        version = None
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            version = await session_repo.get_user_sessions_version(user_id, status)
+            etag = weak_etag(user_id, status, page, page_size, cursor, *version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
         
-        # 获取每个会话的消息数量
-        message_repo = MessageRepository(db)
-        session_items = []
-        for session in sessions:
-            message_count = await message_repo.count_session_messages(
-                str(session.session_id)
+        # 查询会话（分页数据与总数在同一条查询中返回）
+        if after is not None:
+            # 游标分页：从上一页最后一条之后继续读取，多取一条判断是否还有更多
+            sessions, total = await session_repo.get_user_sessions_with_total(
+                user_id=user_id,
+                status=status,
+                limit=page_size + 1,
+                after=after
             )
-            session_items.append(
-                SessionListItem(
-                    session_id=str(session.session_id),
-                    user_id=str(session.user_id),
-                    status=session.status,
-                    created_at=session.created_at,
-                    last_activity=session.last_activity,
-                    message_count=message_count,
-                    context_summary=session.context_summary
-                )
+            has_more = len(sessions) > page_size
+            sessions = sessions[:page_size]
+        else:
+            sessions, total = await session_repo.get_user_sessions_with_total(
+                user_id=user_id,
+                status=status,
+                limit=page_size,
+                offset=offset
             )
+            has_more = (offset + len(sessions)) < total
+            
+            if version is None and offset == 0:
+                # 按 last_activity 倒序：第一页的首条即为最新，无需额外查询
+                version = (total, sessions[0].last_activity if sessions else None)
         
-        return SessionListResponse(
-            success=True,
-            sessions=session_items,
-            total=total,
-            page=page,
-            page_size=page_size,
-            has_more=(offset + len(sessions)) < total
+        # 只在版本已知时（条件请求或第一页）返回 ETag，不为此多查一次
+        headers = None
+        if version is not None:
+            headers = {"ETag": weak_etag(user_id, status, page, page_size, cursor, *version)}
+        
+        next_cursor = None
+        if has_more:
+            last = sessions[-1]
+            next_cursor = encode_session_cursor(last.last_activity, str(last.session_id))
+        
+        # 一次分组查询获取本页所有会话的消息数量
+        session_ids = [str(session.session_id) for session in sessions]
+        message_counts = await MessageRepository(db).count_messages_for_sessions(session_ids)
+        # 直接构造 SessionListItem 形状的字典交给 orjson，跳过逐行模型校验
+        session_items = [
+            {
+                "session_id": session_id,
+                "user_id": str(session.user_id),
+                "status": session.status,
+                "created_at": session.created_at,
+                "last_activity": session.last_activity,
+                "message_count": message_counts.get(session_id, 0),
+                "context_summary": session.context_summary,
+            }
+            for session_id, session in zip(session_ids, sessions)
+        ]
+        
+        return ORJSONResponse(
+            {
+                "success": True,
+                "sessions": session_items,
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "has_more": has_more,
+                "next_cursor": next_cursor,
+            },
+            headers=headers
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"获取用户会话列表失败: {e}", exc_info=True)
+        logger.error("获取用户会话列表失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取会话列表失败: {str(e)}")
 
 
@@ -968,6 +1375,7 @@ async def get_user_sessions(
 )
 async def get_session_detail(
     session_id: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -982,9 +1390,26 @@ async def get_session_detail(
     - session_id: 会话 ID
     
     **返回**: 会话详情及所有消息
+    
+    **缓存**: 响应带 ETag（由最后活跃时间和消息数量生成），
+    请求携带匹配的 If-None-Match 时返回 304
     """
     try:
         session_repo = SessionRepository(db)
+        
+        # 条件请求：只查询归属、最后活跃时间和消息数，不加载消息
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            version = await session_repo.get_session_version(session_id)
+            if version is None:
+                raise HTTPException(status_code=404, detail="会话不存在")
+            owner_id, last_activity, message_count = version
+            if owner_id != current_user.user_id:
+                raise HTTPException(status_code=403, detail="无权访问此会话")
+            etag = weak_etag(session_id, last_activity, message_count)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        
         session = await session_repo.get_session_with_messages(session_id)
         
         if not session:
@@ -994,33 +1419,37 @@ async def get_session_detail(
         if session.user_id != current_user.user_id:
             raise HTTPException(status_code=403, detail="无权访问此会话")
         
-        # 构建消息列表
+        # 构建消息列表（MessageDetail 形状的字典，由 orjson 直接编码）
         messages = [
-            MessageDetail(
-                message_id=str(msg.message_id),
-                session_id=str(msg.session_id),
-                role=msg.role,
-                content=msg.content,
-                created_at=msg.created_at,
-                metadata=msg.meta_data  # 数据库字段是 meta_data
-            )
+            {
+                "message_id": str(msg.message_id),
+                "session_id": str(msg.session_id),
+                "role": msg.role,
+                "content": msg.content,
+                "created_at": msg.created_at,
+                "metadata": msg.meta_data,  # 数据库字段是 meta_data
+            }
             for msg in session.messages
         ]
         
-        return SessionDetailResponse(
-            success=True,
-            session_id=str(session.session_id),
-            user_id=str(session.user_id),
-            status=session.status,
-            created_at=session.created_at,
-            last_activity=session.last_activity,
-            context_summary=session.context_summary,
-            messages=messages,
-            total_messages=len(messages)
+        return ORJSONResponse(
+            {
+                "success": True,
+                "session_id": str(session.session_id),
+                "user_id": str(session.user_id),
+                "status": session.status,
+                "created_at": session.created_at,
+                "last_activity": session.last_activity,
+                "context_summary": session.context_summary,
+                "messages": messages,
+                "total_messages": len(messages),
+                "error": None,
+            },
+            headers={"ETag": weak_etag(session_id, session.last_activity, len(messages))}
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"获取会话详情失败: {e}", exc_info=True)
+        logger.error("获取会话详情失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取会话详情失败: {str(e)}")
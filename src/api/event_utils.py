@@ -4,14 +4,32 @@ Event Protocol Utilities
 Utilities for creating versioned streaming events with consistent structure.
 """
 
-import uuid
-from datetime import datetime
+import secrets
+import time
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
 
+import orjson
+
 
 # Current event protocol version
 EVENT_PROTOCOL_VERSION = "1.0"
 
+# Formatted "YYYY-MM-DDTHH:MM:SS" prefix of the current second; events
+# within the same second only append the microseconds
+_timestamp_second = -1
+_timestamp_prefix = ""
+
+
+def utc_timestamp() -> str:
+    """Current UTC time as ISO 8601 with microseconds and a "Z" suffix."""
+    global _timestamp_second, _timestamp_prefix
+    second, micro = divmod(time.time_ns() // 1000, 1_000_000)
+    if second != _timestamp_second:
+        _timestamp_prefix = datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        _timestamp_second = second
+    return f"{_timestamp_prefix}.{micro:06d}Z"
+
 
 def create_event(
     event_type: str,
@@ -51,8 +69,8 @@ def create_event(
     """
     event = {
         "version": EVENT_PROTOCOL_VERSION,
-        "id": f"evt_{uuid.uuid4().hex[:16]}",
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "id": f"evt_{secrets.token_hex(8)}",
+        "timestamp": utc_timestamp(),
         "type": event_type,
     }
     
@@ -134,6 +152,29 @@ def create_cancelled_event(
     return create_event("cancelled", data=data, session_id=session_id)
 
 
+# orjson 默认输出 UTF-8（等价于 ensure_ascii=False），并原生支持 datetime
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """
+    Serialize an event to UTF-8 JSON bytes.
+    
+    Uses orjson instead of json.dumps on the streaming hot path;
+    datetime values are encoded as ISO 8601 strings.
+    """
+    return orjson.dumps(event, option=_ORJSON_OPTIONS, default=str)
+
+
+def encode_sse_event(event: Dict[str, Any]) -> bytes:
+    """Serialize an event as a single Server-Sent Events ``data:`` frame."""
+    return b"data: " + encode_event(event) + b"\n\n"
+
+
+_REQUIRED_EVENT_FIELDS = ("version", "id", "timestamp", "type")
+VALID_EVENT_TYPES = frozenset({"start", "delta", "end", "error", "tool_calls", "cancelled"})
+
+
 def validate_event(event: Dict[str, Any]) -> bool:
     """
     Validate that an event conforms to the protocol.
@@ -144,10 +185,8 @@ def validate_event(event: Dict[str, Any]) -> bool:
     Returns:
         True if valid, False otherwise
     """
-    required_fields = ["version", "id", "timestamp", "type"]
-    
     # Check all required fields exist
-    if not all(field in event for field in required_fields):
+    if not all(field in event for field in _REQUIRED_EVENT_FIELDS):
         return False
     
     # Check version format
@@ -163,8 +202,7 @@ def validate_event(event: Dict[str, Any]) -> bool:
         return False
     
     # Check type is valid
-    valid_types = ["start", "delta", "end", "error", "tool_calls", "cancelled"]
-    if event["type"] not in valid_types:
+    if event["type"] not in VALID_EVENT_TYPES:
         return False
     
     return True
@@ -13,7 +13,7 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.openapi.utils import get_openapi
 
 from .routes import chat_router, session_router, health_router, tools_router, set_voice_agent
@@ -22,11 +22,13 @@ from .conversation_routes import conversation_router
 from .auth_routes import router as auth_router  # 🔧 添加认证路由
 from .session_routes import router as session_management_router  # 🔧 添加会话管理路由 (Phase 3B)
 from .models import ErrorResponse
-from .auth import APIKeyMiddleware
+from .auth import APIKeyMiddleware, reload_api_keys
 from .middleware import (
     RateLimitMiddleware, 
     SecurityHeadersMiddleware, 
-    RequestValidationMiddleware
+    RequestValidationMiddleware,
+    ProcessTimeMiddleware,
+    RequestIDMiddleware
 )
 
 # fastAPI中提到的中间件相当于java中的过滤器
@@ -56,6 +58,7 @@ async def lifespan(app: FastAPI):
             api_keys = app.state.config.security.api_keys
             if api_keys:
                 os.environ['API_KEYS'] = ','.join(api_keys)
+                reload_api_keys()
                 logger.info(f"✅ API keys loaded from config: {len(api_keys)} key(s)")
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
@@ -105,6 +108,36 @@ async def lifespan(app: FastAPI):
     except ImportError:
         logger.warning("Agent modules not available - running in mock mode")
     
+    # 预热语音服务单例（与智能体是否可用无关），首个语音请求不再承担初始化开销
+    # 每个服务单独捕获异常：某个服务配置错误（如缺少 appid）不影响其余服务的预热
+    warmup_start = time.perf_counter()
+    try:
+        from .voice_routes import get_stt_service, get_tts_service, get_tts_streaming_service
+        from services.voice.audio_converter import get_audio_converter
+        
+        warmups = [
+            ("STT", get_stt_service),
+            ("TTS", get_tts_service),
+            ("streaming TTS", get_tts_streaming_service),
+            ("audio converter", get_audio_converter),  # 导入 pydub 并查找 ffmpeg
+        ]
+    except Exception as e:
+        logger.warning(f"Could not import voice services for warmup: {e}")
+        warmups = []
+    
+    warmed = 0
+    for name, warmup in warmups:
+        try:
+            warmup()
+            warmed += 1
+        except Exception as e:
+            logger.warning(f"Could not warm up {name} service: {e}")
+    if warmups:
+        logger.info(
+            f"Voice services warmed up ({warmed}/{len(warmups)}) "
+            f"in {(time.perf_counter() - warmup_start) * 1000:.1f} ms"
+        )
+    
     # 🔧 方案 C: 使用硬编码数据库连接（临时方案，快速集成测试）
     try:
         from utils.hybrid_session_manager import HybridSessionManager
@@ -121,10 +154,12 @@ async def lifespan(app: FastAPI):
         db_engine = create_async_engine(
             DATABASE_URL,
             echo=False,
-            pool_size=10,
-            max_overflow=20,
+            pool_size=20,
+            max_overflow=10,
+            pool_timeout=10,
             pool_pre_ping=True,
-            pool_recycle=3600
+            pool_recycle=3600,
+            connect_args=db_conn.get_connect_args()
         )
         
         # 🔧 设置全局引擎变量
@@ -199,6 +234,15 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Voice Agent API service...")
     
+    # 等待后台写入的会话历史完成，再关闭数据库
+    try:
+        from services.conversation_service import get_conversation_service
+        conversation_service = get_conversation_service()
+        if conversation_service is not None:
+            await conversation_service.wait_background_tasks()
+    except Exception as e:
+        logger.error(f"Error waiting for background tasks: {e}")
+    
     # 清理数据库资源
     try:
         # 关闭数据库 session
@@ -258,6 +302,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse,  # orjson 序列化（原生支持 datetime，直接输出 bytes）
     lifespan=lifespan
 )
 
@@ -289,27 +334,10 @@ app.add_middleware(RateLimitMiddleware, requests_per_minute=100, requests_per_ho
 
 
 # Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time to response headers."""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(f"{process_time:.4f}")
-    return response
-
-
-# Request ID middleware
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    """Add unique request ID for tracing."""
-    import uuid
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
-    
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-    return response
+app.add_middleware(ProcessTimeMiddleware)
+
+# Request ID middleware (outermost, so the ID is set before any other middleware runs)
+app.add_middleware(RequestIDMiddleware)
 
 
 # Error handling
@@ -5,6 +5,7 @@ Authentication, rate limiting, and security middleware for the Voice Agent API.
 """
 
 import time
+import uuid
 import logging
 from typing import Dict, Set, Optional
 from collections import defaultdict, deque
@@ -12,8 +13,10 @@ from datetime import datetime, timedelta
 
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from .models import ErrorResponse
 
@@ -209,6 +212,61 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         return response
 
 
+class ProcessTimeMiddleware:
+    """
+    Add processing time to response headers (X-Process-Time).
+    
+    Plain ASGI middleware: the header is added to the outgoing
+    http.response.start message, so the response body is passed through
+    untouched and no extra task is spawned per request.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                MutableHeaders(scope=message).append("X-Process-Time", f"{process_time:.4f}")
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
+class RequestIDMiddleware:
+    """
+    Add unique request ID for tracing (X-Request-ID).
+    
+    The ID is stored in scope["state"], which Starlette exposes as
+    request.state.request_id for handlers and exception handlers.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
 class RequestValidationMiddleware(BaseHTTPMiddleware):
     """Validate and sanitize incoming requests."""
     
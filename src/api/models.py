@@ -177,6 +177,7 @@ class SessionListResponse(BaseModel):
     page: int = Field(..., description="Current page number")
     page_size: int = Field(..., description="Number of items per page")
     has_more: bool = Field(..., description="Whether there are more sessions available")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor for the next page (keyset pagination)")
 
 
 class MessageDetail(BaseModel):
@@ -7,7 +7,6 @@ FastAPI route handlers for all endpoints including chat, sessions, and health ch
 import time
 import uuid
 import logging
-import json
 import asyncio
 from datetime import datetime
 from typing import Dict, Any, Optional, List
@@ -17,7 +16,7 @@ from fastapi.responses import JSONResponse
 from fastapi.responses import StreamingResponse
 
 from .stream_manager import get_stream_manager
-from .event_utils import create_start_event, create_end_event, create_cancelled_event, create_error_event
+from .event_utils import create_start_event, create_end_event, create_cancelled_event, create_error_event, encode_event, encode_sse_event
 from .models import (
     ChatRequest, ChatResponse, SessionRequest, SessionResponse, 
     ConversationHistoryRequest, ConversationHistoryResponse,
@@ -73,9 +72,15 @@ def set_voice_agent(agent):
     _voice_agent = agent
 
 
-def get_session_manager(request: Request):
-    """Dependency to get the session manager from app.state."""
-    return request.app.state.session_manager
+async def get_session_manager(request: Request):
+    """
+    Dependency to get the session manager from app.state.
+    
+    Returns None when no manager is configured; handlers surface the
+    resulting error inside their own error handling. Declared async so
+    FastAPI calls it inline instead of dispatching to the threadpool.
+    """
+    return getattr(request.app.state, "session_manager", None)
 
 
 # Create routers
@@ -89,8 +94,8 @@ tools_router = APIRouter(prefix="/tools", tags=["Tools"])
 async def chat_message(
     request: ChatRequest,
     background_tasks: BackgroundTasks,
-    req: Request,  # ✅ 添加 Request 以访问 app.state
-    agent = Depends(get_voice_agent)
+    agent = Depends(get_voice_agent),
+    session_manager = Depends(get_session_manager)
 ):
     """
     Send a message to the voice agent and get a response.
@@ -122,8 +127,7 @@ async def chat_message(
         #判断是否需要流式返回
         effective_model_cfg = request.model_params or request.model_config_override
         if request.stream:
-            # 🔧 获取 session_manager 和历史记录（改为异步）
-            session_manager = req.app.state.session_manager
+            # 🔧 获取历史记录（改为异步）
             external_history = await session_manager.get_history(session_id)
             
             async def event_generator():
@@ -147,7 +151,7 @@ async def chat_message(
                     ):
                         if event.get('type') == 'delta' and event.get('content'):
                             collected.append(event['content'])
-                        yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                        yield encode_sse_event(event)
                         if event.get('type') == 'end':
                             break
                     
@@ -161,11 +165,10 @@ async def chat_message(
                         logger.info(f"✅ [POST /chat/] 历史记录已保存，当前历史长度: {history_len}")
                         
                 except Exception as e:
-                    yield f"data: {json.dumps({'type':'error','error':str(e)}, ensure_ascii=False)}\n\n"
+                    yield encode_sse_event({'type': 'error', 'error': str(e)})
             return StreamingResponse(event_generator(), media_type="text/event-stream")
         else:
             # 🔧 非流式模式：获取历史记录（改为异步）
-            session_manager = req.app.state.session_manager
             external_history = await session_manager.get_history(session_id)
             
             result = await agent.process_message(
@@ -232,16 +235,15 @@ async def chat_message(
 @chat_router.post("/stream")
 async def chat_message_stream(
     request: ChatRequest,
-    req: Request,  # 添加 Request 以访问 app.state
-    agent = Depends(get_voice_agent)
+    agent = Depends(get_voice_agent),
+    session_manager = Depends(get_session_manager)
 ):
     """Stream a chat response using Server-Sent Events style JSON lines."""
     if agent is None:
         raise HTTPException(status_code=503, detail="Agent not available")
     session_id = request.session_id or f"session_{uuid.uuid4().hex[:12]}"
     
-    # 🔧 获取 session_manager 和历史记录（改为异步）
-    session_manager = req.app.state.session_manager
+    # 🔧 获取历史记录（改为异步）
     external_history = await session_manager.get_history(session_id)
     
     async def event_generator():
@@ -258,7 +260,7 @@ async def chat_message_stream(
                 if event.get("type") == "delta" and "content" in event:
                     accumulated_content.append(event["content"])
                 
-                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                yield encode_sse_event(event)
             
             # 🔧 流式完成后保存消息到历史（改为异步）
             if accumulated_content:
@@ -270,25 +272,24 @@ async def chat_message_stream(
                 logger.info(f"✅ 历史记录已保存，当前历史长度: {history_len}")
                 
         except Exception as e:
-            yield f"data: {json.dumps({'type':'error','error':str(e)}, ensure_ascii=False)}\n\n"
+            yield encode_sse_event({'type': 'error', 'error': str(e)})
     
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 @chat_router.get("/stream")
 async def chat_message_stream_get(
     message: str,
-    req: Request,  # 添加 Request
     session_id: Optional[str] = None,
     user_id: Optional[str] = None,
     model_variant: Optional[str] = None,
-    agent = Depends(get_voice_agent)
+    agent = Depends(get_voice_agent),
+    session_manager = Depends(get_session_manager)
 ):
     if agent is None:
         raise HTTPException(status_code=503, detail="Agent not available")
     session_id = session_id or f"session_{uuid.uuid4().hex[:12]}"
     
     # 🔧 获取历史记录（改为异步）
-    session_manager = req.app.state.session_manager
     external_history = await session_manager.get_history(session_id)
     
     async def event_generator():
@@ -312,7 +313,7 @@ async def chat_message_stream_get(
             ):
                 if event.get("type") == "delta" and "content" in event:
                     accumulated_content.append(event["content"])
-                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                yield encode_sse_event(event)
             
             # 🔧 保存消息（改为异步）
             if accumulated_content:
@@ -323,7 +324,7 @@ async def chat_message_stream_get(
                 history_len = len(await session_manager.get_history(session_id))
                 logger.info(f"✅ [GET] 历史记录已保存，当前历史长度: {history_len}")
         except Exception as e:
-            yield f"data: {json.dumps({'type':'error','error':str(e)}, ensure_ascii=False)}\n\n"
+            yield encode_sse_event({'type': 'error', 'error': str(e)})
     
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -405,7 +406,7 @@ async def chat_ws(websocket: WebSocket, agent = Depends(get_voice_agent)):
                         if event.get("type") == "delta" and "content" in event:
                             accumulated_content.append(event["content"])
                         
-                        await websocket.send_json(event)
+                        await websocket.send_text(encode_event(event).decode())
                     
                     # 🔧 保存消息到历史（改为异步）
                     if accumulated_content:
@@ -651,9 +652,12 @@ async def delete_session(
 
 # 会话管理端点
 @session_router.get("/{session_id}/history")
-async def get_session_history(session_id: str, request: Request, limit: Optional[int] = None):
+async def get_session_history(
+    session_id: str,
+    limit: Optional[int] = None,
+    session_manager = Depends(get_session_manager)
+):
     """获取会话历史记录"""
-    session_manager = request.app.state.session_manager
     try:
         history = await session_manager.get_history(session_id, limit)
         return {
@@ -665,9 +669,8 @@ async def get_session_history(session_id: str, request: Request, limit: Optional
         raise HTTPException(status_code=500, detail=str(e))
 
 @session_router.delete("/{session_id}")
-async def clear_session(session_id: str, request: Request):
+async def clear_session(session_id: str, session_manager = Depends(get_session_manager)):
     """清空会话历史"""
-    session_manager = request.app.state.session_manager
     try:
         if hasattr(session_manager, "clear_session"):
             await session_manager.clear_session(session_id)
@@ -18,8 +18,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 
-from .auth_routes import get_current_user
-from database.connection import get_session
+from .auth_routes import get_current_user, get_db_session
 from database.repositories.session_repository import SessionRepository
 from database.repositories.message_repository import MessageRepository
 from database.repositories.conversation_repository import ConversationRepository
@@ -92,7 +91,7 @@ class DeleteSessionResponse(BaseModel):
 )
 async def get_user_sessions(
     current_user: Annotated[User, Depends(get_current_user)],
-    db_session: Annotated[AsyncSession, Depends(get_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页大小"),
     status: Optional[str] = Query(None, description="会话状态过滤 (ACTIVE/TERMINATED)")
@@ -114,39 +113,33 @@ async def get_user_sessions(
         # 计算偏移量
         offset = (page - 1) * page_size
         
-        # 获取用户会话
-        sessions = await session_repo.get_user_sessions(
+        # 获取用户会话（分页数据与总数在同一条查询中返回）
+        sessions, total = await session_repo.get_user_sessions_with_total(
             user_id=current_user.user_id,
             status=status,
-            limit=page_size + 1,  # 多取一条判断是否有更多
+            limit=page_size,
             offset=offset
         )
         
         # 判断是否有更多
-        has_more = len(sessions) > page_size
-        if has_more:
-            sessions = sessions[:page_size]
+        has_more = offset + len(sessions) < total
         
-        # 获取总数
-        total = await session_repo.count_sessions(
-            user_id=current_user.user_id,
-            status=status
+        # 一次分组查询获取本页所有会话的消息数量
+        message_counts = await MessageRepository(db_session).count_messages_for_sessions(
+            [session.session_id for session in sessions]
         )
         
         # 构建响应
-        session_list = []
-        for session in sessions:
-            # 获取消息数量
-            msg_repo = MessageRepository(db_session)
-            message_count = await msg_repo.count_session_messages(session.session_id)
-            
-            session_list.append({
+        session_list = [
+            {
                 "session_id": session.session_id,
                 "status": session.status,
-                "message_count": message_count,
+                "message_count": message_counts.get(session.session_id, 0),
                 "created_at": session.created_at.isoformat(),
                 "last_activity": session.last_activity.isoformat()
-            })
+            }
+            for session in sessions
+        ]
         
         return SessionListResponse(
             total=total,
@@ -173,7 +166,7 @@ async def get_user_sessions(
 async def get_session_detail(
     session_id: str,
     current_user: Annotated[User, Depends(get_current_user)],
-    db_session: Annotated[AsyncSession, Depends(get_session)],
+    db_session: Annotated[AsyncSession, Depends(get_db_session)],
     limit: int = Query(50, ge=1, le=200, description="消息数量限制")
 ):
     """
@@ -251,7 +244,7 @@ async def get_session_detail(
 async def create_new_session(
     request: CreateSessionRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db_session: Annotated[AsyncSession, Depends(get_session)]
+    db_session: Annotated[AsyncSession, Depends(get_db_session)]
 ):
     """
     创建新会话
@@ -309,7 +302,7 @@ async def create_new_session(
 async def delete_session(
     session_id: str,
     current_user: Annotated[User, Depends(get_current_user)],
-    db_session: Annotated[AsyncSession, Depends(get_session)]
+    db_session: Annotated[AsyncSession, Depends(get_db_session)]
 ):
     """
     删除会话
@@ -198,8 +198,9 @@ class DatabaseConfig(BaseModel):
     database: str = Field(default="voice_agent", description="Database name")
     user: str = Field(default="agent_user", description="Database user")
     password: str = Field(default="changeme123", description="Database password")
-    pool_size: int = Field(default=10, ge=1, le=100, description="Connection pool size")
-    max_overflow: int = Field(default=20, ge=0, le=100, description="Max pool overflow")
+    pool_size: int = Field(default=20, ge=1, le=100, description="Connection pool size")
+    max_overflow: int = Field(default=10, ge=0, le=100, description="Max pool overflow")
+    pool_timeout: float = Field(default=10.0, gt=0, description="Seconds to wait for a pooled connection")
     
     @validator("password")
     def validate_password(cls, v):
@@ -55,13 +55,25 @@ class Session(Base):
     
     # Relationships
     user = relationship("User", back_populates="sessions")
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", order_by="Message.timestamp")
+    # 异步会话下懒加载会报错或产生额外查询：必须显式 selectinload，意外访问直接抛错；
+    # 删除会话时由数据库外键 ON DELETE CASCADE 删除消息，无需先加载集合
+    messages = relationship(
+        "Message",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="Message.timestamp",
+        lazy="raise",
+        passive_deletes=True,
+    )
     tool_calls = relationship("ToolCall", back_populates="session", cascade="all, delete-orphan")
     
     # Indexes
     __table_args__ = (
         Index('idx_session_status_activity', 'status', 'last_activity'),
         Index('idx_session_user_created', 'user_id', 'created_at'),
+        # 用户会话列表：按 user_id（及 status）过滤、按 (last_activity, session_id) 倒序分页
+        Index('idx_session_user_activity', user_id, last_activity.desc(), session_id.desc()),
+        Index('idx_session_user_status_activity', user_id, status, last_activity.desc(), session_id.desc()),
     )
     
     def __repr__(self):
@@ -7,10 +7,10 @@ Data access layer for message management.
 
 import logging
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, delete, and_, func
+from sqlalchemy import select, insert, delete, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Message
@@ -55,7 +55,7 @@ class MessageRepository:
             session_id=session_id,
             role=role,
             content=content,
-            metadata=metadata or {},
+            meta_data=metadata or {},
             timestamp=timestamp or datetime.utcnow()
         )
         
@@ -65,6 +65,45 @@ class MessageRepository:
         logger.debug(f"Saved message: {new_message.message_id} for session {session_id}")
         return new_message
     
+    async def save_messages(
+        self,
+        session_id: str,
+        messages: List[Tuple[str, str, Optional[Dict[str, Any]]]]
+    ) -> int:
+        """
+        Save several messages with a single bulk INSERT.
+        
+        Rows are inserted in one statement (no ORM objects are created)
+        with strictly increasing timestamps; the caller commits.
+        
+        Args:
+            session_id: Session identifier
+            messages: (role, content, metadata) tuples, in order
+            
+        Returns:
+            Number of saved messages
+        """
+        if not messages:
+            return 0
+        
+        # Messages are read back ordered by timestamp only: give each row a
+        # strictly increasing timestamp so the turn keeps its order
+        base = datetime.utcnow()
+        rows = [
+            {
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "meta_data": metadata or {},
+                "timestamp": base + timedelta(microseconds=index)
+            }
+            for index, (role, content, metadata) in enumerate(messages)
+        ]
+        await self.session.execute(insert(Message), rows)
+        
+        logger.debug(f"Saved {len(rows)} messages for session {session_id}")
+        return len(rows)
+    
     async def get_messages(
         self,
         session_id: str,
@@ -237,4 +276,24 @@ class MessageRepository:
             .where(Message.session_id == session_id)
         )
         return result.scalar_one()
-
+    
+    async def count_messages_for_sessions(self, session_ids: List[str]) -> Dict[str, int]:
+        """
+        Count messages for several sessions with a single grouped query.
+        
+        Args:
+            session_ids: Session identifiers
+            
+        Returns:
+            Mapping of session_id to message count (sessions without
+            messages are omitted)
+        """
+        if not session_ids:
+            return {}
+        
+        result = await self.session.execute(
+            select(Message.session_id, func.count(Message.message_id))
+            .where(Message.session_id.in_(session_ids))
+            .group_by(Message.session_id)
+        )
+        return {session_id: count for session_id, count in result.all()}
@@ -6,17 +6,22 @@ Data access layer for session management.
 # 这里专门处理会话相关
 import logging
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, update, delete, and_, or_, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, delete, and_, or_, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Session, User, Message
 
 logger = logging.getLogger(__name__)
 
+# User session lists are ordered newest first; session_id breaks ties so
+# offset and keyset (cursor) pagination see the same stable order
+_USER_SESSIONS_ORDER = (Session.last_activity.desc(), Session.session_id.desc())
+
 
 class SessionRepository:
     """Repository for session CRUD operations."""
@@ -60,6 +65,58 @@ class SessionRepository:
         logger.info(f"Created session: {session_id}")
         return new_session
     
+    async def upsert_session_returning_owner(
+        self,
+        session_id: str,
+        user_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Tuple[bool, Optional[UUID]]:
+        """
+        Create a session unless it already exists, in a single round-trip.
+        
+        Runs INSERT ... ON CONFLICT DO NOTHING in a CTE and unions it with a
+        lookup of the existing row, so the caller learns both whether the
+        session was created and who owns it.
+        
+        Args:
+            session_id: Unique session identifier
+            user_id: Owner to assign if the session is created
+            metadata: Session metadata used if the session is created
+            
+        Returns:
+            Tuple of (created, owner user_id)
+        """
+        inserted = (
+            pg_insert(Session)
+            .values(
+                session_id=session_id,
+                user_id=user_id,
+                status="ACTIVE",
+                meta_data=metadata or {},
+            )
+            .on_conflict_do_nothing(index_elements=[Session.session_id])
+            .returning(Session.user_id)
+            .cte("inserted")
+        )
+        # 同一语句内的 SELECT 看不到 CTE 插入的行：新建时只有第一部分有结果，已存在时只有第二部分有结果
+        statement = select(inserted.c.user_id, literal(True).label("created")).union_all(
+            select(Session.user_id, literal(False).label("created"))
+            .where(Session.session_id == session_id)
+        )
+        row = (await self.session.execute(statement)).first()
+        
+        if row is None:
+            # 并发请求在本语句快照之后刚创建了该会话：重新读取归属
+            owner_id = await self.session.scalar(
+                select(Session.user_id).where(Session.session_id == session_id)
+            )
+            return False, owner_id
+        
+        owner_id, created = row
+        if created:
+            logger.info(f"Created session: {session_id}")
+        return created, owner_id
+    
     async def get_session(self, session_id: str) -> Optional[Session]:
         """
         Get session by ID.
@@ -147,7 +204,8 @@ class SessionRepository:
         user_id: UUID,
         status: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        after: Optional[Tuple[datetime, str]] = None
     ) -> List[Session]:
         """
         Get all sessions for a user.
@@ -157,6 +215,9 @@ class SessionRepository:
             status: Optional status filter (ACTIVE, PAUSED, TERMINATED)
             limit: Maximum number of sessions to return
             offset: Number of sessions to skip
+            after: Optional keyset cursor (last_activity, session_id) of the
+                last session on the previous page; only sessions sorting after
+                it are returned, so deep pages cost the same as the first one
             
         Returns:
             List of Session objects
@@ -166,11 +227,117 @@ class SessionRepository:
         if status:
             query = query.where(Session.status == status)
         
-        query = query.order_by(Session.last_activity.desc()).limit(limit).offset(offset)
+        if after is not None:
+            query = query.where(tuple_(Session.last_activity, Session.session_id) < after)
+        
+        query = query.order_by(*_USER_SESSIONS_ORDER).limit(limit).offset(offset)
         
         result = await self.session.execute(query)
         return list(result.scalars().all())
     
+    async def get_user_sessions_with_total(
+        self,
+        user_id: UUID,
+        status: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> Tuple[List[Session], int]:
+        """
+        Get one page of a user's sessions together with the total count.
+        
+        The total is computed in the same statement (COUNT(*) OVER (), or an
+        uncorrelated COUNT subquery when a keyset cursor filters out the
+        earlier rows), so listing a page costs a single round trip.
+        
+        Args:
+            user_id: User identifier
+            status: Optional status filter (ACTIVE, PAUSED, TERMINATED)
+            limit: Maximum number of sessions to return
+            offset: Number of sessions to skip
+            after: Optional keyset cursor (last_activity, session_id), see
+                get_user_sessions
+            
+        Returns:
+            (List of Session objects, total number of matching sessions)
+        """
+        if after is None:
+            total = func.count().over()
+        else:
+            counted = aliased(Session)
+            total_query = select(func.count()).select_from(counted).where(counted.user_id == user_id)
+            if status:
+                total_query = total_query.where(counted.status == status)
+            total = total_query.scalar_subquery()
+        
+        query = select(Session, total.label("total")).where(Session.user_id == user_id)
+        
+        if status:
+            query = query.where(Session.status == status)
+        
+        if after is not None:
+            query = query.where(tuple_(Session.last_activity, Session.session_id) < after)
+        
+        query = query.order_by(*_USER_SESSIONS_ORDER).limit(limit).offset(offset)
+        
+        result = await self.session.execute(query)
+        rows = result.all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+        if offset or after is not None:
+            # Past the last page there is no row to carry the total
+            return [], await self.count_sessions(user_id=user_id, status=status)
+        return [], 0
+    
+    async def get_user_sessions_version(
+        self,
+        user_id: UUID,
+        status: Optional[str] = None
+    ) -> Tuple[int, Optional[datetime]]:
+        """
+        Get a cheap version stamp for a user's session list.
+        
+        Args:
+            user_id: User identifier
+            status: Optional status filter (ACTIVE, PAUSED, TERMINATED)
+            
+        Returns:
+            (number of matching sessions, latest last_activity or None)
+        """
+        query = select(func.count(), func.max(Session.last_activity)).where(Session.user_id == user_id)
+        
+        if status:
+            query = query.where(Session.status == status)
+        
+        result = await self.session.execute(query)
+        total, latest = result.one()
+        return total, latest
+    
+    async def get_session_version(
+        self,
+        session_id: str
+    ) -> Optional[Tuple[Optional[UUID], datetime, int]]:
+        """
+        Get a cheap version stamp for a session without loading its messages.
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            (owner user_id, last_activity, message count) or None if not found
+        """
+        message_count = (
+            select(func.count())
+            .where(Message.session_id == Session.session_id)
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            select(Session.user_id, Session.last_activity, message_count)
+            .where(Session.session_id == session_id)
+        )
+        row = result.first()
+        return tuple(row) if row is not None else None
+    
     async def get_active_sessions(self, limit: int = 100) -> List[Session]:
         """
         Get all active sessions.
@@ -4,18 +4,42 @@
 提供用户表的 CRUD 操作：
 - 创建用户
 - 查询用户（按 ID、用户名、邮箱）
+- 注册冲突检查（用户名/邮箱，单次查询）
 - 更新用户信息
+- 按 ID 查询的短时缓存（认证热路径）
+- 活跃用户 ID 校验（单列查询，刷新 Token 使用）
 
 Phase 3B - User Login System
 Created: 2025-11-03
 """
 
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import User
+from utils.ttl_cache import TTLCache
+
+
+# 用户对象短时缓存：同一用户的突发请求只查询一次数据库
+USER_CACHE_TTL_SECONDS = 30
+USER_CACHE_MAX_SIZE = 10_000
+
+_user_cache: TTLCache[User] = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_cache(user_id: Optional[UUID] = None) -> None:
+    """
+    失效用户缓存
+    
+    Args:
+        user_id: 要失效的用户 ID；为 None 时清空全部缓存
+    """
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(user_id)
 
 
 class UserRepository:
@@ -92,9 +116,8 @@ class UserRepository:
             >>> if user:
             ...     print(user.email)
         """
-        stmt = select(User).filter_by(username=username)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        stmt = select(User).where(User.username == username)
+        return await self.session.scalar(stmt)
     
     async def get_user_by_email(self, email: str) -> Optional[User]:
         """
@@ -111,9 +134,34 @@ class UserRepository:
             >>> if user:
             ...     print(user.username)
         """
-        stmt = select(User).filter_by(email=email)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        stmt = select(User).where(User.email == email)
+        return await self.session.scalar(stmt)
+    
+    async def get_conflicts(self, username: str, email: str) -> Tuple[bool, bool]:
+        """
+        检查用户名和邮箱是否已被占用（一次查询完成两项检查）
+        
+        Args:
+            username: 用户名
+            email: 邮箱地址
+            
+        Returns:
+            Tuple[bool, bool]: (用户名已存在, 邮箱已存在)
+            
+        Example:
+            >>> username_taken, email_taken = await repo.get_conflicts(
+            ...     "john_doe", "john@example.com"
+            ... )
+        """
+        stmt = (
+            select(User.username, User.email)
+            .where(or_(User.username == username, User.email == email))
+            .limit(2)
+        )
+        rows = (await self.session.execute(stmt)).all()
+        username_taken = any(row.username == username for row in rows)
+        email_taken = any(row.email == email for row in rows)
+        return username_taken, email_taken
     
     async def get_user_by_id(self, user_id: UUID) -> Optional[User]:
         """
@@ -130,9 +178,50 @@ class UserRepository:
             >>> user_id = UUID("123e4567-e89b-12d3-a456-426614174000")
             >>> user = await repo.get_user_by_id(user_id)
         """
-        stmt = select(User).filter_by(user_id=user_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        # 主键查询：已在当前 Session 中加载的对象直接从 identity map 返回，不发 SQL
+        return await self.session.get(User, user_id)
+    
+    async def get_cached_user_by_id(self, user_id: UUID) -> Optional[User]:
+        """
+        根据用户 ID 查询用户（带 TTL 缓存）
+        
+        用于认证等只读热路径。返回的对象可能来自其他 Session，
+        调用方只能读取，不能修改；需要修改时请使用 get_user_by_id。
+        
+        Args:
+            user_id: 用户 UUID
+            
+        Returns:
+            Optional[User]: 用户对象，不存在返回 None（不缓存）
+        """
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        user = await self.get_user_by_id(user_id)
+        if user is not None:
+            _user_cache.set(user_id, user)
+        return user
+    
+    async def get_active_user_id(self, user_id: UUID) -> Optional[UUID]:
+        """
+        检查用户是否存在且处于激活状态
+        
+        命中用户缓存时不查询数据库；否则只查询主键一列，
+        用户不存在与已禁用都返回 None。
+        
+        Args:
+            user_id: 用户 UUID
+            
+        Returns:
+            Optional[UUID]: 活跃用户的 ID，否则返回 None
+        """
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user.user_id if user.is_active else None
+        
+        stmt = select(User.user_id).where(User.user_id == user_id, User.is_active.is_(True))
+        return await self.session.scalar(stmt)
     
     async def update_user(self, user_id: UUID, **kwargs) -> Optional[User]:
         """
@@ -162,5 +251,6 @@ class UserRepository:
         
         await self.session.commit()
         await self.session.refresh(user)
+        invalidate_user_cache(user_id)
         
         return user
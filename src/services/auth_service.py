@@ -2,21 +2,27 @@
 认证服务模块 (Authentication Service)
 
 提供用户认证相关的核心功能：
-- 密码哈希和验证 (bcrypt)
+- 密码哈希和验证 (Argon2id，兼容旧 bcrypt 哈希)
 - JWT Token 生成和验证
 - Token 刷新机制
 
 Phase 3B - User Login System
 Created: 2025-11-03
 Updated: 2025-11-03 (直接使用 bcrypt，避免 passlib 兼容性问题)
+Updated: 2026-10-17 (新哈希改用 Argon2id (argon2-cffi)，bcrypt 仅用于验证旧哈希)
 """
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
 import bcrypt
-from jose import jwt, JWTError
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHashError, VerificationError
+from jose import jwk, jwt, JWTError
+from jose.exceptions import JWKError
 
 
 # ============================================
@@ -30,37 +36,63 @@ JWT_ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES
 JWT_REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("JWT_REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
 
+def _build_signing_key(secret: str, algorithm: str):
+    """
+    预先构造 JWT 签名/验签密钥对象
+    
+    python-jose 收到字符串密钥时，每次 encode/decode 都会先尝试把它当 JSON
+    解析，再重新构造 HMAC 密钥；传入已构造的 Key 对象可跳过这两步。
+    无法构造时（例如非对称算法）回退为原始字符串。
+    """
+    try:
+        return jwk.construct(secret, algorithm)
+    except JWKError:
+        return secret
+
+
+_JWT_KEY = _build_signing_key(JWT_SECRET_KEY, JWT_ALGORITHM)
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
+
+
 # ============================================
-# Password Hashing (直接使用 bcrypt)
+# Password Hashing (Argon2id)
 # ============================================
 
+# Argon2id 参数（默认 OWASP 推荐：m=46 MiB, t=1, p=1）
+# 内存预算：同时进行的哈希数受 HASH_POOL 线程数限制，
+# 峰值内存约为 ARGON2_MEMORY_COST_KIB × HASH_POOL_SIZE（如 8 核约 368 MiB），
+# 与并发登录请求数无关。超过 46 MiB 后加大内存带来的安全收益有限，
+# 如需调整请同时考虑线程数；参数变化后旧哈希会在登录成功时自动升级。
+ARGON2_MEMORY_COST_KIB = int(os.getenv("ARGON2_MEMORY_COST_KIB", str(46 * 1024)))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "1"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+
+_password_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST_KIB,
+    parallelism=ARGON2_PARALLELISM,
+    type=Type.ID,
+)
+
+_ARGON2_PREFIX = "$argon2"
+
+
 def hash_password(password: str) -> str:
     """
-    使用 bcrypt 哈希密码
+    使用 Argon2id 哈希密码
     
     Args:
         password: 明文密码
         
     Returns:
-        str: 哈希后的密码字符串
-        
-    Note:
-        bcrypt 限制密码长度为 72 字节，超出部分会被自动截断
+        str: 哈希后的密码字符串（PHC 格式，以 $argon2id$ 开头）
         
     Example:
         >>> hashed = hash_password("my_secret_password")
-        >>> print(len(hashed))  # bcrypt hash 长度约为 60
-        60
+        >>> hashed.startswith("$argon2id$")
+        True
     """
-    # bcrypt 限制密码为 72 字节，手动截断以避免错误
-    password_bytes = password.encode('utf-8')[:72]
-    
-    # 使用 bcrypt 直接哈希（bcrypt.hashpw 需要 bytes 类型）
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    
-    # 返回字符串格式
-    return hashed.decode('utf-8')
+    return _password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -69,13 +101,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     
     Args:
         plain_password: 明文密码
-        hashed_password: 数据库中存储的哈希密码
+        hashed_password: 数据库中存储的哈希密码（Argon2id 或旧的 bcrypt）
         
     Returns:
         bool: 密码是否匹配
         
     Note:
-        bcrypt 限制密码长度为 72 字节，超出部分会被自动截断
+        旧 bcrypt 哈希限制密码长度为 72 字节，超出部分会被自动截断
         
     Example:
         >>> hashed = hash_password("my_password")
@@ -84,7 +116,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         >>> verify_password("wrong_password", hashed)
         False
     """
-    # bcrypt 限制密码为 72 字节，手动截断以保持与哈希时一致
+    if hashed_password.startswith(_ARGON2_PREFIX):
+        try:
+            return _password_hasher.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    # 旧 bcrypt 哈希：限制密码为 72 字节，手动截断以保持与哈希时一致
     password_bytes = plain_password.encode('utf-8')[:72]
     hashed_bytes = hashed_password.encode('utf-8')
     
@@ -92,6 +130,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    检查哈希是否需要升级（旧 bcrypt 哈希或 Argon2 参数已变化）
+    
+    Args:
+        hashed_password: 数据库中存储的哈希密码
+        
+    Returns:
+        bool: 是否应在下次登录成功后重新哈希
+    """
+    if not hashed_password.startswith(_ARGON2_PREFIX):
+        return True
+    try:
+        return _password_hasher.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return True
+
+
+# argon2 / bcrypt 在计算哈希时都会释放 GIL，使用有界线程池即可并行，
+# 且避免在 async 处理函数中阻塞事件循环；线程数同时限定了 Argon2 的峰值内存
+HASH_POOL_SIZE = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+HASH_POOL = ThreadPoolExecutor(
+    max_workers=HASH_POOL_SIZE,
+    thread_name_prefix="password-hash"
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """在线程池中执行 hash_password，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_POOL, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在线程池中执行 verify_password，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_POOL, verify_password, plain_password, hashed_password)
+
+
 # ============================================
 # JWT Token Management
 # ============================================
@@ -125,7 +203,7 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
         "type": "access"
     })
     
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
@@ -154,7 +232,7 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
         "type": "refresh"
     })
     
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
@@ -177,7 +255,7 @@ def decode_token(token: str) -> Optional[Dict[str, Any]]:
         'access'
     """
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
         return payload
     except JWTError:
         return None
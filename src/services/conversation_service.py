@@ -4,10 +4,11 @@ Conversation Service
 编排 STT → Agent → TTS 的完整对话流程，支持灵活的输入输出模式。
 """
 
+import asyncio
 import json
 import logging
-import uuid
-from typing import Optional, Dict, Any, AsyncGenerator
+import secrets
+from typing import Optional, Dict, Any, AsyncGenerator, AsyncIterator, List, Tuple
 from datetime import datetime
 from enum import Enum
 
@@ -31,6 +32,103 @@ def serialize_datetime(obj: Any) -> Any:
     return obj
 
 
+# 句子结束符：流式 TTS 以句为单位合成，保证韵律自然
+_SENTENCE_END_CHARS = frozenset("。！？!?；;\n")
+# 过短的片段并入下一句，避免为几个字单独发起一次 TTS 请求
+MIN_TTS_SEGMENT_CHARS = 8
+
+_EMPTY_RESPONSE_FALLBACK = "抱歉，我没有理解你的问题，请重新表达。"
+
+# 可边上传边识别的音频格式：原始 PCM 无需解码，压缩格式需完整文件才能转换
+_STREAMABLE_AUDIO_FORMATS = frozenset({"pcm", "raw"})
+
+
+# 流式音频合并块大小：TTS 帧通常只有几 KB，合并后减少每块的 ASGI/发送开销
+# （24kHz MP3 约 6 KB/s，8 KB 约 1 秒音频，不会明显推迟播放）
+AUDIO_COALESCE_BYTES = 8 * 1024
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[bytes],
+    min_size: int = AUDIO_COALESCE_BYTES
+) -> AsyncGenerator[bytes, None]:
+    """
+    合并小数据块
+    
+    第一块立即输出以保证首包延迟；之后累积到 min_size 再输出，结束时输出剩余数据。
+    """
+    buffer = bytearray()
+    first = True
+    async for chunk in chunks:
+        if first:
+            first = False
+            yield chunk
+            continue
+        buffer += chunk
+        if len(buffer) >= min_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def log_stream_errors(chunks: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+    """透传音频流，出错时记录日志后重新抛出（响应头已发送，调用方无法再返回错误码）"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        logger.error(f"流式音频生成失败: {e}")
+        raise
+
+
+def new_conversation_session_id() -> str:
+    """生成新的对话会话 ID"""
+    # 48 位随机数（与 uuid4().hex[:12] 熵相同），无需构造完整 UUID
+    return f"conv_{secrets.token_hex(6)}"
+
+
+def _last_sentence_end(buffer: str) -> int:
+    """返回缓冲区中最后一个句子结束位置（不含）；没有则返回 -1"""
+    for i in range(len(buffer) - 1, -1, -1):
+        ch = buffer[i]
+        if ch in _SENTENCE_END_CHARS:
+            return i + 1
+        # 英文句号需后跟空白，避免拆开 3.14 之类的数字
+        if ch == "." and i + 1 < len(buffer) and buffer[i + 1].isspace():
+            return i + 1
+    return -1
+
+
+async def iter_sentences(
+    chunks: AsyncIterator[str],
+    min_chars: int = MIN_TTS_SEGMENT_CHARS
+) -> AsyncGenerator[str, None]:
+    """
+    将流式文本片段重组为句子
+    
+    Args:
+        chunks: 文本片段（如 LLM delta）
+        min_chars: 单个输出片段的最小长度
+    
+    Yields:
+        以句子边界结尾的文本片段（最后一段可能没有结束符）
+    """
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        end = _last_sentence_end(buffer)
+        if end >= min_chars:
+            sentence = buffer[:end].strip()
+            buffer = buffer[end:]
+            if sentence:
+                yield sentence
+    
+    rest = buffer.strip()
+    if rest:
+        yield rest
+
+
 class InputMode(str, Enum):
     """输入模式"""
     TEXT = "text"      # 文本输入
@@ -72,6 +170,8 @@ class ConversationService:
         self.stt_service = stt_service
         self.tts_service = tts_service
         self.audio_converter = get_audio_converter()
+        # 进行中的后台任务（保存会话历史等），持有引用避免任务被回收
+        self._background_tasks: set[asyncio.Task] = set()
         
         logger.info("ConversationService 初始化成功")
     
@@ -161,6 +261,75 @@ class ConversationService:
         else:
             raise ValueError(f"不支持的输入模式: {input_mode}")
     
+    def supports_streaming_input(self, audio_filename: Optional[str]) -> bool:
+        """音频格式是否支持边上传边识别（见 process_audio_stream_input）"""
+        if not audio_filename:
+            return False
+        return self.audio_converter.detect_format(audio_filename, b"") in _STREAMABLE_AUDIO_FORMATS
+    
+    async def process_audio_stream_input(
+        self,
+        audio_chunks: AsyncIterator[bytes]
+    ) -> tuple[str, Dict[str, Any]]:
+        """
+        处理流式语音输入（原始 PCM），边接收边识别
+        
+        音频块经 asyncio.Queue 转交 STT，识别与请求体接收并行进行；
+        音频源抛出的异常（如请求体过大）原样向上传播并取消识别。
+        
+        Args:
+            audio_chunks: PCM 音频块 (16kHz, 16-bit, mono)
+        
+        Returns:
+            (用户输入文本, 元数据)
+        
+        Raises:
+            ValueError: 音频验证或语音识别失败
+        """
+        metadata = {
+            "input_mode": InputMode.AUDIO.value,
+            "timestamp": datetime.now().isoformat(),
+            "audio_format": "pcm",
+            "audio_converted": False
+        }
+        queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        
+        async def queued_chunks() -> AsyncGenerator[bytes, None]:
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+        
+        logger.info("开始流式语音识别...")
+        stt_task = asyncio.create_task(self.stt_service.recognize_stream(queued_chunks()))
+        
+        total = 0
+        try:
+            async for chunk in audio_chunks:
+                total += len(chunk)
+                queue.put_nowait(chunk)
+            
+            is_valid, msg = self.audio_converter.validate_pcm_size(total)
+            if not is_valid:
+                raise ValueError(f"音频验证失败: {msg}")
+        except BaseException:
+            stt_task.cancel()
+            raise
+        
+        queue.put_nowait(None)
+        stt_result: STTResult = await stt_task
+        
+        logger.info(f"音频输入: 大小={total} bytes (流式)")
+        if not stt_result.success:
+            raise ValueError(f"语音识别失败: {stt_result.error_message}")
+        
+        recognized_text = stt_result.text.strip()
+        logger.info(f"语音识别成功: {recognized_text}")
+        
+        metadata["audio_duration"] = total / (
+            self.audio_converter.TARGET_SAMPLE_RATE * self.audio_converter.TARGET_SAMPLE_WIDTH
+        )
+        metadata["stt_success"] = True
+        return recognized_text, metadata
+    
     async def get_agent_response(
         self,
         user_input: str,
@@ -208,20 +377,12 @@ class ConversationService:
         """
         # 生成会话 ID（如果没有）
         if not session_id:
-            session_id = f"conv_{uuid.uuid4().hex[:12]}"
+            session_id = new_conversation_session_id()
         
         logger.info(f"调用智能体: session_id={session_id}, input={user_input[:100]}...")
         
         # 🔍 获取会话历史（如果提供了 session_manager）
-        external_history = None
-        if session_manager:
-            try:
-                history = await session_manager.get_history(session_id)
-                if history:
-                    external_history = history
-                    logger.info(f"📜 已加载 {len(history)} 条历史消息")
-            except Exception as e:
-                logger.warning(f"获取会话历史失败: {e}")
+        external_history = await self._load_history(session_id, session_manager)
         
         try:
             # 调用智能体（带会话记忆）
@@ -236,18 +397,12 @@ class ConversationService:
             agent_response = result.get("response", "")
             
             if not agent_response:
-                agent_response = "抱歉，我没有理解你的问题，请重新表达。"
+                agent_response = _EMPTY_RESPONSE_FALLBACK
             
             logger.info(f"智能体回复: {agent_response[:100]}...")
             
-            # 💾 保存新消息到会话历史（如果提供了 session_manager）
-            if session_manager:
-                try:
-                    await session_manager.add_message(session_id, "user", user_input)
-                    await session_manager.add_message(session_id, "assistant", agent_response)
-                    logger.info("✅ 已保存对话到会话历史")
-                except Exception as e:
-                    logger.warning(f"保存会话历史失败: {e}")
+            # 💾 后台保存新消息到会话历史（数据库写入不阻塞回复）
+            self._schedule_history_save(session_id, session_manager, user_input, agent_response)
             
             # 序列化所有 datetime 对象
             metadata = serialize_datetime({
@@ -272,6 +427,120 @@ class ConversationService:
             }
             return error_response, session_id, metadata
     
+    async def _load_history(
+        self,
+        session_id: str,
+        session_manager: Optional[Any]
+    ) -> Optional[List[Dict[str, str]]]:
+        """从 session_manager 加载会话历史，失败或为空时返回 None"""
+        if not session_manager:
+            return None
+        try:
+            history = await session_manager.get_history(session_id)
+            if history:
+                logger.info(f"📜 已加载 {len(history)} 条历史消息")
+                return history
+        except Exception as e:
+            logger.warning(f"获取会话历史失败: {e}")
+        return None
+    
+    async def _persist_history(
+        self,
+        session_id: str,
+        session_manager: Any,
+        messages: List[Tuple[str, str]]
+    ) -> None:
+        """将本轮对话写入数据库（后台任务）"""
+        try:
+            await session_manager.persist_messages(session_id, messages)
+            logger.info("✅ 已保存对话到会话历史")
+        except Exception as e:
+            logger.warning(f"保存会话历史失败: {e}")
+    
+    def _schedule_history_save(
+        self,
+        session_id: str,
+        session_manager: Optional[Any],
+        user_input: str,
+        agent_response: str
+    ) -> None:
+        """
+        保存本轮对话，回复无需等待数据库写入
+        
+        用户消息和回复在返回前同步写入 session_manager 的内存缓存：
+        下一轮请求读取历史时总能看到完整的一轮，同一会话并发的多轮也不会交错；
+        只有数据库写入放到后台任务中。
+        """
+        if not session_manager:
+            return
+        messages = [("user", user_input), ("assistant", agent_response)]
+        try:
+            session_manager.cache_messages(session_id, messages)
+        except Exception as e:
+            logger.warning(f"保存会话历史失败: {e}")
+            return
+        task = asyncio.create_task(self._persist_history(session_id, session_manager, messages))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def wait_background_tasks(self) -> None:
+        """等待所有后台任务完成（关闭服务时调用，避免丢失未写入的历史）"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+    
+    async def stream_agent_response(
+        self,
+        user_input: str,
+        session_id: str,
+        user_id: Optional[str] = None,
+        session_manager: Optional[Any] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        流式调用智能体，逐段产出回复文本
+        
+        与 get_agent_response 语义一致：空回复使用兜底文案，出错时产出错误提示，
+        成功后在后台保存会话历史。
+        
+        Args:
+            user_input: 用户输入文本
+            session_id: 会话ID
+            user_id: 用户ID
+            session_manager: 会话历史管理器（可选）
+        
+        Yields:
+            回复文本片段（LLM delta）
+        """
+        logger.info(f"流式调用智能体: session_id={session_id}, input={user_input[:100]}...")
+        external_history = await self._load_history(session_id, session_manager)
+        
+        collected: List[str] = []
+        try:
+            async for event in self.agent.process_message_stream(
+                user_input=user_input,
+                session_id=session_id,
+                user_id=user_id or "anonymous",
+                external_history=external_history
+            ):
+                event_type = event.get("type")
+                if event_type == "delta" and event.get("content"):
+                    collected.append(event["content"])
+                    yield event["content"]
+                elif event_type == "error":
+                    raise RuntimeError(event.get("error") or "未知错误")
+        except Exception as e:
+            logger.error(f"智能体流式调用失败: {e}", exc_info=True)
+            if not collected:
+                yield f"抱歉，处理您的请求时出现了错误：{str(e)}"
+            return
+        
+        if not collected:
+            collected.append(_EMPTY_RESPONSE_FALLBACK)
+            yield _EMPTY_RESPONSE_FALLBACK
+        
+        agent_response = "".join(collected)
+        logger.info(f"智能体回复: {agent_response[:100]}...")
+        self._schedule_history_save(session_id, session_manager, user_input, agent_response)
+    
     async def generate_output_text(
         self,
         response_text: str
@@ -315,13 +584,15 @@ class ConversationService:
         logger.info(f"开始流式TTS合成: 文本长度={len(response_text)}, 发音人={voice}")
         
         try:
-            async for audio_chunk in self.tts_service.synthesize_stream(
+            audio_stream = self.tts_service.synthesize_stream(
                 text=response_text,
                 vcn=voice,
                 speed=speed,
                 volume=volume,
                 pitch=pitch
-            ):
+            )
+            # 每次合成结束时会输出剩余数据，流水线模式下句间不会滞留音频
+            async for audio_chunk in coalesce_chunks(audio_stream):
                 if audio_chunk:
                     yield audio_chunk
             
@@ -331,6 +602,128 @@ class ConversationService:
             logger.error(f"流式TTS失败: {e}", exc_info=True)
             raise ValueError(f"语音合成失败: {str(e)}")
     
+    async def generate_pipelined_audio_stream(
+        self,
+        text_stream: AsyncIterator[str],
+        voice: str = "x5_lingxiaoxuan_flow",
+        speed: int = 50,
+        volume: int = 50,
+        pitch: int = 50
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        边生成文本边合成语音
+        
+        后台任务把文本流按句切分放入队列，当前句在合成时 LLM 继续生成下一句，
+        首个音频块只需等待第一句生成完成，而不是整段回复。
+        
+        Args:
+            text_stream: 回复文本片段流（如 stream_agent_response）
+            voice: 发音人
+            speed: 语速
+            volume: 音量
+            pitch: 音调
+        
+        Yields:
+            音频数据块
+        """
+        queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        
+        async def produce_sentences() -> None:
+            try:
+                async for sentence in iter_sentences(text_stream):
+                    await queue.put(sentence)
+            finally:
+                await queue.put(None)
+        
+        producer = asyncio.create_task(produce_sentences())
+        try:
+            while (sentence := await queue.get()) is not None:
+                async for chunk in self.generate_output_audio_stream(
+                    response_text=sentence,
+                    voice=voice,
+                    speed=speed,
+                    volume=volume,
+                    pitch=pitch
+                ):
+                    yield chunk
+            # 传播文本流中的异常
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+    
+    async def process_conversation_stream(
+        self,
+        text: Optional[str] = None,
+        audio_data: Optional[bytes] = None,
+        audio_filename: Optional[str] = None,
+        input_mode: InputMode = InputMode.TEXT,
+        voice: str = "x5_lingxiaoxuan_flow",
+        speed: int = 50,
+        volume: int = 50,
+        pitch: int = 50,
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        session_manager=None,
+        audio_chunks: Optional[AsyncIterator[bytes]] = None
+    ) -> tuple[str, Dict[str, Any], str, AsyncGenerator[bytes, None]]:
+        """
+        流式对话：处理输入，返回流水线语音流
+        
+        只等待输入处理（文本校验或 STT）完成；智能体生成与语音合成在消费
+        返回的音频流时进行，调用方可先发送响应头。
+        
+        Args:
+            text: 文本输入
+            audio_data: 音频输入
+            audio_filename: 音频文件名
+            input_mode: 输入模式
+            voice: 发音人
+            speed: 语速
+            volume: 音量
+            pitch: 音调
+            session_id: 会话ID（为空时生成新 ID）
+            user_id: 用户ID
+            session_manager: 会话历史管理器
+            audio_chunks: 流式 PCM 音频输入（给出时边接收边识别，忽略其他输入参数）
+        
+        Returns:
+            (用户输入文本, 输入元数据, 会话ID, 音频流)
+        
+        Raises:
+            ValueError: 输入验证或语音识别失败
+        """
+        if audio_chunks is not None:
+            user_input, input_metadata = await self.process_audio_stream_input(audio_chunks)
+        else:
+            user_input, input_metadata = await self.process_input(
+                text=text,
+                audio_data=audio_data,
+                audio_filename=audio_filename,
+                input_mode=input_mode
+            )
+        
+        session_id = session_id or new_conversation_session_id()
+        text_stream = self.stream_agent_response(
+            user_input=user_input,
+            session_id=session_id,
+            user_id=user_id,
+            session_manager=session_manager
+        )
+        
+        audio_stream = log_stream_errors(
+            self.generate_pipelined_audio_stream(
+                text_stream,
+                voice=voice,
+                speed=speed,
+                volume=volume,
+                pitch=pitch
+            )
+        )
+        
+        logger.info(f"流式输出: session={session_id}")
+        return user_input, input_metadata, session_id, audio_stream
+    
     async def process_conversation(
         self,
         # 输入参数
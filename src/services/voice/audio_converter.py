@@ -235,20 +235,32 @@ class AudioConverter:
         Args:
             pcm_data: PCM音频数据
             
+        Returns:
+            (is_valid, message)
+        """
+        return self.validate_pcm_size(len(pcm_data))
+    
+    def validate_pcm_size(self, size: int) -> Tuple[bool, str]:
+        """
+        按字节数验证PCM音频（流式输入时无需持有完整数据）
+        
+        Args:
+            size: PCM音频字节数
+            
         Returns:
             (is_valid, message)
         """
         # 检查大小
         min_size = self.TARGET_SAMPLE_RATE * self.TARGET_SAMPLE_WIDTH * 0.1  # 至少0.1秒
-        if len(pcm_data) < min_size:
-            return False, f"音频过短: {len(pcm_data)} bytes (最小 {min_size} bytes)"
+        if size < min_size:
+            return False, f"音频过短: {size} bytes (最小 {min_size} bytes)"
         
         max_size = 10 * 1024 * 1024  # 10MB
-        if len(pcm_data) > max_size:
-            return False, f"音频过大: {len(pcm_data)} bytes (最大 {max_size} bytes)"
+        if size > max_size:
+            return False, f"音频过大: {size} bytes (最大 {max_size} bytes)"
         
         # 检查时长
-        duration = len(pcm_data) / (self.TARGET_SAMPLE_RATE * self.TARGET_SAMPLE_WIDTH)
+        duration = size / (self.TARGET_SAMPLE_RATE * self.TARGET_SAMPLE_WIDTH)
         max_duration = 60  # 60秒
         if duration > max_duration:
             return False, f"音频过长: {duration:.2f}秒 (最大 {max_duration}秒)"
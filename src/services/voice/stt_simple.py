@@ -12,7 +12,7 @@ import base64
 import json
 import logging
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 import websockets
 from websockets.exceptions import WebSocketException
@@ -22,6 +22,20 @@ from services.voice.iflytek_auth import IFlytekAuthenticator
 
 logger = logging.getLogger(__name__)
 
+# 音频帧参数（参考官方demo）
+FRAME_SIZE = 1280      # 每帧大小 (40ms @ 16kHz)
+FRAME_INTERVAL = 0.04  # 发送间隔
+
+# 帧状态标识
+STATUS_FIRST_FRAME = 0
+STATUS_CONTINUE_FRAME = 1
+STATUS_LAST_FRAME = 2
+
+
+async def _single_chunk(audio_data: bytes) -> AsyncIterator[bytes]:
+    """把完整音频包装为只有一块的音频流"""
+    yield audio_data
+
 
 @dataclass
 class STTConfig:
@@ -67,6 +81,21 @@ class IFlytekSTTService:
         Args:
             audio_data: PCM音频数据 (16kHz, 16-bit, mono)
         
+        Returns:
+            STTResult: 识别结果
+        """
+        return await self.recognize_stream(_single_chunk(audio_data))
+    
+    async def recognize_stream(self, audio_chunks: AsyncIterator[bytes]) -> STTResult:
+        """
+        识别音频流（边接收边发送）
+        
+        音频块到达后即按帧发往讯飞，上传与识别重叠进行，
+        最后一块到达后很快即可得到结果。
+        
+        Args:
+            audio_chunks: PCM音频块 (16kHz, 16-bit, mono)，块大小任意
+        
         Returns:
             STTResult: 识别结果
         """
@@ -84,7 +113,7 @@ class IFlytekSTTService:
             ) as ws:
                 
                 # 发送音频帧
-                await self._send_audio_frames(ws, audio_data)
+                await self._send_audio_frames(ws, audio_chunks)
                 
                 # 接收所有响应，收集识别结果
                 result_text = await self._receive_results(ws)
@@ -110,102 +139,75 @@ class IFlytekSTTService:
                 error_code=-1,
                 error_message=str(e)
             )
+    
+    def _build_frame(self, status: int, chunk: bytes) -> str:
+        """构建音频帧消息（严格按照官方demo格式，第一帧包含parameter）"""
+        message: Dict[str, Any] = {
+            "header": {
+                "status": status,
+                "app_id": self.config.appid
+            },
+            "payload": {
+                "audio": {
+                    "audio": base64.b64encode(chunk).decode('utf-8'),
+                    "sample_rate": self.config.sample_rate,
+                    "encoding": self.config.encoding
+                }
+            }
+        }
+        if status == STATUS_FIRST_FRAME:
+            message["parameter"] = {
+                "iat": {
+                    "domain": self.config.domain,
+                    "language": self.config.language,
+                    "accent": self.config.accent,
+                    "result": {
+                        "encoding": "utf8",
+                        "compress": "raw",
+                        "format": "json"
+                    }
+                }
+            }
+        return json.dumps(message)
+    
     # 具体发送音频文件的方式
-    async def _send_audio_frames(self, ws, audio_data: bytes):
-        """发送音频帧（按照官方demo的格式）"""
+    async def _send_audio_frames(self, ws, audio_chunks: AsyncIterator[bytes]):
+        """
+        发送音频帧（按照官方demo的格式）
         
-        frame_size = 1280  # 每帧大小 (40ms @ 16kHz)
-        interval = 0.04    # 发送间隔
+        输入块重新切分为固定大小的帧；始终保留一帧，
+        等音频流结束后作为最后一帧 (status=2) 发送。
+        """
+        status = STATUS_FIRST_FRAME
+        buffer = bytearray()
+        pending: Optional[bytes] = None
+        total = 0
         
-        # 状态标识
-        STATUS_FIRST_FRAME = 0
-        STATUS_CONTINUE_FRAME = 1
-        STATUS_LAST_FRAME = 2
+        logger.info("开始发送音频")
         
-        status = STATUS_FIRST_FRAME
-        offset = 0
+        async for chunk in audio_chunks:
+            buffer += chunk
+            total += len(chunk)
+            while len(buffer) >= FRAME_SIZE:
+                if pending is not None:
+                    await ws.send(self._build_frame(status, pending))
+                    status = STATUS_CONTINUE_FRAME
+                    # 等待间隔（模拟实时音频流）
+                    await asyncio.sleep(FRAME_INTERVAL)
+                pending = bytes(buffer[:FRAME_SIZE])
+                del buffer[:FRAME_SIZE]
         
-        logger.info(f"开始发送音频: {len(audio_data)} bytes")
+        if pending is not None and buffer:
+            # 保留的帧之后还有不足一帧的数据
+            await ws.send(self._build_frame(status, pending))
+            await asyncio.sleep(FRAME_INTERVAL)
+            pending = bytes(buffer)
+        elif pending is None:
+            pending = bytes(buffer)
         
-        while offset < len(audio_data):
-            # 读取一帧
-            chunk = audio_data[offset:offset + frame_size]
-            offset += frame_size
-            
-            # 判断是否最后一帧
-            if offset >= len(audio_data):
-                status = STATUS_LAST_FRAME
-            
-            # 构建消息（严格按照官方demo格式）
-            if status == STATUS_FIRST_FRAME:
-                # 第一帧包含parameter
-                message = {
-                    "header": {
-                        "status": STATUS_FIRST_FRAME,
-                        "app_id": self.config.appid
-                    },
-                    "parameter": {
-                        "iat": {
-                            "domain": self.config.domain,
-                            "language": self.config.language,
-                            "accent": self.config.accent,
-                            "result": {
-                                "encoding": "utf8",
-                                "compress": "raw",
-                                "format": "json"
-                            }
-                        }
-                    },
-                    "payload": {
-                        "audio": {
-                            "audio": base64.b64encode(chunk).decode('utf-8'),
-                            "sample_rate": self.config.sample_rate,
-                            "encoding": self.config.encoding
-                        }
-                    }
-                }
-                status = STATUS_CONTINUE_FRAME
-                
-            elif status == STATUS_CONTINUE_FRAME:
-                # 中间帧
-                message = {
-                    "header": {
-                        "status": STATUS_CONTINUE_FRAME,
-                        "app_id": self.config.appid
-                    },
-                    "payload": {
-                        "audio": {
-                            "audio": base64.b64encode(chunk).decode('utf-8'),
-                            "sample_rate": self.config.sample_rate,
-                            "encoding": self.config.encoding
-                        }
-                    }
-                }
-                
-            else:  # STATUS_LAST_FRAME
-                # 最后一帧
-                message = {
-                    "header": {
-                        "status": STATUS_LAST_FRAME,
-                        "app_id": self.config.appid
-                    },
-                    "payload": {
-                        "audio": {
-                            "audio": base64.b64encode(chunk).decode('utf-8'),
-                            "sample_rate": self.config.sample_rate,
-                            "encoding": self.config.encoding
-                        }
-                    }
-                }
-            
-            # 发送
-            await ws.send(json.dumps(message))
-            
-            # 等待间隔（模拟实时音频流）
-            if status != STATUS_LAST_FRAME:
-                await asyncio.sleep(interval)
+        await ws.send(self._build_frame(STATUS_LAST_FRAME, pending))
         
-        logger.info(f"音频发送完成")
+        logger.info(f"音频发送完成: {total} bytes")
     # 严格按照官方的方式来接收信息
     async def _receive_results(self, ws) -> str:
         """接收识别结果（按照官方demo的解析方式）"""
@@ -15,16 +15,36 @@ import asyncio
 import base64
 import json
 import logging
+import os
 import re
-from typing import AsyncGenerator, Callable, List, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
 
 import websockets
 from websockets.exceptions import WebSocketException
 
 from config.settings import get_config
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# 进程级 TTS 连接池：所有服务实例共享，限制同时打开的 iFlytek WebSocket 连接数。
+# 超出账号并发上限时讯飞直接返回错误（该句被丢弃），排队等待则只增加少量延迟。
+# 按句获取/释放，长回复不会长期占用名额，新请求在下一句边界即可插入。
+TTS_MAX_CONCURRENT_CONNECTIONS = int(os.getenv("TTS_MAX_CONCURRENT_CONNECTIONS", "10"))
+
+_connection_slots = asyncio.Semaphore(TTS_MAX_CONCURRENT_CONNECTIONS)
+
+# 短句音频缓存：回复中的高频短句（"好的。"、"请稍等。"）直接复用已合成的音频，
+# 不再占用连接名额、请求讯飞。键为 (句子, 发音人, 音量, 语速, 音调)；
+# 只缓存完整合成成功的句子。24kHz MP3 下 50 字约 60 KB，512 条上限约 30 MB。
+TTS_CACHE_MAX_ENTRIES = 512
+TTS_CACHE_TTL_SECONDS = 3600
+TTS_CACHE_MAX_SENTENCE_CHARS = 50
+
+_sentence_audio_cache: TTLCache[bytes] = TTLCache(
+    maxsize=TTS_CACHE_MAX_ENTRIES, ttl=TTS_CACHE_TTL_SECONDS
+)
+
 
 class IFlytekTTSStreamingService:
     """
@@ -154,7 +174,31 @@ class IFlytekTTSStreamingService:
         logger.info(f"文本分句: {len(text)} 字符 → {len(result)} 句")
         return result
     
-    def _build_request_frame(self, text: str, is_last: bool = True) -> str:
+    def _voice_params(
+        self,
+        vcn: Optional[str] = None,
+        speed: Optional[int] = None,
+        volume: Optional[int] = None,
+        pitch: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        合并单次请求的语音参数（不修改实例属性）
+        
+        服务实例在并发请求间共享，参数只能按请求传递。
+        """
+        return {
+            "vcn": vcn or self.voice,
+            "volume": volume if volume is not None else self.volume,
+            "speed": speed if speed is not None else self.speed,
+            "pitch": pitch if pitch is not None else self.pitch,
+        }
+    
+    def _build_request_frame(
+        self,
+        text: str,
+        is_last: bool = True,
+        voice_params: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         构建 TTS 请求帧（JSON 格式，参照官方 demo）
         
@@ -163,10 +207,12 @@ class IFlytekTTSStreamingService:
         Args:
             text: 待合成文本（原始字符串，会在函数内 Base64 编码）
             is_last: 是否为最后一帧
+            voice_params: 语音参数（vcn/volume/speed/pitch，默认使用实例配置）
         
         Returns:
             JSON 字符串
         """
+        voice_params = voice_params or self._voice_params()
         frame = {
             "header": {
                 "app_id": self.appid,
@@ -174,10 +220,7 @@ class IFlytekTTSStreamingService:
             },
             "parameter": {
                 "tts": {
-                    "vcn": self.voice,
-                    "volume": self.volume,
-                    "speed": self.speed,
-                    "pitch": self.pitch,
+                    **voice_params,
                     "rhy": 0,  # 韵律标记
                     "bgs": 0,  # 背景音
                     "reg": 0,  # 英文发音
@@ -208,7 +251,8 @@ class IFlytekTTSStreamingService:
     async def _synthesize_single_sentence(
         self,
         ws: websockets.WebSocketClientProtocol,
-        sentence: str
+        sentence: str,
+        voice_params: Optional[Dict[str, Any]] = None
     ) -> AsyncGenerator[bytes, None]:
         """
         合成单个句子（发送请求 + 接收音频流）
@@ -216,12 +260,13 @@ class IFlytekTTSStreamingService:
         Args:
             ws: WebSocket 连接
             sentence: 待合成句子
+            voice_params: 语音参数（默认使用实例配置）
         
         Yields:
             音频块（bytes）
         """
         # 发送文本帧
-        frame = self._build_request_frame(sentence, is_last=True)
+        frame = self._build_request_frame(sentence, is_last=True, voice_params=voice_params)
         await ws.send(frame)
         logger.debug(f"TTS 发送: {len(sentence)} 字符")
         
@@ -257,6 +302,9 @@ class IFlytekTTSStreamingService:
             except json.JSONDecodeError as e:
                 logger.error(f"TTS 响应解析失败: {e}")
                 raise
+        else:
+            # 未收到最后一帧连接就已关闭，音频不完整
+            raise RuntimeError("TTS 连接在合成完成前关闭")
     
     async def synthesize_stream(
         self,
@@ -283,33 +331,32 @@ class IFlytekTTSStreamingService:
             async for audio_chunk in service.synthesize_stream("长文本..."):
                 await websocket.send(audio_chunk)
         """
-        # 覆盖参数（如果提供）
-        original_voice = self.voice
-        original_speed = self.speed
-        original_volume = self.volume
-        original_pitch = self.pitch
-        
-        try:
-            if vcn:
-                self.voice = vcn
-            if speed is not None:
-                self.speed = speed
-            if volume is not None:
-                self.volume = volume
-            if pitch is not None:
-                self.pitch = pitch
-            
-            # 分句
-            sentences = self._split_sentences(text)
-            if not sentences:
-                logger.warning("文本为空，无法合成")
-                return
-            
-            logger.info(f"开始 TTS 流式合成: {len(sentences)} 句")
+        # 本次请求的语音参数（不修改共享实例的属性）
+        voice_params = self._voice_params(vcn, speed, volume, pitch)
+        
+        # 分句
+        sentences = self._split_sentences(text)
+        if not sentences:
+            logger.warning("文本为空，无法合成")
+            return
+        
+        logger.info(f"开始 TTS 流式合成: {len(sentences)} 句")
+        
+        # 逐句合成
+        for i, sentence in enumerate(sentences):
+            cache_key = None
+            if len(sentence) <= TTS_CACHE_MAX_SENTENCE_CHARS:
+                cache_key = (sentence, *voice_params.values())
+                cached_audio = _sentence_audio_cache.get(cache_key)
+                if cached_audio is not None:
+                    logger.debug(f"句子 {i + 1}/{len(sentences)} 命中音频缓存")
+                    yield cached_audio
+                    continue
             
-            # 逐句合成
-            for i, sentence in enumerate(sentences):
-                try:
+            audio_chunks: List[bytes] = []
+            try:
+                # 每句占用一个连接名额，合成结束即释放
+                async with _connection_slots:
                     # 生成认证 URL（每句独立连接，避免超时）
                     ws_url = self.authenticator.build_auth_url(self.base_url)
                     
@@ -320,24 +367,24 @@ class IFlytekTTSStreamingService:
                         close_timeout=10
                     ) as ws:
                         # 合成并推送
-                        async for audio_chunk in self._synthesize_single_sentence(ws, sentence):
+                        async for audio_chunk in self._synthesize_single_sentence(
+                            ws, sentence, voice_params
+                        ):
+                            if cache_key is not None:
+                                audio_chunks.append(audio_chunk)
                             yield audio_chunk
-                    
-                    logger.debug(f"句子 {i + 1}/{len(sentences)} 合成成功")
                 
-                except Exception as e:
-                    logger.error(f"句子 {i + 1} 合成失败: {e}")
-                    # 继续下一句（部分失败不影响整体）
-                    continue
+                if audio_chunks:
+                    _sentence_audio_cache.set(cache_key, b"".join(audio_chunks))
+                
+                logger.debug(f"句子 {i + 1}/{len(sentences)} 合成成功")
             
-            logger.info("TTS 流式合成完成")
-        
-        finally:
-            # 恢复原始参数
-            self.voice = original_voice
-            self.speed = original_speed
-            self.volume = original_volume
-            self.pitch = original_pitch
+            except Exception as e:
+                logger.error(f"句子 {i + 1} 合成失败: {e}")
+                # 继续下一句（部分失败不影响整体）
+                continue
+        
+        logger.info("TTS 流式合成完成")
     
     async def synthesize_with_callback(
         self,
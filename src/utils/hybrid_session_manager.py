@@ -12,7 +12,7 @@ Hybrid Session Manager
 
 import logging
 import asyncio
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Sequence, Tuple
 from collections import deque, defaultdict
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -164,16 +164,8 @@ class HybridSessionManager:
             content: 消息内容
             metadata: 元数据
         """
-        message = {
-            "role": role,
-            "content": content
-        }
-        
         # 1. 写入内存缓存（不需要锁，快速完成）
-        self._sessions[session_id].append(message)
-        self._last_activity[session_id] = datetime.now()
-        
-        logger.debug(f"💬 添加消息到缓存: session={session_id}, role={role}")
+        self.cache_messages(session_id, [(role, content)])
         
         # 2. 写入数据库（如果启用）- 使用锁保护
         if self._enable_database and not self._fallback_mode:
@@ -188,6 +180,48 @@ class HybridSessionManager:
                 logger.error(f"数据库写入失败: {e}", exc_info=True)
                 self._handle_database_error()
     
+    def cache_messages(self, session_id: str, messages: Sequence[Tuple[str, str]]) -> None:
+        """
+        同步写入内存缓存
+        
+        没有挂起点：返回后 get_history 立即可见，同一批消息在缓存中保持连续，
+        不会与其他请求的消息交错。
+        
+        Args:
+            session_id: 会话ID
+            messages: (role, content) 列表
+        """
+        cache = self._sessions[session_id]
+        for role, content in messages:
+            cache.append({"role": role, "content": content})
+            logger.debug(f"💬 添加消息到缓存: session={session_id}, role={role}")
+        self._last_activity[session_id] = datetime.now()
+    
+    async def persist_messages(self, session_id: str, messages: Sequence[Tuple[str, str]]) -> None:
+        """
+        将一批已写入缓存的消息持久化到数据库（异步）
+        
+        整批在一次加锁内按顺序写入，不会与其他批次交错。
+        
+        Args:
+            session_id: 会话ID
+            messages: (role, content) 列表
+        """
+        if not self._enable_database or self._fallback_mode:
+            return
+        
+        try:
+            # 🔒 使用锁确保数据库操作串行化
+            async with self._db_lock:
+                for role, content in messages:
+                    await self._save_to_database(session_id, role, content)
+                    self._stats["db_writes"] += 1
+            logger.debug(f"💾 {len(messages)} 条消息已持久化到数据库")
+        
+        except Exception as e:
+            logger.error(f"数据库写入失败: {e}", exc_info=True)
+            self._handle_database_error()
+    
     async def clear_session(self, session_id: str) -> None:
         """
         清除会话（异步）
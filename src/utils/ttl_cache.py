@@ -0,0 +1,86 @@
+"""
+TTL Cache
+
+Small in-process LRU cache with per-entry expiry, used to avoid repeating
+expensive lookups (JWT verification, user rows) on every request.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Bounded LRU cache whose entries expire after a time-to-live.
+
+    Features:
+    - Least-recently-used eviction once maxsize is reached
+    - Default TTL with optional per-entry override
+    - Expired entries are dropped lazily on access
+
+    Not thread-safe; intended for use from a single asyncio event loop
+    (no awaits happen while the cache is being mutated).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+            ttl: Default time-to-live in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time-to-live in seconds (defaults to the cache TTL)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        """Remove an entry and return its value if it was present."""
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
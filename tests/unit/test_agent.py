@@ -49,6 +49,17 @@ class TestAgentState:
         assert message.metadata["test"] is True
         assert isinstance(message.timestamp, datetime)
     
+    def test_conversation_message_is_frozen(self):
+        """Test that messages are immutable and reject unknown fields."""
+        from pydantic import ValidationError
+        
+        message = ConversationMessage(id="m1", role=MessageRole.USER, content="hi")
+        with pytest.raises(ValidationError):
+            message.content = "changed"
+        with pytest.raises(ValidationError):
+            ConversationMessage(id="m2", role=MessageRole.USER, content="hi", extra_field=1)
+        assert json.loads(message.model_dump_json())["timestamp"] == message.timestamp.isoformat()
+    
     def test_tool_call_creation(self):
         """Test tool call creation."""
         tool_call = ToolCall(
@@ -109,6 +120,8 @@ class TestAgentState:
         assistant_msg = context.add_message(MessageRole.ASSISTANT, "Hi there!")
         assert len(context.messages) == 2
         assert context.message_count == 2
+        assert assistant_msg.id.startswith("msg_2_")
+        assert assistant_msg.id != user_msg.id
         
         # Test tool calls
         tool_call = context.add_tool_call("search", {"query": "test"})
@@ -125,6 +138,26 @@ class TestAgentState:
         assert len(recent) == 1
         assert recent[0].content == "Hi there!"
     
+    def test_conversation_context_history_is_bounded(self):
+        """Test that message history is capped and clear_history keeps the tail."""
+        from agent import state as state_module
+        
+        with patch.object(state_module, "MAX_CONTEXT_MESSAGES", 3):
+            context = ConversationContext(session_id="test_session")
+            for i in range(5):
+                context.add_message(MessageRole.USER, f"m{i}")
+        
+        assert [m.content for m in context.messages] == ["m2", "m3", "m4"]
+        assert context.message_count == 5
+        assert [m.content for m in context.get_recent_messages(2)] == ["m3", "m4"]
+        
+        context.clear_history(keep_count=1)
+        assert [m.content for m in context.messages] == ["m4"]
+        assert context.message_count == 1
+        
+        context.clear_history()
+        assert len(context.messages) == 0
+    
     def test_state_to_dict(self):
         """Test state serialization to dictionary."""
         state = create_initial_state("test", "input")
@@ -134,6 +167,19 @@ class TestAgentState:
         assert state_dict["session_id"] == "test"
         assert state_dict["user_input"] == "input"
         assert isinstance(state_dict["conversation_start"], str)  # Should be ISO format
+    
+    def test_state_to_dict_is_json_serializable(self):
+        """Test that nested models are dumped in JSON mode."""
+        state = create_initial_state("test", "input")
+        state["messages"].append(ConversationMessage(id="m1", role=MessageRole.USER, content="hi"))
+        state["messages"].append({"role": "assistant", "content": "hello"})
+        state_dict = state_to_dict(state)
+        
+        assert state_dict["messages"][0]["role"] == "user"
+        assert isinstance(state_dict["messages"][0]["timestamp"], str)
+        assert state_dict["messages"][1] == {"role": "assistant", "content": "hello"}
+        assert "external_history" not in state_dict
+        json.dumps(state_dict)
 
 
 class TestAgentNodes:
@@ -0,0 +1,183 @@
+"""
+Unit Tests for the authentication service and routes
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import bcrypt
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from services.auth_service import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    hash_password,
+    hash_password_async,
+    password_needs_rehash,
+    verify_password,
+    verify_password_async,
+)
+
+
+@pytest.fixture
+def auth_client():
+    """TestClient for the auth router with the DB session dependency stubbed out."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api import auth_routes
+
+    async def no_session():
+        yield None
+
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/api/v1")
+    app.dependency_overrides[auth_routes.get_db_session] = no_session
+    yield TestClient(app)
+
+
+class TestPasswordHashing:
+    """Test cases for password hashing helpers."""
+
+    @pytest.mark.asyncio
+    async def test_async_hash_and_verify_roundtrip(self):
+        hashed = await hash_password_async("my_password")
+
+        assert verify_password("my_password", hashed)
+        assert await verify_password_async("my_password", hashed) is True
+        assert await verify_password_async("wrong_password", hashed) is False
+
+    def test_new_hashes_use_argon2id(self):
+        hashed = hash_password("my_password")
+
+        assert hashed.startswith("$argon2id$")
+        assert verify_password("my_password", hashed)
+        assert not verify_password("wrong_password", hashed)
+        assert not password_needs_rehash(hashed)
+
+    def test_legacy_bcrypt_hash_still_verifies(self):
+        legacy = bcrypt.hashpw(b"my_password", bcrypt.gensalt(rounds=4)).decode("utf-8")
+
+        assert verify_password("my_password", legacy)
+        assert not verify_password("wrong_password", legacy)
+        assert password_needs_rehash(legacy)
+
+
+
+class TestTokens:
+    """Test cases for JWT creation and decoding."""
+
+    def test_token_roundtrip(self):
+        access = decode_token(create_access_token({"sub": "user123"}))
+        refresh = decode_token(create_refresh_token({"sub": "user123"}))
+
+        assert access["sub"] == "user123" and access["type"] == "access"
+        assert refresh["sub"] == "user123" and refresh["type"] == "refresh"
+
+    def test_tampered_token_is_rejected(self):
+        token = create_access_token({"sub": "user123"})
+        header, payload, signature = token.split(".")
+        tampered = ".".join([header, payload, signature[::-1]])
+
+        assert decode_token(tampered) is None
+        assert decode_token("not-a-token") is None
+
+class TestRegisterUser:
+    """Test cases for the register endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_integrity_error_maps_to_conflict(self):
+        from fastapi import HTTPException
+        from sqlalchemy.exc import IntegrityError
+        from api import auth_routes
+
+        request = auth_routes.UserRegisterRequest(
+            username="john_doe", email="john@example.com", password="SecurePass123"
+        )
+        session = SimpleNamespace(rollback=AsyncMock())
+
+        with patch.object(auth_routes, "UserRepository") as repo_cls, \
+                patch.object(auth_routes, "hash_password_async", AsyncMock(return_value="hashed")):
+            repo = repo_cls.return_value
+            repo.get_conflicts = AsyncMock(side_effect=[(False, False), (False, True)])
+            repo.create_user = AsyncMock(side_effect=IntegrityError("INSERT", {}, Exception("dup")))
+
+            with pytest.raises(HTTPException) as exc_info:
+                await auth_routes.register_user(request, session=session)
+
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == "邮箱已被注册"
+        session.rollback.assert_awaited_once()
+
+
+class TestRefreshEndpoint:
+    """Test cases for the refresh endpoint response."""
+
+    def test_refresh_returns_token_pair(self, auth_client):
+        import uuid
+        from api import auth_routes
+
+        user_id = uuid.uuid4()
+        refresh_token = create_refresh_token({"sub": str(user_id)})
+
+        with patch.object(auth_routes, "UserRepository") as repo_cls:
+            repo_cls.return_value.get_active_user_id = AsyncMock(return_value=user_id)
+            response = auth_client.post(
+                "/api/v1/auth/refresh", json={"refresh_token": refresh_token}
+            )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["token_type"] == "bearer"
+        assert decode_token(body["access_token"])["sub"] == str(user_id)
+        assert decode_token(body["refresh_token"])["type"] == "refresh"
+
+        # 用户不存在或已禁用：统一 401
+        with patch.object(auth_routes, "UserRepository") as repo_cls:
+            repo_cls.return_value.get_active_user_id = AsyncMock(return_value=None)
+            response = auth_client.post(
+                "/api/v1/auth/refresh", json={"refresh_token": refresh_token}
+            )
+
+        assert response.status_code == 401
+
+    def test_refresh_rejects_access_token_and_bad_sub(self, auth_client):
+        access = create_access_token({"sub": "00000000-0000-0000-0000-000000000001"})
+        response = auth_client.post("/api/v1/auth/refresh", json={"refresh_token": access})
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token 类型错误"
+
+        bad_sub = create_refresh_token({"sub": "not-a-uuid"})
+        response = auth_client.post("/api/v1/auth/refresh", json={"refresh_token": bad_sub})
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token 数据无效"
+
+
+class TestLoginRateLimit:
+    """Test cases for the login failure limiter."""
+
+    def test_repeated_failures_return_429_without_verifying(self, auth_client):
+        from api import auth_routes
+
+        auth_routes.reset_login_failures()
+
+        verify = AsyncMock(return_value=False)
+        with patch.object(auth_routes, "UserRepository") as repo_cls, \
+                patch.object(auth_routes, "verify_password_async", verify):
+            repo_cls.return_value.get_user_by_username = AsyncMock(return_value=None)
+            form = {"username": "john", "password": "wrong"}
+
+            for _ in range(auth_routes.LOGIN_MAX_FAILURES):
+                assert auth_client.post("/api/v1/auth/login", data=form).status_code == 401
+            response = auth_client.post("/api/v1/auth/login", data=form)
+
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        # 用户不存在时也做一次（假）校验；被限流的请求不再校验
+        assert verify.await_count == auth_routes.LOGIN_MAX_FAILURES
+        verify.assert_awaited_with("wrong", auth_routes._DUMMY_PASSWORD_HASH)
+        auth_routes.reset_login_failures()
@@ -0,0 +1,581 @@
+"""
+Unit Tests for conversation route helpers
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+from urllib.parse import unquote
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.exceptions import RequestValidationError
+from starlette.requests import Request
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from api.conversation_routes import (
+    audio_filename_from_headers,
+    conversation_response,
+    encode_header_text,
+    get_conv_service,
+    parse_conversation_request,
+    parse_output_mode,
+    read_audio_body,
+    read_audio_upload,
+    stream_response_headers,
+)
+from services.conversation_service import OutputMode
+
+
+class TestReadAudioUpload:
+    """Test cases for bounded audio upload reading."""
+
+    @pytest.mark.asyncio
+    async def test_reads_whole_file(self):
+        data = b"RIFF" + b"\x00" * 200_000
+        upload = UploadFile(io.BytesIO(data), filename="a.wav")
+
+        assert await read_audio_upload(upload) == data
+
+    @pytest.mark.asyncio
+    async def test_empty_file_is_rejected(self):
+        upload = UploadFile(io.BytesIO(b""), filename="a.wav")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await read_audio_upload(upload)
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_oversized_file_is_rejected(self):
+        upload = UploadFile(io.BytesIO(b"\x00" * 1000), filename="a.wav")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await read_audio_upload(upload, max_bytes=100)
+        assert exc_info.value.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_declared_size_is_checked_before_reading(self):
+        upload = UploadFile(io.BytesIO(b"\x00" * 10), filename="a.wav", size=1000)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await read_audio_upload(upload, max_bytes=100)
+        assert exc_info.value.status_code == 413
+
+
+def _raw_request(chunks, headers=None):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ] or [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    return Request(scope, receive)
+
+
+class TestReadAudioBody:
+    """Test cases for raw request body audio reading."""
+
+    @pytest.mark.asyncio
+    async def test_reads_chunked_body(self):
+        request = _raw_request([b"ID3", b"\x00" * 100, b"\xff"])
+
+        assert await read_audio_body(request) == b"ID3" + b"\x00" * 100 + b"\xff"
+
+    @pytest.mark.asyncio
+    async def test_empty_body_is_rejected(self):
+        with pytest.raises(HTTPException) as exc_info:
+            await read_audio_body(_raw_request([]))
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_oversized_body_is_rejected(self):
+        with pytest.raises(HTTPException) as exc_info:
+            await read_audio_body(_raw_request([b"\x00" * 60, b"\x00" * 60]), max_bytes=100)
+        assert exc_info.value.status_code == 413
+
+        request = _raw_request([b"\x00"], headers={"Content-Length": "1000"})
+        with pytest.raises(HTTPException) as exc_info:
+            await read_audio_body(request, max_bytes=100)
+        assert exc_info.value.status_code == 413
+
+    def test_filename_from_headers(self):
+        assert audio_filename_from_headers(_raw_request([], {"X-Audio-Filename": "q.wav"})) == "q.wav"
+        assert audio_filename_from_headers(_raw_request([], {"X-Audio-Format": "MP3"})) == "audio.mp3"
+        assert audio_filename_from_headers(_raw_request([])) is None
+
+
+class TestEncodeHeaderText:
+    """Test cases for the X-User-Input header encoding."""
+
+    def test_plain_ascii_is_passed_through(self):
+        assert encode_header_text("What is the weather?") == "What is the weather?"
+
+    def test_non_ascii_and_percent_are_quoted(self):
+        for text in ("今天天气怎么样", "100% sure", "line\nbreak"):
+            encoded = encode_header_text(text)
+            assert encoded.isascii() and "\n" not in encoded
+            assert unquote(encoded) == text
+
+    def test_matches_urllib_quote(self):
+        from urllib.parse import quote
+
+        for text in ("今天天气怎么样？", "hello 世界 100% ok/a~b_c-d.e", "emoji 😀\t末尾", "问：a+b=c&d"):
+            assert encode_header_text(text) == quote(text)
+
+    def test_text_is_truncated(self):
+        assert encode_header_text("a" * 150) == "a" * 100
+
+
+class TestStreamResponseHeaders:
+    """Test cases for streaming audio response headers."""
+
+    def test_text_input_headers(self):
+        headers = stream_response_headers("conv_1", "你好", "voice_a")
+
+        assert headers["X-Session-Id"] == "conv_1"
+        assert headers["X-Voice"] == "voice_a"
+        assert headers["Content-Disposition"] == "attachment; filename=response_conv_1.mp3"
+        assert unquote(headers["X-User-Input"]) == "你好"
+        assert "X-Audio-Format" not in headers
+
+    def test_audio_format_and_empty_input(self):
+        headers = stream_response_headers("conv_1", "", "voice_a", audio_format="wav")
+
+        assert headers["X-Audio-Format"] == "wav"
+        assert "X-User-Input" not in headers
+
+
+class TestParseOutputMode:
+    """Test cases for output mode parsing."""
+
+    def test_valid_modes(self):
+        for mode in OutputMode:
+            assert parse_output_mode(mode.value) is mode
+
+    def test_invalid_mode_is_rejected(self):
+        with pytest.raises(HTTPException) as exc_info:
+            parse_output_mode("video")
+        assert exc_info.value.status_code == 400
+        assert "text, audio, both" in exc_info.value.detail
+
+
+class TestParseConversationRequest:
+    """Test cases for the raw-body ConversationRequest dependency."""
+
+    @pytest.mark.asyncio
+    async def test_valid_body(self):
+        request = _raw_request([b'{"text": "hi", "speed": 60}'])
+
+        parsed = await parse_conversation_request(request)
+        assert parsed.text == "hi" and parsed.speed == 60 and parsed.output_mode == "text"
+
+    @pytest.mark.asyncio
+    async def test_invalid_body_raises_request_validation_error(self):
+        for body in (b'{"text": "hi", "speed": 200}', b"{bad", b'{"speed": 50}'):
+            with pytest.raises(RequestValidationError) as exc_info:
+                await parse_conversation_request(_raw_request([body]))
+            assert all(err["loc"][0] == "body" for err in exc_info.value.errors())
+
+
+class TestConversationResponse:
+    """Test cases for the direct JSON conversation response."""
+
+    def test_projects_result_onto_response_fields(self):
+        import json
+
+        result = {
+            "success": True,
+            "session_id": "conv_1",
+            "user_input": "你好",
+            "agent_response": "你好！",
+            "output_mode": "both",
+            "audio_data": b"\xff\xfb",
+            "audio_size": 2,
+            "text": "你好！",
+            "timestamp": "2025-10-15T10:30:00",
+        }
+
+        body = json.loads(conversation_response(result).body)
+
+        assert "audio_data" not in body and "text" not in body
+        assert body["agent_response"] == "你好！" and body["audio_size"] == 2
+        assert body["error"] is None
+
+
+class TestDependencies:
+    """Test cases for the conversation route dependencies."""
+
+    @pytest.mark.asyncio
+    async def test_missing_service_returns_503(self):
+        from unittest.mock import patch
+        from api import conversation_routes
+
+        with patch.object(conversation_routes, "get_conversation_service", return_value=None):
+            with pytest.raises(HTTPException) as exc_info:
+                await get_conv_service()
+        assert exc_info.value.status_code == 503
+
+        service = object()
+        with patch.object(conversation_routes, "get_conversation_service", return_value=service):
+            assert await get_conv_service() is service
+
+
+class TestConversationStatus:
+    """Test cases for the cached /status endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_available_status_is_cached(self):
+        import json
+        from types import SimpleNamespace
+        from unittest.mock import patch
+        from api import conversation_routes
+
+        conversation_routes._status_cache.clear()
+        service = SimpleNamespace(stt_service=object(), agent=object(), tts_service=object())
+
+        with patch.object(conversation_routes, "get_conversation_service", return_value=service) as get_service:
+            first = await conversation_routes.get_conversation_status()
+            second = await conversation_routes.get_conversation_status()
+
+        assert first.media_type == "application/json"
+        assert json.loads(first.body) == {
+            "service": "conversation",
+            "available": True,
+            "components": {"stt": True, "agent": True, "tts": True},
+            "error": None,
+        }
+        assert second.body == first.body
+        get_service.assert_called_once()
+        conversation_routes._status_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_unavailable_status_is_not_cached(self):
+        import json
+        from unittest.mock import patch
+        from api import conversation_routes
+
+        conversation_routes._status_cache.clear()
+
+        with patch.object(conversation_routes, "get_conversation_service", return_value=None) as get_service:
+            first = await conversation_routes.get_conversation_status()
+            await conversation_routes.get_conversation_status()
+
+        assert json.loads(first.body) == {"service": "conversation", "available": False, "error": "服务未初始化"}
+        assert get_service.call_count == 2
+
+
+def _request_with_headers(headers):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    return Request(scope)
+
+
+class TestSessionETags:
+    """Test cases for ETag handling on the session endpoints."""
+
+    def test_etag_matching(self):
+        from api.conversation_routes import etag_matches, weak_etag
+
+        etag = weak_etag("s1", 3)
+        assert etag.startswith('W/"') and etag == weak_etag("s1", 3)
+        assert etag != weak_etag("s1", 4)
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+        assert not etag_matches('W/"other"', etag)
+
+    @pytest.mark.asyncio
+    async def test_unchanged_detail_returns_304_without_loading_messages(self):
+        import uuid
+        from datetime import datetime
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, patch
+        from api import conversation_routes
+
+        user = SimpleNamespace(user_id=uuid.uuid4())
+        last_activity = datetime(2025, 1, 1)
+        etag = conversation_routes.weak_etag("s1", last_activity, 2)
+
+        with patch.object(conversation_routes, "SessionRepository") as repo_cls:
+            repo = repo_cls.return_value
+            repo.get_session_version = AsyncMock(return_value=(user.user_id, last_activity, 2))
+            repo.get_session_with_messages = AsyncMock()
+            result = await conversation_routes.get_session_detail(
+                "s1", _request_with_headers({"If-None-Match": etag}), current_user=user, db=None
+            )
+
+        assert result.status_code == 304 and result.headers["etag"] == etag
+        repo.get_session_with_messages.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_detail_is_encoded_with_etag(self):
+        import uuid
+        from datetime import datetime
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, patch
+        from api import conversation_routes
+
+        user = SimpleNamespace(user_id=uuid.uuid4())
+        last_activity = datetime(2025, 1, 1)
+        message = SimpleNamespace(
+            message_id=uuid.uuid4(), session_id="s1", role="user", content="你好",
+            created_at=last_activity, meta_data={"k": 1},
+        )
+        session = SimpleNamespace(
+            session_id="s1", user_id=user.user_id, status="ACTIVE", created_at=last_activity,
+            last_activity=last_activity, context_summary=None, messages=[message],
+        )
+
+        with patch.object(conversation_routes, "SessionRepository") as repo_cls:
+            repo_cls.return_value.get_session_with_messages = AsyncMock(return_value=session)
+            response = await conversation_routes.get_session_detail(
+                "s1", _request_with_headers({}), current_user=user, db=None
+            )
+
+        body = json.loads(response.body)
+        assert response.headers["etag"] == conversation_routes.weak_etag("s1", last_activity, 1)
+        assert body["total_messages"] == 1 and body["user_id"] == str(user.user_id)
+        assert body["messages"][0]["message_id"] == str(message.message_id)
+        assert body["messages"][0]["metadata"] == {"k": 1}
+
+    @pytest.mark.asyncio
+    async def test_conditional_detail_checks_ownership(self):
+        import uuid
+        from datetime import datetime
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, patch
+        from api import conversation_routes
+
+        user = SimpleNamespace(user_id=uuid.uuid4())
+
+        with patch.object(conversation_routes, "SessionRepository") as repo_cls:
+            repo_cls.return_value.get_session_version = AsyncMock(
+                return_value=(uuid.uuid4(), datetime(2025, 1, 1), 2)
+            )
+            with pytest.raises(HTTPException) as exc_info:
+                await conversation_routes.get_session_detail(
+                    "s1", _request_with_headers({"If-None-Match": 'W/"x"'}), current_user=user, db=None
+                )
+
+        assert exc_info.value.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_list_sets_etag_and_honours_if_none_match(self):
+        import uuid
+        from datetime import datetime
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, patch
+        from api import conversation_routes
+
+        user = SimpleNamespace(user_id=uuid.uuid4())
+        latest = datetime(2025, 1, 1)
+        session = SimpleNamespace(
+            session_id="s1", user_id=user.user_id, status="ACTIVE",
+            created_at=latest, last_activity=latest, context_summary=None,
+        )
+
+        with patch.object(conversation_routes, "SessionRepository") as repo_cls, \
+                patch.object(conversation_routes, "MessageRepository") as message_repo_cls:
+            repo = repo_cls.return_value
+            repo.get_user_sessions_with_total = AsyncMock(return_value=([session], 1))
+            repo.get_user_sessions_version = AsyncMock(return_value=(1, latest))
+            message_repo_cls.return_value.count_messages_for_sessions = AsyncMock(return_value={"s1": 4})
+
+            response = await conversation_routes.get_user_sessions(
+                _request_with_headers({}), current_user=user, db=None
+            )
+            etag = response.headers["etag"]
+            # 第一页的 ETag 由查询结果得出，不额外查询版本
+            repo.get_user_sessions_version.assert_not_awaited()
+            body = json.loads(response.body)
+            assert body["total"] == 1 and body["sessions"][0]["message_count"] == 4
+            assert body["sessions"][0]["last_activity"] == "2025-01-01T00:00:00"
+
+            result = await conversation_routes.get_user_sessions(
+                _request_with_headers({"If-None-Match": etag}), current_user=user, db=None
+            )
+
+        assert result.status_code == 304
+        repo.get_user_sessions_with_total.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_new_message_changes_list_etag(self):
+        import uuid
+        from datetime import datetime, timedelta
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, MagicMock, patch
+        from api import conversation_routes
+
+        user = SimpleNamespace(user_id=uuid.uuid4())
+        session = SimpleNamespace(
+            session_id="s1", user_id=user.user_id, status="ACTIVE",
+            created_at=datetime(2025, 1, 1), last_activity=datetime(2025, 1, 1), context_summary=None,
+        )
+        calls = []
+
+        async def bump_activity(session_id):
+            calls.append("activity")
+            session.last_activity += timedelta(seconds=1)
+            return True
+
+        db = MagicMock()
+        db.commit = AsyncMock(side_effect=lambda: calls.append("commit"))
+        service = MagicMock()
+        service.process_conversation = AsyncMock(return_value={
+            "success": True, "session_id": "s1", "agent_response": "你好！",
+        })
+        request = SimpleNamespace(
+            text="你好", session_id="s1", output_mode="text",
+            voice=None, speed=None, volume=None, pitch=None,
+        )
+
+        with patch.object(conversation_routes, "SessionRepository") as repo_cls, \
+                patch.object(conversation_routes, "MessageRepository") as message_repo_cls:
+            repo = repo_cls.return_value
+            repo.upsert_session_returning_owner = AsyncMock(return_value=(False, user.user_id))
+            repo.update_session_activity = AsyncMock(side_effect=bump_activity)
+            repo.get_user_sessions_with_total = AsyncMock(side_effect=lambda **kwargs: ([session], 1))
+            message_repo = message_repo_cls.return_value
+            message_repo.save_messages = AsyncMock(side_effect=lambda *args: calls.append("messages"))
+            message_repo.count_messages_for_sessions = AsyncMock(return_value={"s1": 2})
+
+            before = await conversation_routes.get_user_sessions(
+                _request_with_headers({}), current_user=user, db=db
+            )
+            await conversation_routes.send_authenticated_message(
+                request, current_user=user, service=service, db=db, session_manager=None
+            )
+            repo.get_user_sessions_version = AsyncMock(return_value=(1, session.last_activity))
+            after = await conversation_routes.get_user_sessions(
+                _request_with_headers({"If-None-Match": before.headers["etag"]}), current_user=user, db=db
+            )
+
+        # 消息与 last_activity 在同一事务内提交，旧 ETag 不再命中
+        assert calls == ["messages", "activity", "commit"]
+        assert after.status_code == 200
+        assert after.headers["etag"] != before.headers["etag"]
+
+
+class TestSessionCursor:
+    """Test cases for keyset pagination of the session list."""
+
+    def test_cursor_roundtrip(self):
+        from datetime import datetime, timezone
+        from api.conversation_routes import decode_session_cursor, encode_session_cursor
+
+        last_activity = datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc)
+        cursor = encode_session_cursor(last_activity, "conv_abc")
+
+        assert "=" not in cursor
+        assert decode_session_cursor(cursor) == (last_activity, "conv_abc")
+
+    def test_invalid_cursor_is_rejected(self):
+        from api.conversation_routes import decode_session_cursor
+
+        for cursor in ("not-a-cursor", "W10", "WyJ4IiwgInkiXQ"):
+            with pytest.raises(HTTPException) as exc_info:
+                decode_session_cursor(cursor)
+            assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_cursor_page_returns_next_cursor(self):
+        import uuid
+        from datetime import datetime
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, patch
+        from api import conversation_routes
+
+        user = SimpleNamespace(user_id=uuid.uuid4())
+        latest = datetime(2025, 1, 1)
+        sessions = [
+            SimpleNamespace(
+                session_id=f"s{i}", user_id=user.user_id, status="ACTIVE",
+                created_at=latest, last_activity=latest, context_summary=None,
+            )
+            for i in range(3)
+        ]
+        cursor = conversation_routes.encode_session_cursor(latest, "s9")
+
+        with patch.object(conversation_routes, "SessionRepository") as repo_cls, \
+                patch.object(conversation_routes, "MessageRepository") as message_repo_cls:
+            repo = repo_cls.return_value
+            repo.get_user_sessions_with_total = AsyncMock(return_value=(sessions, 12))
+            repo.get_user_sessions_version = AsyncMock()
+            message_repo_cls.return_value.count_messages_for_sessions = AsyncMock(return_value={})
+
+            response = await conversation_routes.get_user_sessions(
+                _request_with_headers({}), page_size=2, cursor=cursor, current_user=user, db=None
+            )
+
+        body = json.loads(response.body)
+        assert repo.get_user_sessions_with_total.await_args.kwargs["after"] == (latest, "s9")
+        assert repo.get_user_sessions_with_total.await_args.kwargs["limit"] == 3
+        # 非条件请求的后续页不为 ETag 额外查询版本
+        repo.get_user_sessions_version.assert_not_awaited()
+        assert "etag" not in response.headers
+        assert [item["session_id"] for item in body["sessions"]] == ["s0", "s1"]
+        assert body["total"] == 12 and body["has_more"]
+        assert conversation_routes.decode_session_cursor(body["next_cursor"]) == (latest, "s1")
+
+
+class TestSharedDbSession:
+    """Test cases for sharing one DB session between auth and the route."""
+
+    def test_auth_and_route_share_one_session(self):
+        import uuid
+        from datetime import datetime
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock, patch
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from api import auth_routes, conversation_routes
+        from services.auth_service import create_access_token
+
+        opened = []
+
+        async def counting_session():
+            db = object()
+            opened.append(db)
+            yield db
+
+        app = FastAPI()
+        app.include_router(conversation_routes.conversation_router, prefix="/api/v1")
+        app.dependency_overrides[auth_routes.get_db_session] = counting_session
+
+        user_id = uuid.uuid4()
+        user = SimpleNamespace(user_id=user_id, is_active=True)
+        session = SimpleNamespace(
+            session_id="s1", user_id=user_id, status="ACTIVE", created_at=datetime(2025, 1, 1),
+            last_activity=datetime(2025, 1, 1), context_summary=None, messages=[],
+        )
+        token = create_access_token({"sub": str(user_id)})
+        auth_routes.invalidate_token_cache()
+
+        with patch.object(auth_routes, "UserRepository") as user_repo_cls, \
+                patch.object(conversation_routes, "SessionRepository") as repo_cls:
+            user_repo_cls.return_value.get_cached_user_by_id = AsyncMock(return_value=user)
+            repo_cls.return_value.get_session_with_messages = AsyncMock(return_value=session)
+            response = TestClient(app).get(
+                "/api/v1/conversation/sessions/s1", headers={"Authorization": f"Bearer {token}"}
+            )
+
+        assert response.status_code == 200
+        assert len(opened) == 1
+        assert user_repo_cls.call_args.args[0] is opened[0]
+        assert repo_cls.call_args.args[0] is opened[0]
+        auth_routes.invalidate_token_cache()
@@ -0,0 +1,289 @@
+"""
+Unit Tests for ConversationService streaming pipeline
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from services.conversation_service import ConversationService, coalesce_chunks, iter_sentences
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+async def _collect(agen):
+    return [item async for item in agen]
+
+
+class FakeAgent:
+    """Agent stub producing a fixed list of stream events."""
+
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    async def process_message_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        for event in self.events:
+            yield event
+
+
+class FakeTTS:
+    """TTS stub that echoes each synthesized text as bytes."""
+
+    def __init__(self):
+        self.texts = []
+
+    async def synthesize_stream(self, text, **kwargs):
+        self.texts.append(text)
+        yield text.encode("utf-8")
+
+
+def _service(agent=None, tts=None):
+    return ConversationService(agent=agent or FakeAgent([]), stt_service=MagicMock(), tts_service=tts or FakeTTS())
+
+
+class TestIterSentences:
+    """Test cases for sentence re-chunking of LLM deltas."""
+
+    @pytest.mark.asyncio
+    async def test_splits_on_sentence_boundaries(self):
+        chunks = ["今天天气很好，", "适合出去散步。明天", "可能会下雨！最后一句"]
+        assert await _collect(iter_sentences(_aiter(chunks), min_chars=4)) == [
+            "今天天气很好，适合出去散步。",
+            "明天可能会下雨！",
+            "最后一句",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_short_segments_are_merged(self):
+        chunks = ["好。", "我来帮你查一下天气。"]
+        assert await _collect(iter_sentences(_aiter(chunks), min_chars=8)) == [
+            "好。我来帮你查一下天气。",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_decimal_point_is_not_a_boundary(self):
+        chunks = ["Pi is about 3.", "14159. That is all."]
+        assert await _collect(iter_sentences(_aiter(chunks), min_chars=4)) == [
+            "Pi is about 3.14159.",
+            "That is all.",
+        ]
+
+
+class TestCoalesceChunks:
+    """Test cases for audio chunk coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_first_chunk_immediate_then_coalesced(self):
+        chunks = [b"a" * 3, b"b" * 4, b"c" * 4, b"d" * 4, b"e"]
+        out = await _collect(coalesce_chunks(_aiter(chunks), min_size=8))
+
+        assert out == [b"aaa", b"bbbbcccc", b"dddde"]
+        assert b"".join(out) == b"".join(chunks)
+
+    @pytest.mark.asyncio
+    async def test_empty_stream(self):
+        assert await _collect(coalesce_chunks(_aiter([]), min_size=8)) == []
+
+
+class TestStreamingPipeline:
+    """Test cases for stream_agent_response and pipelined TTS."""
+
+    @pytest.mark.asyncio
+    async def test_pipeline_synthesizes_each_sentence_and_saves_history(self):
+        agent = FakeAgent([
+            {"type": "start"},
+            {"type": "delta", "content": "第一句话在这里。"},
+            {"type": "delta", "content": "第二句话也在这里。"},
+            {"type": "end"},
+        ])
+        tts = FakeTTS()
+        service = _service(agent, tts)
+        session_manager = MagicMock(get_history=AsyncMock(return_value=[]), persist_messages=AsyncMock())
+
+        text_stream = service.stream_agent_response("你好", "conv_1", session_manager=session_manager)
+        audio = await _collect(service.generate_pipelined_audio_stream(text_stream))
+
+        assert tts.texts == ["第一句话在这里。", "第二句话也在这里。"]
+        assert b"".join(audio).decode("utf-8") == "第一句话在这里。第二句话也在这里。"
+        await service.wait_background_tasks()
+        turn = [("user", "你好"), ("assistant", "第一句话在这里。第二句话也在这里。")]
+        session_manager.cache_messages.assert_called_once_with("conv_1", turn)
+        session_manager.persist_messages.assert_awaited_once_with("conv_1", turn)
+
+    @pytest.mark.asyncio
+    async def test_agent_error_is_spoken(self):
+        agent = FakeAgent([{"type": "error", "error": "boom"}])
+        service = _service(agent)
+
+        text = await _collect(service.stream_agent_response("你好", "conv_1"))
+
+        assert text == ["抱歉，处理您的请求时出现了错误：boom"]
+
+    @pytest.mark.asyncio
+    async def test_empty_response_uses_fallback(self):
+        service = _service(FakeAgent([{"type": "end"}]))
+
+        text = await _collect(service.stream_agent_response("你好", "conv_1"))
+
+        assert text == ["抱歉，我没有理解你的问题，请重新表达。"]
+
+    @pytest.mark.asyncio
+    async def test_process_conversation_stream(self):
+        agent = FakeAgent([{"type": "delta", "content": "好的，没问题。"}, {"type": "end"}])
+        tts = FakeTTS()
+        service = _service(agent, tts)
+
+        user_input, metadata, session_id, audio_stream = await service.process_conversation_stream(
+            text="  你好  ", voice="voice_a"
+        )
+
+        assert user_input == "你好" and metadata["input_mode"] == "text"
+        assert session_id.startswith("conv_")
+        # 智能体在消费音频流时才开始生成
+        assert agent.calls == []
+        assert b"".join(await _collect(audio_stream)).decode("utf-8") == "好的，没问题。"
+        assert agent.calls[0]["session_id"] == session_id
+
+
+class TestHistorySave:
+    """Test cases for saving conversation history off the response path."""
+
+    @pytest.mark.asyncio
+    async def test_reply_does_not_wait_for_history_write(self):
+        import asyncio
+        from utils.hybrid_session_manager import HybridSessionManager
+
+        release = asyncio.Event()
+        saved = []
+
+        async def slow_save(session_id, role, content, metadata=None):
+            await release.wait()
+            saved.append((role, content))
+
+        session_manager = HybridSessionManager(conversation_repo=MagicMock())
+        session_manager._save_to_database = slow_save
+        session_manager._load_from_database = AsyncMock(return_value=[])
+        agent = MagicMock(process_message=AsyncMock(return_value={"response": "你好呀"}))
+        service = _service(agent)
+
+        response, session_id, _ = await service.get_agent_response("你好", "conv_1", session_manager=session_manager)
+
+        assert response == "你好呀" and session_id == "conv_1"
+        assert len(service._background_tasks) == 1
+        # 数据库写入尚未完成，缓存中已有完整的一轮
+        assert await session_manager.get_history("conv_1") == [
+            {"role": "user", "content": "你好"},
+            {"role": "assistant", "content": "你好呀"},
+        ]
+
+        release.set()
+        await service.wait_background_tasks()
+        assert saved == [("user", "你好"), ("assistant", "你好呀")]
+        assert not service._background_tasks
+
+    @pytest.mark.asyncio
+    async def test_overlapping_turns_do_not_interleave(self):
+        from utils.hybrid_session_manager import HybridSessionManager
+
+        saved = []
+
+        async def save(session_id, role, content, metadata=None):
+            saved.append((role, content))
+
+        session_manager = HybridSessionManager(conversation_repo=MagicMock())
+        session_manager._save_to_database = save
+        service = _service(MagicMock())
+
+        service._schedule_history_save("conv_1", session_manager, "问一", "答一")
+        service._schedule_history_save("conv_1", session_manager, "问二", "答二")
+        await service.wait_background_tasks()
+
+        expected = [("user", "问一"), ("assistant", "答一"), ("user", "问二"), ("assistant", "答二")]
+        assert [(m["role"], m["content"]) for m in session_manager._sessions["conv_1"]] == expected
+        assert saved == expected
+
+
+class FakeStreamingSTT:
+    """STT stub consuming the audio stream as it arrives."""
+
+    def __init__(self):
+        self.received = []
+
+    async def recognize_stream(self, audio_chunks):
+        from services.voice.stt_simple import STTResult
+
+        async for chunk in audio_chunks:
+            self.received.append(chunk)
+        return STTResult(text=" 你好 ", success=True)
+
+
+class TestStreamingAudioInput:
+    """Test cases for recognizing PCM audio while it is uploaded."""
+
+    def _service(self, stt):
+        converter = MagicMock(TARGET_SAMPLE_RATE=16000, TARGET_SAMPLE_WIDTH=2)
+        converter.validate_pcm_size.return_value = (True, "验证通过")
+        service = ConversationService(agent=FakeAgent([]), stt_service=stt, tts_service=FakeTTS())
+        service.audio_converter = converter
+        return service
+
+    @pytest.mark.asyncio
+    async def test_chunks_are_forwarded_to_stt(self):
+        stt = FakeStreamingSTT()
+        service = self._service(stt)
+
+        text, metadata = await service.process_audio_stream_input(_aiter([b"\x00" * 3200, b"\x00" * 3200]))
+
+        assert text == "你好"
+        assert stt.received == [b"\x00" * 3200, b"\x00" * 3200]
+        assert metadata["audio_format"] == "pcm" and metadata["audio_duration"] == 0.2
+        service.audio_converter.validate_pcm_size.assert_called_once_with(6400)
+
+    @pytest.mark.asyncio
+    async def test_source_error_propagates(self):
+        async def failing_source():
+            yield b"\x00" * 3200
+            raise RuntimeError("upload aborted")
+
+        service = self._service(FakeStreamingSTT())
+
+        with pytest.raises(RuntimeError, match="upload aborted"):
+            await service.process_audio_stream_input(failing_source())
+
+    def test_only_pcm_is_streamed(self):
+        from services.voice.audio_converter import AudioConverter
+
+        service = _service()
+        service.audio_converter = MagicMock(detect_format=lambda name, content: AudioConverter.detect_format(None, name, content))
+
+        assert service.supports_streaming_input("audio.pcm")
+        assert not service.supports_streaming_input("audio.wav")
+        assert not service.supports_streaming_input(None)
+
+
+class TestLogStreamErrors:
+    """Test cases for the audio stream error wrapper."""
+
+    @pytest.mark.asyncio
+    async def test_passes_chunks_and_reraises(self):
+        from services.conversation_service import log_stream_errors
+
+        async def failing():
+            yield b"a"
+            raise RuntimeError("tts down")
+
+        received = []
+        with pytest.raises(RuntimeError, match="tts down"):
+            async for chunk in log_stream_errors(failing()):
+                received.append(chunk)
+
+        assert received == [b"a"]
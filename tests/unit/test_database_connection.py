@@ -0,0 +1,39 @@
+"""
+Unit Tests for database connection setup
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from database import connection
+
+
+class TestInitDb:
+    """Test cases for engine creation."""
+
+    @pytest.mark.asyncio
+    async def test_engine_uses_statement_cache(self):
+        config = SimpleNamespace(
+            user="u", password="p", host="localhost", port=5432,
+            database="db", pool_size=20, max_overflow=10, pool_timeout=10.0,
+        )
+        engine = MagicMock()
+
+        with patch.object(connection, "_engine", None), \
+                patch.object(connection, "_async_session_factory", None), \
+                patch.object(connection, "create_async_engine", return_value=engine) as create:
+            assert await connection.init_db(config) is engine
+
+        kwargs = create.call_args.kwargs
+        assert kwargs["pool_timeout"] == 10.0 and kwargs["pool_pre_ping"]
+        connect_args = kwargs["connect_args"]
+        assert connect_args == {
+            "prepared_statement_cache_size": connection.STATEMENT_CACHE_SIZE,
+            "statement_cache_size": connection.STATEMENT_CACHE_SIZE,
+        }
@@ -0,0 +1,35 @@
+"""
+Unit Tests for the streaming event helpers
+"""
+
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from api import event_utils
+
+
+class TestUtcTimestamp:
+    """Test cases for event timestamps."""
+
+    def test_format_and_prefix_reuse(self):
+        with patch.object(event_utils.time, "time_ns", return_value=1760436000_000123_000):
+            first = event_utils.utc_timestamp()
+        with patch.object(event_utils.time, "time_ns", return_value=1760436000_500000_000):
+            same_second = event_utils.utc_timestamp()
+        with patch.object(event_utils.time, "time_ns", return_value=1760436001_000000_000):
+            next_second = event_utils.utc_timestamp()
+
+        assert first == "2025-10-14T10:00:00.000123Z"
+        assert same_second == "2025-10-14T10:00:00.500000Z"
+        assert next_second == "2025-10-14T10:00:01.000000Z"
+
+    def test_event_timestamp_is_current_utc(self):
+        event = event_utils.create_event("delta", {"content": "hi"}, session_id="s1")
+
+        parsed = datetime.strptime(event["timestamp"], "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+        assert abs((parsed - datetime.now(timezone.utc)).total_seconds()) < 5
+        assert event_utils.validate_event(event)
@@ -0,0 +1,71 @@
+"""
+Unit Tests for MessageRepository
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from database.repositories.message_repository import MessageRepository
+
+
+class TestCountMessagesForSessions:
+    """Test cases for the grouped per-session message count."""
+
+    @pytest.mark.asyncio
+    async def test_single_grouped_query(self):
+        result = SimpleNamespace(all=lambda: [("s1", 3), ("s2", 5)])
+        session = SimpleNamespace(execute=AsyncMock(return_value=result))
+        repo = MessageRepository(session)
+
+        counts = await repo.count_messages_for_sessions(["s1", "s2", "s3"])
+
+        assert counts == {"s1": 3, "s2": 5}
+        session.execute.assert_awaited_once()
+        sql = str(session.execute.await_args.args[0])
+        assert "GROUP BY" in sql and "IN" in sql
+
+    @pytest.mark.asyncio
+    async def test_empty_page_skips_query(self):
+        session = SimpleNamespace(execute=AsyncMock())
+        repo = MessageRepository(session)
+
+        assert await repo.count_messages_for_sessions([]) == {}
+        session.execute.assert_not_awaited()
+
+
+class TestSaveMessages:
+    """Test cases for bulk-inserting a conversation turn."""
+
+    @pytest.mark.asyncio
+    async def test_single_bulk_insert(self):
+        session = SimpleNamespace(execute=AsyncMock())
+        repo = MessageRepository(session)
+
+        saved = await repo.save_messages("s1", [
+            ("user", "你好", {"input_mode": "text"}),
+            ("assistant", "你好呀", None),
+        ])
+
+        assert saved == 2
+        session.execute.assert_awaited_once()
+        statement, rows = session.execute.await_args.args
+        assert statement.is_insert
+        assert [(r["session_id"], r["role"], r["content"], r["meta_data"]) for r in rows] == [
+            ("s1", "user", "你好", {"input_mode": "text"}),
+            ("s1", "assistant", "你好呀", {}),
+        ]
+        assert rows[0]["timestamp"] < rows[1]["timestamp"]
+
+    @pytest.mark.asyncio
+    async def test_no_messages_skips_insert(self):
+        session = SimpleNamespace(execute=AsyncMock())
+        repo = MessageRepository(session)
+
+        assert await repo.save_messages("s1", []) == 0
+        session.execute.assert_not_awaited()
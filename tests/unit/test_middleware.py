@@ -0,0 +1,51 @@
+"""
+Unit Tests for the ASGI request middleware
+"""
+
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from api.middleware import ProcessTimeMiddleware, RequestIDMiddleware
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/echo")
+    async def echo(request: Request):
+        return {"request_id": request.state.request_id}
+
+    @app.get("/missing")
+    async def missing():
+        raise HTTPException(status_code=404, detail="nope")
+
+    app.add_middleware(ProcessTimeMiddleware)
+    app.add_middleware(RequestIDMiddleware)
+    return app
+
+
+class TestRequestMiddleware:
+    """Test cases for the process-time and request-id middleware."""
+
+    def test_headers_and_request_state(self):
+        client = TestClient(_app())
+
+        first = client.get("/echo")
+        second = client.get("/echo")
+
+        assert first.status_code == 200
+        assert first.headers["x-request-id"] == first.json()["request_id"]
+        assert first.headers["x-request-id"] != second.headers["x-request-id"]
+        assert float(first.headers["x-process-time"]) >= 0
+
+    def test_error_responses_get_headers(self):
+        response = TestClient(_app()).get("/missing")
+
+        assert response.status_code == 404
+        assert "x-request-id" in response.headers
+        assert "x-process-time" in response.headers
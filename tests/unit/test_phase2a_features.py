@@ -192,6 +192,32 @@ class TestAPIKeyAuthentication:
         # Should work without API key when disabled
         response = client.get("/protected")
         assert response.status_code == 200
+    
+    @pytest.fixture
+    def restore_api_keys(self, monkeypatch):
+        """Restore API_KEYS and the loaded key set after the test."""
+        from src.api.auth import reload_api_keys
+        
+        yield monkeypatch
+        monkeypatch.undo()
+        reload_api_keys()
+    
+    def test_get_api_key_uses_reloaded_keys(self, restore_api_keys):
+        """Test that get_api_key validates against keys from reload_api_keys."""
+        from fastapi import HTTPException
+        from src.api.auth import get_api_key, reload_api_keys
+        
+        restore_api_keys.setenv("API_KEYS", "key-a, key-b")
+        assert reload_api_keys() == frozenset({"key-a", "key-b"})
+        assert get_api_key("key-b") == "key-b"
+        
+        with pytest.raises(HTTPException) as exc_info:
+            get_api_key("key-c")
+        assert exc_info.value.status_code == 403
+        
+        with pytest.raises(HTTPException) as exc_info:
+            get_api_key("")
+        assert exc_info.value.status_code == 401
 
 
 class TestEventProtocol:
@@ -295,6 +321,23 @@ class TestEventProtocol:
             "timestamp": "2025-10-14T10:00:00Z",
             "type": "delta"
         })
+    
+    def test_sse_event_encoding(self):
+        """Test that events are encoded as UTF-8 SSE frames."""
+        import json
+        from datetime import datetime
+        from src.api.event_utils import create_delta_event, encode_event, encode_sse_event
+        
+        event = create_delta_event(content="你好", session_id="test_123")
+        frame = encode_sse_event(event)
+        assert frame.startswith(b"data: ")
+        assert frame.endswith(b"\n\n")
+        assert "你好".encode("utf-8") in frame
+        assert json.loads(frame[len(b"data: "):-2]) == event
+        
+        # datetime 字段按 ISO 8601 编码
+        encoded = json.loads(encode_event({"ts": datetime(2025, 10, 14, 10, 0, 0)}))
+        assert encoded["ts"] == "2025-10-14T10:00:00"
 
 
 if __name__ == "__main__":
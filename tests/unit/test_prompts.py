@@ -0,0 +1,56 @@
+"""
+Unit Tests for System Prompt Assembly
+
+Covers the cached prompt builders in agent.prompts.
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from agent.prompts import (
+    BASE_IDENTITY,
+    CONTINUITY_ADDITION,
+    SEARCH_ADDITION,
+    TASK_FRAMEWORK,
+    TOOL_RESULTS_ADDITION,
+    build_context_addition,
+    build_system_prompt,
+)
+
+
+class TestContextAddition:
+    """Test cases for context-aware prompt additions."""
+
+    def test_empty_fingerprint(self):
+        """No context yields no addition."""
+        assert build_context_addition(False, False, None) == ""
+
+    def test_blocks_in_order(self):
+        """Selected blocks are joined in a fixed order."""
+        addition = build_context_addition(True, True, "search")
+        assert addition == "\n\n".join([TOOL_RESULTS_ADDITION, CONTINUITY_ADDITION, SEARCH_ADDITION])
+
+    def test_same_fingerprint_is_cached(self):
+        """Repeated fingerprints reuse the same string object."""
+        assert build_context_addition(True, False, "time") is build_context_addition(True, False, "time")
+
+
+class TestSystemPrompt:
+    """Test cases for full system prompt assembly."""
+
+    def test_sections_present(self):
+        """The prompt contains the static sections and the tool list."""
+        prompt = build_system_prompt("- **calculator**: test", "")
+        assert prompt.startswith(BASE_IDENTITY)
+        assert prompt.endswith(TASK_FRAMEWORK)
+        assert "- **calculator**: test" in prompt
+
+    def test_context_appended(self):
+        """A non-empty addition is appended after the task framework."""
+        prompt = build_system_prompt("tools", CONTINUITY_ADDITION)
+        assert prompt.endswith(TASK_FRAMEWORK + "\n\n" + CONTINUITY_ADDITION)
+
+    def test_same_inputs_are_cached(self):
+        """Repeated inputs reuse the assembled prompt."""
+        assert build_system_prompt("tools", "") is build_system_prompt("tools", "")
@@ -0,0 +1,149 @@
+"""
+Unit Tests for SessionRepository
+"""
+
+import sys
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from database.repositories.session_repository import SessionRepository
+
+
+def _result(rows=None, scalar=None):
+    return SimpleNamespace(all=lambda: rows or [], scalar_one=lambda: scalar)
+
+
+class TestGetUserSessionsWithTotal:
+    """Test cases for the fused page + total query."""
+
+    @pytest.mark.asyncio
+    async def test_page_and_total_in_one_query(self):
+        first, second = SimpleNamespace(session_id="s1"), SimpleNamespace(session_id="s2")
+        session = SimpleNamespace(execute=AsyncMock(return_value=_result([(first, 7), (second, 7)])))
+        repo = SessionRepository(session)
+
+        sessions, total = await repo.get_user_sessions_with_total(uuid.uuid4(), status="ACTIVE", limit=2)
+
+        assert sessions == [first, second] and total == 7
+        session.execute.assert_awaited_once()
+        assert "OVER ()" in str(session.execute.await_args.args[0])
+
+    @pytest.mark.asyncio
+    async def test_empty_first_page(self):
+        session = SimpleNamespace(execute=AsyncMock(return_value=_result([])))
+        repo = SessionRepository(session)
+
+        assert await repo.get_user_sessions_with_total(uuid.uuid4()) == ([], 0)
+        session.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_cursor_page_counts_all_sessions_in_same_query(self):
+        from datetime import datetime
+
+        first = SimpleNamespace(session_id="s1")
+        session = SimpleNamespace(execute=AsyncMock(return_value=_result([(first, 9)])))
+        repo = SessionRepository(session)
+
+        sessions, total = await repo.get_user_sessions_with_total(
+            uuid.uuid4(), limit=2, after=(datetime(2025, 1, 1), "s0")
+        )
+
+        assert sessions == [first] and total == 9
+        session.execute.assert_awaited_once()
+        sql = str(session.execute.await_args.args[0])
+        assert "(SELECT count(*) AS count_1 \nFROM sessions AS sessions_1" in sql
+        assert "(sessions.last_activity, sessions.session_id) <" in sql
+
+    @pytest.mark.asyncio
+    async def test_page_past_the_end_counts_separately(self):
+        session = SimpleNamespace(execute=AsyncMock(side_effect=[_result([]), _result(scalar=3)]))
+        repo = SessionRepository(session)
+
+        assert await repo.get_user_sessions_with_total(uuid.uuid4(), limit=20, offset=40) == ([], 3)
+        assert session.execute.await_count == 2
+
+
+class TestGetUserSessions:
+    """Test cases for offset and keyset pagination of a user's sessions."""
+
+    @pytest.mark.asyncio
+    async def test_keyset_cursor_filters_after_last_row(self):
+        from datetime import datetime
+
+        result = SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: []))
+        session = SimpleNamespace(execute=AsyncMock(return_value=result))
+        repo = SessionRepository(session)
+
+        assert await repo.get_user_sessions(uuid.uuid4(), limit=11, after=(datetime(2025, 1, 1), "s1")) == []
+        sql = str(session.execute.await_args.args[0])
+        assert "(sessions.last_activity, sessions.session_id) <" in sql
+        assert "ORDER BY sessions.last_activity DESC, sessions.session_id DESC" in sql
+
+
+class TestUpsertSessionReturningOwner:
+    """Test cases for the single round-trip session upsert."""
+
+    @pytest.mark.asyncio
+    async def test_new_session_is_created(self):
+        user_id = uuid.uuid4()
+        result = SimpleNamespace(first=lambda: (user_id, True))
+        session = SimpleNamespace(execute=AsyncMock(return_value=result), scalar=AsyncMock())
+        repo = SessionRepository(session)
+
+        assert await repo.upsert_session_returning_owner("s1", user_id) == (True, user_id)
+        session.execute.assert_awaited_once()
+        session.scalar.assert_not_awaited()
+        assert "ON CONFLICT (session_id) DO NOTHING" in str(session.execute.await_args.args[0])
+
+    @pytest.mark.asyncio
+    async def test_existing_session_returns_owner(self):
+        owner_id = uuid.uuid4()
+        result = SimpleNamespace(first=lambda: (owner_id, False))
+        session = SimpleNamespace(execute=AsyncMock(return_value=result), scalar=AsyncMock())
+        repo = SessionRepository(session)
+
+        assert await repo.upsert_session_returning_owner("s1", uuid.uuid4()) == (False, owner_id)
+        session.scalar.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_concurrently_created_session_is_reread(self):
+        owner_id = uuid.uuid4()
+        result = SimpleNamespace(first=lambda: None)
+        session = SimpleNamespace(
+            execute=AsyncMock(return_value=result), scalar=AsyncMock(return_value=owner_id)
+        )
+        repo = SessionRepository(session)
+
+        assert await repo.upsert_session_returning_owner("s1", uuid.uuid4()) == (False, owner_id)
+        session.scalar.assert_awaited_once()
+
+
+class TestSessionMessagesRelationship:
+    """Test cases for the Session.messages loading strategy."""
+
+    def test_lazy_load_raises(self):
+        from sqlalchemy.exc import InvalidRequestError
+        from sqlalchemy.orm import make_transient_to_detached
+        from database.models import Session
+
+        session = Session(session_id="s1", user_id=uuid.uuid4())
+        make_transient_to_detached(session)
+
+        with pytest.raises(InvalidRequestError):
+            session.messages
+
+    @pytest.mark.asyncio
+    async def test_detail_query_eager_loads_messages(self):
+        result = SimpleNamespace(scalar_one_or_none=lambda: None)
+        session = SimpleNamespace(execute=AsyncMock(return_value=result))
+        repo = SessionRepository(session)
+
+        assert await repo.get_session_with_messages("s1") is None
+        statement = session.execute.await_args.args[0]
+        assert any(("lazy", "selectin") in load.strategy for option in statement._with_options for load in option.context)
@@ -0,0 +1,66 @@
+"""
+Unit Tests for the iFlytek STT service framing
+"""
+
+import base64
+import json
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from services.voice import stt_simple
+from services.voice.stt_simple import FRAME_SIZE, IFlytekSTTService, STTConfig
+
+
+class RecordingWebSocket:
+    """WebSocket stub recording (status, audio) for each sent frame."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, message):
+        data = json.loads(message)
+        audio = base64.b64decode(data["payload"]["audio"]["audio"])
+        self.frames.append((data["header"]["status"], "parameter" in data, audio))
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+async def _send(chunks):
+    service = IFlytekSTTService(STTConfig(appid="app", api_key="key", api_secret="secret"))
+    ws = RecordingWebSocket()
+    with patch.object(stt_simple.asyncio, "sleep", AsyncMock()):
+        await service._send_audio_frames(ws, _aiter(chunks))
+    return ws.frames
+
+
+class TestSendAudioFrames:
+    """Test cases for re-framing audio into fixed-size iFlytek frames."""
+
+    @pytest.mark.asyncio
+    async def test_whole_audio_is_framed(self):
+        audio = bytes(range(256)) * 12  # 3072 bytes → 1280 + 1280 + 512
+
+        frames = await _send([audio])
+
+        assert [status for status, _, _ in frames] == [0, 1, 2]
+        assert [has_params for _, has_params, _ in frames] == [True, False, False]
+        assert [len(chunk) for _, _, chunk in frames] == [FRAME_SIZE, FRAME_SIZE, 512]
+        assert b"".join(chunk for _, _, chunk in frames) == audio
+
+    @pytest.mark.asyncio
+    async def test_streamed_chunks_match_whole_audio(self):
+        audio = bytes(range(256)) * 15  # 3840 bytes, exact multiple of the frame size
+
+        whole = await _send([audio])
+        streamed = await _send([audio[:100], audio[100:2000], audio[2000:2001], audio[2001:]])
+
+        assert streamed == whole
+        assert [status for status, _, _ in whole] == [0, 1, 2]
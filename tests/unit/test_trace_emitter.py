@@ -0,0 +1,31 @@
+"""
+Unit Tests for TraceEmitter
+"""
+
+import sys
+from enum import Enum
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from agent.trace_emitter import TraceEmitter, _MAX_TEXT_LEN
+
+
+class LongText(str, Enum):
+    VALUE = "x" * (_MAX_TEXT_LEN + 10)
+
+
+class TestToolCallPending:
+    """Test cases for argument simplification in tool_call_pending."""
+
+    def test_long_strings_and_str_subclasses_are_truncated(self):
+        event = TraceEmitter().tool_call_pending(
+            "search",
+            {"query": "q" * (_MAX_TEXT_LEN + 1), "mode": LongText.VALUE, "limit": 5, "short": "ok"},
+            "conv_1",
+        )
+
+        args = event["data"]["args"]
+        assert args["query"] == "q" * _MAX_TEXT_LEN + "..."
+        assert args["mode"] == "x" * _MAX_TEXT_LEN + "..."
+        assert args["limit"] == 5 and args["short"] == "ok"
@@ -0,0 +1,117 @@
+"""
+Unit Tests for TTLCache and the cached user lookups
+"""
+
+import sys
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from utils.ttl_cache import TTLCache
+
+
+class TestTTLCache:
+    """Test cases for the TTL/LRU cache."""
+
+    def test_set_and_get(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert "a" in cache
+        assert cache.get("missing") is None
+
+    def test_entry_expires(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        with patch("utils.ttl_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1, ttl=5)
+        with patch("utils.ttl_cache.time.monotonic", return_value=104.0):
+            assert cache.get("a") == 1
+        with patch("utils.ttl_cache.time.monotonic", return_value=105.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_non_positive_ttl_is_not_stored(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.set("a", 1, ttl=0)
+        assert cache.get("a") is None
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" becomes least recently used
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_pop_and_clear(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestCurrentUserCache:
+    """Test cases for token caching in get_current_user."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_token_skips_decode(self):
+        from api import auth_routes
+        from services.auth_service import create_access_token, decode_token
+
+        auth_routes.invalidate_token_cache()
+        user_id = uuid.uuid4()
+        user = SimpleNamespace(user_id=user_id, is_active=True)
+        token = create_access_token({"sub": str(user_id)})
+
+        with patch.object(auth_routes, "UserRepository") as repo_cls, \
+                patch.object(auth_routes, "decode_token", wraps=decode_token) as decode:
+            repo_cls.return_value.get_cached_user_by_id = AsyncMock(return_value=user)
+            first = await auth_routes.get_current_user(token, session=None)
+            second = await auth_routes.get_current_user(token, session=None)
+
+        assert first is user and second is user
+        decode.assert_called_once_with(token)
+        repo_cls.return_value.get_cached_user_by_id.assert_awaited_with(user_id)
+
+        auth_routes.invalidate_token_cache(token)
+        with patch.object(auth_routes, "decode_token", return_value=None):
+            with pytest.raises(Exception):
+                await auth_routes.get_current_user(token, session=None)
+
+
+class TestUserRepositoryCache:
+    """Test cases for the cached user-id lookup in UserRepository."""
+
+    @pytest.mark.asyncio
+    async def test_cached_lookup_and_invalidate_on_update(self):
+        from database.repositories import user_repository
+        from database.repositories.user_repository import UserRepository
+
+        user_repository.invalidate_user_cache()
+        user_id = uuid.uuid4()
+        user = SimpleNamespace(user_id=user_id, is_active=True, full_name="A")
+        session = SimpleNamespace(
+            get=AsyncMock(return_value=user),
+            commit=AsyncMock(),
+            refresh=AsyncMock(),
+        )
+        repo = UserRepository(session)
+
+        assert await repo.get_cached_user_by_id(user_id) is user
+        assert await repo.get_cached_user_by_id(user_id) is user
+        assert session.get.await_count == 1
+
+        await repo.update_user(user_id, full_name="B")
+        assert session.get.await_count == 2
+        await repo.get_cached_user_by_id(user_id)
+        assert session.get.await_count == 3
@@ -0,0 +1,135 @@
+"""
+Unit Tests for the iFlytek streaming TTS service
+"""
+
+import asyncio
+import base64
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from services.voice import tts_streaming
+from services.voice.tts_streaming import IFlytekTTSStreamingService
+
+
+class FakeWebSocket:
+    """WebSocket stub answering each text frame with one final audio frame."""
+
+    active = 0
+    max_active = 0
+
+    def __init__(self, sent):
+        self.sent = sent
+        self.messages = []
+
+    async def __aenter__(self):
+        FakeWebSocket.active += 1
+        FakeWebSocket.max_active = max(FakeWebSocket.max_active, FakeWebSocket.active)
+        return self
+
+    async def __aexit__(self, *exc):
+        FakeWebSocket.active -= 1
+
+    async def send(self, frame):
+        self.sent.append(json.loads(frame))
+        audio = base64.b64encode(b"mp3").decode()
+        self.messages.append(json.dumps({
+            "header": {"code": 0},
+            "payload": {"audio": {"audio": audio, "status": 2}},
+        }))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # 让出事件循环，模拟网络等待
+        await asyncio.sleep(0)
+        if not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+
+def _service():
+    tts_config = SimpleNamespace(
+        appid="app", api_key="key", api_secret="secret",
+        voice="default_voice", volume=50, speed=50, pitch=50,
+    )
+    config = SimpleNamespace(speech=SimpleNamespace(tts=tts_config))
+    tts_streaming._sentence_audio_cache.clear()
+    with patch.object(tts_streaming, "get_config", return_value=config):
+        return IFlytekTTSStreamingService()
+
+
+class TestSynthesizeStream:
+    """Test cases for concurrent synthesis."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_keep_their_own_voice(self):
+        service = _service()
+        sent = []
+
+        async def run(voice):
+            return [chunk async for chunk in service.synthesize_stream("第一句。第二句。", vcn=voice, speed=70)]
+
+        with patch.object(tts_streaming.websockets, "connect", lambda *a, **k: FakeWebSocket(sent)):
+            results = await asyncio.gather(run("voice_a"), run("voice_b"))
+
+        assert results == [[b"mp3", b"mp3"], [b"mp3", b"mp3"]]
+        voices = [frame["parameter"]["tts"]["vcn"] for frame in sent]
+        assert sorted(voices) == ["voice_a", "voice_a", "voice_b", "voice_b"]
+        assert all(frame["parameter"]["tts"]["speed"] == 70 for frame in sent)
+        # 共享实例的默认参数未被修改
+        assert service.voice == "default_voice" and service.speed == 50
+
+    @pytest.mark.asyncio
+    async def test_connection_pool_limits_open_connections(self):
+        service = _service()
+        FakeWebSocket.active = FakeWebSocket.max_active = 0
+
+        async def run():
+            return [chunk async for chunk in service.synthesize_stream("一。二。三。")]
+
+        with patch.object(tts_streaming, "_connection_slots", asyncio.Semaphore(2)), \
+                patch.object(tts_streaming.websockets, "connect", lambda *a, **k: FakeWebSocket([])):
+            results = await asyncio.gather(*(run() for _ in range(5)))
+
+        assert all(len(chunks) == 3 for chunks in results)
+        assert FakeWebSocket.max_active == 2
+
+    @pytest.mark.asyncio
+    async def test_short_sentences_are_served_from_cache(self):
+        service = _service()
+        sent = []
+
+        with patch.object(tts_streaming.websockets, "connect", lambda *a, **k: FakeWebSocket(sent)):
+            first = [chunk async for chunk in service.synthesize_stream("好的。")]
+            second = [chunk async for chunk in service.synthesize_stream("好的。")]
+            other_voice = [chunk async for chunk in service.synthesize_stream("好的。", vcn="voice_b")]
+
+        assert first == second == other_voice == [b"mp3"]
+        # 第二次命中缓存；换发音人需重新合成
+        assert len(sent) == 2
+
+    @pytest.mark.asyncio
+    async def test_incomplete_synthesis_is_not_cached(self):
+        service = _service()
+
+        class ClosingWebSocket(FakeWebSocket):
+            async def send(self, frame):
+                audio = base64.b64encode(b"mp3").decode()
+                self.messages.append(json.dumps({
+                    "header": {"code": 0},
+                    "payload": {"audio": {"audio": audio, "status": 1}},
+                }))
+
+        with patch.object(tts_streaming.websockets, "connect", lambda *a, **k: ClosingWebSocket([])):
+            chunks = [chunk async for chunk in service.synthesize_stream("好的。")]
+
+        assert chunks == [b"mp3"]
+        assert len(tts_streaming._sentence_audio_cache) == 0
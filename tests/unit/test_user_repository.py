@@ -0,0 +1,97 @@
+"""
+Unit Tests for UserRepository
+"""
+
+import sys
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
+
+from database.repositories.user_repository import UserRepository
+
+
+def _session_returning(rows):
+    result = SimpleNamespace(all=lambda: rows)
+    return SimpleNamespace(execute=AsyncMock(return_value=result))
+
+
+class TestGetConflicts:
+    """Test cases for the combined username/email conflict check."""
+
+    @pytest.mark.asyncio
+    async def test_no_conflicts(self):
+        session = _session_returning([])
+        repo = UserRepository(session)
+
+        assert await repo.get_conflicts("john", "john@example.com") == (False, False)
+        session.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_conflicts_from_separate_rows(self):
+        session = _session_returning([
+            SimpleNamespace(username="john", email="other@example.com"),
+            SimpleNamespace(username="jane", email="john@example.com"),
+        ])
+        repo = UserRepository(session)
+
+        assert await repo.get_conflicts("john", "john@example.com") == (True, True)
+
+    @pytest.mark.asyncio
+    async def test_email_conflict_only(self):
+        session = _session_returning([
+            SimpleNamespace(username="jane", email="john@example.com"),
+        ])
+        repo = UserRepository(session)
+
+        assert await repo.get_conflicts("john", "john@example.com") == (False, True)
+
+
+class TestGetActiveUserId:
+    """Test cases for the active-user check used by token refresh."""
+
+    @pytest.mark.asyncio
+    async def test_queries_single_column_on_cache_miss(self):
+        from database.repositories import user_repository
+
+        user_repository.invalidate_user_cache()
+        user_id = uuid.uuid4()
+        session = SimpleNamespace(scalar=AsyncMock(return_value=user_id))
+        repo = UserRepository(session)
+
+        assert await repo.get_active_user_id(user_id) == user_id
+        session.scalar.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_cached_user_skips_query(self):
+        from database.repositories import user_repository
+
+        user_id = uuid.uuid4()
+        session = SimpleNamespace(scalar=AsyncMock())
+        repo = UserRepository(session)
+
+        user_repository._user_cache.set(user_id, SimpleNamespace(user_id=user_id, is_active=False))
+        try:
+            assert await repo.get_active_user_id(user_id) is None
+        finally:
+            user_repository.invalidate_user_cache(user_id)
+        session.scalar.assert_not_awaited()
+
+
+class TestCreateUser:
+    """Test cases for user creation."""
+
+    @pytest.mark.asyncio
+    async def test_create_user_commits_and_refreshes(self):
+        session = SimpleNamespace(add=lambda obj: None, commit=AsyncMock(), refresh=AsyncMock())
+        repo = UserRepository(session)
+
+        user = await repo.create_user("john", "john@example.com", "hashed")
+
+        assert user.username == "john" and user.is_active
+        session.commit.assert_awaited_once()
+        session.refresh.assert_awaited_once_with(user)